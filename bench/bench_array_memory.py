@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+数组占用的内存: 程序把 n 个值写进 int/float/bool 数组, 统计数组存储和其中元素对象的字节数,
+和存放同样内容的 Python list 比较。
+
+    python bench/bench_array_memory.py [engine] [n]      # 默认 tree, 200000
+"""
+
+import io
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cp_engine import make_interpreter
+from cp_parser import calc_parser
+
+PROGRAM = """
+int n = %d
+%s a[n]
+for (int i = 0; i < n; i++) {
+    a[i] = %s
+}
+"""
+
+CASES = {
+    'int': ('int', 'i * 7919 + 1000', lambda i: i * 7919 + 1000),
+    'float': ('float', 'i / 3', lambda i: i / 3),
+    'bool': ('bool', 'i % 3 == 0', lambda i: i % 3 == 0),
+}
+
+
+def deep_size(storage):
+    # 容器本身加上其中不重复的元素对象; array.array 里没有元素对象
+    size = sys.getsizeof(storage)
+    if isinstance(storage, list):
+        size += sum(sys.getsizeof(x) for x in {id(x): x for x in storage}.values())
+    return size
+
+
+def main(argv):
+    engine = argv[0] if argv else 'tree'
+    n = int(argv[1]) if len(argv) > 1 else 200000
+    print(f'{"type":<8}{"array KiB":>12}{"list KiB":>12}{"ratio":>8}')
+    for name, (type_name, expr, value) in CASES.items():
+        interpreter = make_interpreter(engine, stdin=io.StringIO())
+        interpreter.execute(calc_parser.parse(PROGRAM % (n, type_name, expr)))
+        storage = interpreter.arrays['a']
+        baseline = [value(i) for i in range(n)]
+        size, list_size = deep_size(storage), deep_size(baseline)
+        print(f'{name:<8}{size / 1024:>12.0f}{list_size / 1024:>12.0f}{list_size / size:>8.1f}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+数组内置函数与逐个元素的循环比较: 同一件事分别写成 for 循环和一次内置函数调用, 比较执行时间。
+
+    python bench/bench_builtins.py [engine] [n]      # 默认 vm, 200000
+"""
+
+import io
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cp_builtins
+from cp_engine import make_interpreter
+from cp_parser import calc_parser
+
+SETUP = """
+int n = %d
+int a[n]
+int b[n]
+int c[n]
+for (int i = 0; i < n; i++) {
+    a[i] = i %% 1000
+    b[i] = i %% 7
+}
+"""
+
+CASES = {
+    'fill': ("for (int i = 0; i < n; i++) {\n    c[i] = 3\n}", "fill(c, 3)"),
+    'sum': ("int s = 0\nfor (int i = 0; i < n; i++) {\n    s = s + a[i]\n}", "int s = sum(a)"),
+    'copy': ("for (int i = 0; i < n; i++) {\n    c[i] = a[i]\n}", "copy(c, a)"),
+    'add': ("for (int i = 0; i < n; i++) {\n    c[i] = a[i] + b[i]\n}", "add(c, a, b)"),
+    'scale': ("for (int i = 0; i < n; i++) {\n    a[i] = a[i] * 1\n}", "scale(a, 1)"),
+    'dot': ("int s = 0\nfor (int i = 0; i < n; i++) {\n    s = s + a[i] * b[i]\n}", "int s = dot(a, b)"),
+}
+
+
+def run_time(engine, source, repeat):
+    tree = calc_parser.parse(source)
+    best = None
+    for _ in range(repeat):
+        interpreter = make_interpreter(engine, stdin=io.StringIO())
+        start = time.perf_counter()
+        interpreter.execute(tree)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def measure(engine, setup, body, repeat=5):
+    # 只计 body 的时间: setup + body 减去单独 setup, 各取最好的一次
+    base = run_time(engine, setup, repeat)
+    return max(run_time(engine, setup + body + "\n", repeat) - base, 1e-6)
+
+
+def measure_builtin(engine, setup, call, times=100):
+    # 一次内置函数调用比计时误差还短, 在循环里调用 times 次再平均
+    body = "for (int r = 0; r < %d; r++) {\n    %s\n}" % (times, call)
+    return measure(engine, setup, body) / times
+
+
+def main(argv):
+    engine = argv[0] if argv else 'vm'
+    n = int(argv[1]) if len(argv) > 1 else 200000
+    setup = SETUP % n
+    print(f'numpy: {"yes" if cp_builtins.numpy is not None else "no"}')
+    print(f'{"op":<8}{"loop ms":>10}{"builtin ms":>12}{"speedup":>9}')
+    for name, (loop, builtin) in CASES.items():
+        t_loop = measure(engine, setup, loop)
+        t_builtin = measure_builtin(engine, setup, builtin)
+        print(f'{name:<8}{t_loop * 1000:>10.1f}{t_builtin * 1000:>12.2f}{t_loop / t_builtin:>9.0f}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+执行引擎对比: 每个程序在每个引擎上跑一遍, 先检查输出一致, 再比较耗时。
+
+    python bench/bench_engines.py                     # 所有引擎, bench/programs 下所有程序
+    python bench/bench_engines.py tree,vm fib.cp      # 指定引擎和程序
+"""
+
+import glob
+import io
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cp_engine import ENGINES, make_interpreter
+from cp_parser import calc_parser
+
+PROGRAMS = os.path.join(ROOT, 'bench', 'programs')
+
+
+def time_engine(engine, tree, repeat=3):
+    best = None
+    output = None
+    for _ in range(repeat):
+        interpreter = make_interpreter(engine, stdin=io.StringIO())
+        t = time.perf_counter()
+        interpreter.execute(tree)
+        elapsed = time.perf_counter() - t
+        output = interpreter.printResult
+        best = elapsed if best is None else min(best, elapsed)
+    return best, output
+
+
+def main(argv):
+    engines = list(ENGINES)
+    if argv and not argv[0].endswith('.cp'):
+        engines = argv[0].split(',')
+        argv = argv[1:]
+    programs = [os.path.join(PROGRAMS, p) for p in argv] or sorted(glob.glob(os.path.join(PROGRAMS, '*.cp')))
+    print(f'{"program":<16}' + ''.join(f'{e + " ms":>12}' for e in engines) + f'{"best speedup":>14}')
+    for path in programs:
+        tree = calc_parser.parse(open(path, encoding='utf-8').read())
+        times = []
+        expected = None
+        for engine in engines:
+            elapsed, output = time_engine(engine, tree)
+            if expected is None:
+                expected = output
+            elif output != expected:
+                raise SystemExit(f'{os.path.basename(path)}: {engine} output differs from {engines[0]}')
+            times.append(elapsed)
+        print(f'{os.path.basename(path):<16}' + ''.join(f'{t * 1000:>12.1f}' for t in times)
+              + f'{times[0] / min(times):>13.1f}x')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
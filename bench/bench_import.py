@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+import 耗时: 无界面的 cp_engine 与旧的 "一上来就导入 Qt + graphviz" 方式对比。
+每次都在新进程里计时; 未安装的模块会跳过并注明。
+
+    python bench/bench_import.py [runs]
+"""
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EAGER = ['graphviz', 'PySide6.QtWidgets', 'PySide6.QtGui']
+
+
+def available(module):
+    probe = f'import {module}'
+    return subprocess.run([sys.executable, '-c', probe], cwd=ROOT,
+                          capture_output=True).returncode == 0
+
+
+def one_process(modules):
+    probe = (
+        'import time; t = time.perf_counter(); '
+        + '; '.join(f'import {m}' for m in modules)
+        + '; print(time.perf_counter() - t); import sys; '
+        + 'print(int(any(m.startswith(("PySide6", "graphviz")) for m in sys.modules)))'
+    )
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    out = subprocess.run([sys.executable, '-c', probe], env=env, cwd=ROOT,
+                         capture_output=True, text=True, check=True)
+    seconds, gui_loaded = out.stdout.split()
+    return float(seconds), gui_loaded == '1'
+
+
+def median(xs):
+    xs = sorted(xs)
+    return xs[len(xs) // 2]
+
+
+def main(runs=7):
+    eager = [m for m in EAGER if available(m)]
+    missing = [m for m in EAGER if m not in eager]
+    cases = [
+        ('cp_engine', ['cp_engine']),
+        ('cp (GUI module)', ['cp']),
+        ('cp_engine + eager GUI deps', ['cp_engine'] + eager),
+    ]
+    one_process(['cp_parser'])  # 先把语法缓存写好, 只比较 import 本身
+    print(f'{"import":<30}{"median ms":>12}{"Qt/graphviz loaded":>20}')
+    for name, modules in cases:
+        results = [one_process(modules) for _ in range(runs)]
+        print(f'{name:<30}{median([r[0] for r in results]) * 1000:>12.1f}{str(results[0][1]):>20}')
+    if missing:
+        print('not installed, not measured:', ', '.join(missing))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 7)
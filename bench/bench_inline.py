@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+函数内联前后的耗时: 同一个程序分别在关掉内联 (INLINE_MAX_NODES = 0) 和不同的函数体大小上限下各跑一遍,
+每个取最好的一次, 输出必须相同。
+
+    python bench/bench_inline.py [engines] [program] [上限,...]      # 默认所有引擎, small_calls.cp, 10,40
+"""
+
+import io
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cp_optimize
+from cp_engine import ENGINES, make_interpreter
+from cp_parser import calc_parser
+
+PROGRAMS = os.path.join(ROOT, 'bench', 'programs')
+
+
+def time_run(engine, source, limit, repeat=5):
+    saved = cp_optimize.INLINE_MAX_NODES
+    cp_optimize.INLINE_MAX_NODES = limit
+    try:
+        best = None
+        for _ in range(repeat):
+            tree = calc_parser.parse(source)
+            interpreter = make_interpreter(engine, stdin=io.StringIO())
+            start = time.perf_counter()
+            interpreter.execute(tree)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+    finally:
+        cp_optimize.INLINE_MAX_NODES = saved
+    return best, interpreter.printResult
+
+
+def main(argv):
+    engines = argv[0].split(',') if argv else list(ENGINES)
+    program = argv[1] if len(argv) > 1 else 'small_calls.cp'
+    limits = [int(limit) for limit in argv[2].split(',')] if len(argv) > 2 else [10, 40]
+    source = open(os.path.join(PROGRAMS, program), encoding='utf-8').read()
+    print(f'{"engine":<10}{"no inline ms":>14}' + ''.join(f'{f"<={limit} ms":>12}{"speedup":>9}' for limit in limits))
+    for engine in engines:
+        base, expected = time_run(engine, source, 0)
+        row = f'{engine:<10}{base * 1000:>14.1f}'
+        for limit in limits:
+            elapsed, output = time_run(engine, source, limit)
+            if output != expected:
+                raise SystemExit(f'{engine}: inlined output differs')
+            row += f'{elapsed * 1000:>12.1f}{base / elapsed:>8.1f}x'
+        print(row)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
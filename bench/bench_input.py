@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+读大量整数: 旧的逐个 input() 读一行 (用子类还原) 对比 TokenReader 逐个读和 cin >> a[] 整个数组读。
+
+    python bench/bench_input.py [n]        # 默认 100000 个整数, 在 tree 引擎上跑
+"""
+
+import io
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cp_engine import CalculateTree, UNSET
+from cp_resolve import LOCAL
+from cp_parser import calc_parser
+
+PER_TOKEN = """
+int n
+cin >> n
+int a[n]
+int x
+for (int i = 0; i < n; i++) {
+    cin >> x
+    a[i] = x
+}
+print(a[n - 1])
+"""
+
+ELEMENT = """
+int n
+cin >> n
+int a[n]
+for (int i = 0; i < n; i++) {
+    cin >> a[i]
+}
+print(a[n - 1])
+"""
+
+BULK = """
+int n
+cin >> n
+int a[n]
+cin >> a[]
+print(a[n - 1])
+"""
+
+
+class LineInputTree(CalculateTree):
+    """改动前的读法: 每个 >> 调一次 input(), 用 str(type(...)) 比较决定怎么转换"""
+
+    def input_factor_stmt(self, tree):
+        depth, slot = tree.address
+        frame = self.frame.slots if depth == LOCAL else self.global_vars
+        if frame[slot] is UNSET:
+            raise ValueError(f"Variable '{tree.children[0]}' not found")
+        x = input()
+        if str(type(frame[slot])) == '<class \'str\'>':
+            frame[slot] = x
+        elif str(type(frame[slot])) == '<class \'float\'>':
+            frame[slot] = float(x)
+        else:
+            frame[slot] = int(x)
+
+
+def measure(cls, program, data):
+    tree = calc_parser.parse(program)
+    stdin = sys.stdin
+    sys.stdin = io.StringIO(data)
+    try:
+        interpreter = cls(stdin=None)
+        t = time.perf_counter()
+        interpreter.execute(tree)
+        elapsed = time.perf_counter() - t
+    finally:
+        sys.stdin = stdin
+    return elapsed, interpreter.printResult
+
+
+def main(argv):
+    n = int(argv[0]) if argv else 100000
+    data = f'{n}\n' + '\n'.join(str(i * 7 % 1000003) for i in range(n)) + '\n'
+    cases = [
+        ('input() per token', LineInputTree, PER_TOKEN),
+        ('reader per token', CalculateTree, PER_TOKEN),
+        ('cin >> a[i]', CalculateTree, ELEMENT),
+        ('cin >> a[]', CalculateTree, BULK),
+    ]
+    print(f'{"case":<20}{"ms":>10}{"ns/int":>10}')
+    expected = None
+    for name, cls, program in cases:
+        elapsed, output = measure(cls, program, data)
+        if expected is None:
+            expected = output
+        elif output != expected:
+            raise SystemExit(f'{name}: output differs')
+        print(f'{name:<20}{elapsed * 1000:>10.1f}{elapsed * 1e9 / n:>10.0f}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
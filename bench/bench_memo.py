@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+递归纯函数记忆化前后的耗时: 同一个程序分别在关掉 memo pass 和打开时各跑一遍, 各取最好的一次, 输出必须相同;
+再列出各个函数缓存的命中情况。
+
+    python bench/bench_memo.py [engines] [program] [缓存容量]      # 默认所有引擎, memo_recursion.cp
+"""
+
+import io
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cp_optimize
+from cp_engine import ENGINES, make_interpreter
+from cp_parser import calc_parser
+
+PROGRAMS = os.path.join(ROOT, 'bench', 'programs')
+
+
+def time_run(engine, source, capacity=None, repeat=3):
+    best = None
+    for _ in range(repeat):
+        tree = calc_parser.parse(source)
+        interpreter = make_interpreter(engine, stdin=io.StringIO(), memo_capacity=capacity)
+        start = time.perf_counter()
+        interpreter.execute(tree)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, interpreter
+
+
+def main(argv):
+    engines = argv[0].split(',') if argv else list(ENGINES)
+    program = argv[1] if len(argv) > 1 else 'memo_recursion.cp'
+    capacity = int(argv[2]) if len(argv) > 2 else None
+    source = open(os.path.join(PROGRAMS, program), encoding='utf-8').read()
+    print(f'{"engine":<10}{"no memo ms":>12}{"memo ms":>10}{"speedup":>10}')
+    memos = []
+    for engine in engines:
+        cp_optimize.disabled.add('memo')
+        try:
+            base, interpreter = time_run(engine, source)
+        finally:
+            cp_optimize.disabled.discard('memo')
+        elapsed, memoized = time_run(engine, source, capacity)
+        if memoized.printResult != interpreter.printResult:
+            raise SystemExit(f'{engine}: memoized output differs')
+        print(f'{engine:<10}{base * 1000:>12.1f}{elapsed * 1000:>10.2f}{base / elapsed:>9.0f}x')
+        memos = memoized.memos
+    for memo in memos:
+        print(f'  {memo}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+长循环的内存曲线: 循环体里有 try/catch、函数调用和类方法调用,
+迭代次数翻倍时用 tracemalloc 记录执行期间的内存峰值, 峰值应当基本不变。
+
+    python bench/bench_memory.py [engine]
+"""
+
+import io
+import os
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cp_engine import make_interpreter
+from cp_parser import calc_parser
+
+PROGRAM = """
+class Counter {
+    int n = 0
+    func add(int k) {
+        int t = this.n
+        return t + k
+    }
+}
+Counter c = new Counter()
+func f(int x) {
+    int y = x * 2
+    try { int z = y / 0 } catch (e) { return y }
+    return 0
+}
+int total = 0
+for (int i = 0; i < %d; i++) {
+    try {
+        int a = f(i)
+        total += a + c.add(i)
+    } catch (e) {
+        print(e)
+    }
+}
+print(total)
+"""
+
+
+def peak(engine, iterations):
+    tree = calc_parser.parse(PROGRAM % iterations)
+    interpreter = make_interpreter(engine, stdin=io.StringIO())
+    tracemalloc.start()
+    interpreter.execute(tree)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main(argv):
+    engine = argv[0] if argv else 'tree'
+    print(f'{"iterations":>10}{"peak KiB":>12}')
+    for iterations in (1000, 2000, 4000, 8000):
+        print(f'{iterations:>10}{peak(engine, iterations) / 1024:>12.1f}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+输出量翻倍时的耗时: 每种 sink 上跑同一个只做 print 的循环, 每千行耗时应当基本不变。
+
+    python bench/bench_output.py [engine]
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cp_engine import make_interpreter
+from cp_output import CallbackSink, FileSink, MemorySink, StreamSink
+from cp_parser import calc_parser
+
+PROGRAM = """
+for (int i = 0; i < %d; i++) {
+    print(i, i * 2, i * 3, sep = ",")
+}
+"""
+
+
+def sinks(path):
+    chunks = []
+    return {
+        'memory': MemorySink,
+        'stream': lambda: StreamSink(io.StringIO()),
+        'file': lambda: FileSink(path),
+        'callback': lambda: CallbackSink(chunks.append),
+    }
+
+
+def elapsed(engine, tree, make_sink):
+    out = make_sink()
+    interpreter = make_interpreter(engine, stdin=io.StringIO(), out=out)
+    t = time.perf_counter()
+    interpreter.execute(tree)
+    out.close()
+    return time.perf_counter() - t
+
+
+def main(argv):
+    engine = argv[0] if argv else 'tree'
+    path = os.path.join(tempfile.mkdtemp(), 'out.txt')
+    makers = sinks(path)
+    print(f'{"lines":>8}' + ''.join(f'{name + " ms/1k":>16}' for name in makers))
+    for lines in (5000, 10000, 20000, 40000):
+        tree = calc_parser.parse(PROGRAM % lines)
+        print(f'{lines:>8}' + ''.join(f'{elapsed(engine, tree, make) * 1000000 / lines:>16.2f}'
+                                      for make in makers.values()))
+    os.remove(path)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
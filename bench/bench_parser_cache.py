@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+冷启动 / 热启动对比: 每次起一个新进程, 计时 import cp_parser (即构建 calc_parser)。
+
+    python bench/bench_parser_cache.py [runs]
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = (
+    "import time; import lark; t = time.perf_counter(); import cp_parser; "
+    "print(time.perf_counter() - t)"
+)
+
+
+def one_process(cache_dir):
+    env = dict(os.environ, CP_CACHE_DIR=cache_dir, PYTHONPATH=ROOT)
+    out = subprocess.run([sys.executable, '-c', PROBE], env=env, cwd=ROOT,
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.strip())
+
+
+def median(xs):
+    xs = sorted(xs)
+    return xs[len(xs) // 2]
+
+
+def main(runs=7):
+    no_cache = [one_process('') for _ in range(runs)]
+    cold = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as d:
+            cold.append(one_process(d))
+    with tempfile.TemporaryDirectory() as d:
+        one_process(d)
+        warm = [one_process(d) for _ in range(runs)]
+    print(f'{"mode":<10}{"median ms":>12}{"min ms":>12}')
+    for name, xs in (('no cache', no_cache), ('cold', cold), ('warm', warm)):
+        print(f'{name:<10}{median(xs) * 1000:>12.1f}{min(xs) * 1000:>12.1f}')
+    print(f'warm speedup vs no cache: {median(no_cache) / median(warm):.1f}x')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 7)
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+tree 引擎特化 (quickening) 前后的耗时: 每个程序分别在 QUICKEN = False (不特化) 和 True 时各跑一遍,
+各取最好的一次, 输出必须相同。热循环追踪编译 (cp_trace) 关掉, 只看特化本身。
+
+    python bench/bench_quicken.py [program ...]      # 默认几个整数循环的程序
+"""
+
+import io
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cp_engine
+import cp_trace
+from cp_engine import make_interpreter
+from cp_parser import calc_parser
+
+PROGRAMS = os.path.join(ROOT, 'bench', 'programs')
+DEFAULT = ['loop_arith.cp', 'nested_for.cp', 'arrays.cp', 'dp_table.cp', 'deep_scope.cp', 'matmul.cp']
+
+
+def time_run(source, quicken, repeat=3):
+    saved = cp_engine.QUICKEN
+    cp_engine.QUICKEN = quicken
+    try:
+        best = None
+        for _ in range(repeat):
+            tree = calc_parser.parse(source)
+            interpreter = make_interpreter('tree', stdin=io.StringIO())
+            start = time.perf_counter()
+            interpreter.execute(tree)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+    finally:
+        cp_engine.QUICKEN = saved
+    return best, interpreter.printResult
+
+
+def main(argv):
+    cp_trace.HOT_LOOP = 0
+    print(f'{"program":<16}{"generic ms":>12}{"quick ms":>10}{"speedup":>9}')
+    for program in argv or DEFAULT:
+        source = open(os.path.join(PROGRAMS, program), encoding='utf-8').read()
+        base, expected = time_run(source, False)
+        elapsed, output = time_run(source, True)
+        if output != expected:
+            raise SystemExit(f'{program}: quickened output differs')
+        print(f'{program:<16}{base * 1000:>12.1f}{elapsed * 1000:>10.1f}{base / elapsed:>8.2f}x')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
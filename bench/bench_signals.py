@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+CalculateTree 控制流信号的分配率: 统计每次 visit 返回的新 list (旧的 [code, value] 协议),
+再除以执行过的语句数, 同时给出耗时。
+
+    python bench/bench_signals.py [prog.cp ...]      # 默认 loop_arith.cp 和 nested_for.cp
+"""
+
+import io
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cp_engine import CalculateTree
+from cp_parser import calc_parser
+
+PROGRAMS = os.path.join(ROOT, 'bench', 'programs')
+
+# 会作为语句执行的结点 (表达式语句除外)
+STATEMENTS = {
+    'print_stmt', 'input_stmt', 'assign_stmt', 'reassign_stmt', 'self_add', 'self_sub',
+    'break_stmt', 'continue_stmt', 'return_stmt', 'array_def', 'array_assign',
+    'if_else_stmt', 'while_stmt', 'do_while_stmt', 'for_stmt', 'block_stmt',
+    'func_def_stmt', 'class_def', 'class_extends', 'class_instance', 'class_instance_trans',
+    'try_catch_stmt',
+}
+
+
+class CountingTree(CalculateTree):
+    def __init__(self, stdin=None):
+        super().__init__(stdin)
+        self.statements = 0
+        self.allocated = 0
+
+    def visit(self, tree):
+        result = super().visit(tree)
+        if tree.data in STATEMENTS or tree.data.startswith('aug_'):
+            self.statements += 1
+            if type(result) is list:
+                self.allocated += 1
+        return result
+
+
+def main(argv):
+    programs = argv or ['loop_arith.cp', 'nested_for.cp']
+    print(f'{"program":<16}{"statements":>12}{"signal lists":>14}{"per stmt":>10}{"plain ms":>10}')
+    for name in programs:
+        tree = calc_parser.parse(open(os.path.join(PROGRAMS, name), encoding='utf-8').read())
+        counter = CountingTree(stdin=io.StringIO())
+        counter.execute(tree)
+        interpreter = CalculateTree(stdin=io.StringIO())
+        t = time.perf_counter()
+        interpreter.execute(tree)
+        elapsed = time.perf_counter() - t
+        print(f'{name:<16}{counter.statements:>12}{counter.allocated:>14}'
+              f'{counter.allocated / max(counter.statements, 1):>10.2f}{elapsed * 1000:>10.1f}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+深递归: 尾递归和普通递归各跑到 depth 层, 列出每个引擎的耗时, 超过 Python 递归上限的记为 RecursionError;
+vm 再在关掉尾调用 (cp_vm.TAIL_CALLS = False) 时跑一遍。都用默认设置: 尾递归的函数不做记忆化, 普通递归的照常记忆化。
+
+    python bench/bench_tail_calls.py [engines] [depth]      # 默认所有引擎, 200000
+"""
+
+import io
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cp_vm
+from cp_engine import ENGINES, make_interpreter
+from cp_parser import calc_parser
+
+PROGRAMS = {
+    'tail': """
+func total(int n, int acc) {
+    if (n == 0) {
+        return acc
+    }
+    return total(n - 1, acc + n)
+}
+print(total(%d, 0))
+""",
+    'nested': """
+func total(int n) {
+    if (n == 0) {
+        return 0
+    }
+    return total(n - 1) + n
+}
+print(total(%d))
+""",
+}
+
+
+def time_run(engine, source):
+    tree = calc_parser.parse(source)
+    interpreter = make_interpreter(engine, stdin=io.StringIO())
+    start = time.perf_counter()
+    try:
+        interpreter.execute(tree)
+    except RecursionError:
+        return 'RecursionError'
+    return f'{(time.perf_counter() - start) * 1000:.1f} ms'
+
+
+def main(argv):
+    engines = argv[0].split(',') if argv else list(ENGINES)
+    depth = int(argv[1]) if len(argv) > 1 else 200000
+    rows = [(engine, engine) for engine in engines]
+    if 'vm' in engines:
+        rows.append(('vm', 'vm (no TCO)'))
+    print(f'{"engine":<14}' + ''.join(f'{name:>18}' for name in PROGRAMS))
+    for engine, label in rows:
+        cp_vm.TAIL_CALLS = label == engine
+        try:
+            print(f'{label:<14}' + ''.join(f'{time_run(engine, source % depth):>18}' for source in PROGRAMS.values()))
+        finally:
+            cp_vm.TAIL_CALLS = True
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+tree 引擎热循环追踪编译 (cp_trace) 前后的耗时: 每个程序分别在 HOT_LOOP = 0 (全部解释执行) 和默认值下各跑一遍,
+各取最好的一次, 输出必须相同。另外列出每个程序里 trace 执行的迭代次数。
+
+    python bench/bench_trace.py [program ...]      # 默认几个计数和累加循环的程序
+"""
+
+import io
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cp_trace
+from cp_engine import make_interpreter
+from cp_parser import calc_parser
+
+PROGRAMS = os.path.join(ROOT, 'bench', 'programs')
+DEFAULT = ['loop_arith.cp', 'nested_for.cp', 'arrays.cp', 'dp_table.cp', 'deep_scope.cp', 'matmul.cp']
+
+
+def time_run(source, hot, repeat=3):
+    saved = cp_trace.HOT_LOOP
+    cp_trace.HOT_LOOP = hot
+    try:
+        best = None
+        for _ in range(repeat):
+            tree = calc_parser.parse(source)
+            interpreter = make_interpreter('tree', stdin=io.StringIO())
+            start = time.perf_counter()
+            interpreter.execute(tree)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+    finally:
+        cp_trace.HOT_LOOP = saved
+    traced = sum(loop.iterations for loop in interpreter.loops)
+    return best, interpreter.printResult, traced
+
+
+def main(argv):
+    print(f'{"program":<16}{"interp ms":>11}{"trace ms":>10}{"speedup":>9}{"traced iters":>14}')
+    for program in argv or DEFAULT:
+        source = open(os.path.join(PROGRAMS, program), encoding='utf-8').read()
+        base, expected, _ = time_run(source, 0)
+        elapsed, output, traced = time_run(source, cp_trace.HOT_LOOP)
+        if output != expected:
+            raise SystemExit(f'{program}: traced output differs')
+        print(f'{program:<16}{base * 1000:>11.1f}{elapsed * 1000:>10.1f}{base / elapsed:>8.2f}x{traced:>14}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+静态类型检查省掉的运行时检查值多少: 同一个程序分别在照常标注和关掉标注 (cp_types.ELIDE_CHECKS = False,
+全部留到执行时检查) 时各跑几遍, 取最快的一次。
+
+    python bench/bench_types.py [engines] [program ...]      # 默认所有引擎, loop_arith.cp small_calls.cp matmul.cp
+"""
+
+import io
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cp_types
+from cp_engine import ENGINES, make_interpreter
+from cp_parser import calc_parser
+
+PROGRAMS = os.path.join(ROOT, 'bench', 'programs')
+REPEAT = 3
+
+
+def time_run(engine, source):
+    best = None
+    for _ in range(REPEAT):
+        tree = calc_parser.parse(source)
+        interpreter = make_interpreter(engine, stdin=io.StringIO())
+        start = time.perf_counter()
+        interpreter.execute(tree)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, interpreter.printResult
+
+
+def main(argv):
+    engines = list(ENGINES)
+    if argv and not argv[0].endswith('.cp'):
+        engines = argv[0].split(',')
+        argv = argv[1:]
+    programs = argv or ['loop_arith.cp', 'small_calls.cp', 'matmul.cp']
+    print(f'{"program":<18}{"engine":<10}{"checked ms":>12}{"typed ms":>12}{"speedup":>10}')
+    for program in programs:
+        source = open(os.path.join(PROGRAMS, program), encoding='utf-8').read()
+        for engine in engines:
+            cp_types.ELIDE_CHECKS = False
+            try:
+                checked, expected = time_run(engine, source)
+            finally:
+                cp_types.ELIDE_CHECKS = True
+            typed, output = time_run(engine, source)
+            if output != expected:
+                raise SystemExit(f'{program} {engine}: output differs without runtime type checks')
+            print(f'{program:<18}{engine:<10}{checked * 1000:>12.1f}{typed * 1000:>12.1f}{checked / typed:>9.2f}x')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
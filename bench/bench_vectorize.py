@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+for 循环向量化前后的耗时: 同一个程序分别在允许向量化和全部逐次执行 (cp_vectorize.numpy = None) 时各跑一遍。
+
+    python bench/bench_vectorize.py [engines] [program]      # 默认 closure,python, vector_loops.cp
+"""
+
+import io
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cp_vectorize
+from cp_engine import make_interpreter
+from cp_parser import calc_parser
+
+PROGRAMS = os.path.join(ROOT, 'bench', 'programs')
+
+
+def time_run(engine, source):
+    tree = calc_parser.parse(source)
+    interpreter = make_interpreter(engine, stdin=io.StringIO())
+    start = time.perf_counter()
+    interpreter.execute(tree)
+    return time.perf_counter() - start, interpreter.printResult
+
+
+def main(argv):
+    engines = argv[0].split(',') if argv else ['closure', 'python']
+    program = argv[1] if len(argv) > 1 else 'vector_loops.cp'
+    source = open(os.path.join(PROGRAMS, program), encoding='utf-8').read()
+    print(f'{"engine":<10}{"scalar ms":>12}{"vector ms":>12}{"speedup":>10}')
+    for engine in engines:
+        saved = cp_vectorize.numpy
+        cp_vectorize.numpy = None
+        try:
+            scalar, expected = time_run(engine, source)
+        finally:
+            cp_vectorize.numpy = saved
+        vector, output = time_run(engine, source)
+        if output != expected:
+            raise SystemExit(f'{engine}: vectorized output differs')
+        print(f'{engine:<10}{scalar * 1000:>12.1f}{vector * 1000:>12.1f}{scalar / vector:>9.0f}x')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
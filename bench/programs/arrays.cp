@@ -0,0 +1,13 @@
+!! 数组读写
+int n = 20000
+int a[20000]
+for (int i = 0; i < n; i++) {
+  a[i] = i * 3 % 101
+}
+int s = 0
+for (int r = 0; r < 2; r++) {
+  for (int i = 0; i < n; i++) {
+    s += a[i]
+  }
+}
+print(s)
@@ -0,0 +1,12 @@
+!! 循环里的常量表达式和字面量
+int total = 0
+float scale = 0.0
+string tag = ""
+for (int i = 0; i < 30000; i++) {
+    total = total + (2 * 1024 + 7) % (64 - 1) + (1 << 4)
+    scale = scale + 1.5 * 2.0 / (3 - 1)
+    if (i % (10 * 10) == 0 && True) {
+        tag = "k" + "v"
+    }
+}
+print(total, scale, tag)
@@ -0,0 +1,29 @@
+!! 循环里常量条件的分支和 return 后面的语句
+func step(int x) {
+    if (2 > 3) {
+        print("trace", x)
+    } elif (1 == 1) {
+        return x % 7 + 1
+    }
+    return 0
+    print("unreachable")
+}
+func trace(int x) {
+    print("trace", x)
+    return trace(x - 1)
+}
+int total = 0
+for (int i = 0; i < 20000; i++) {
+    if (False) {
+        print(trace(i))
+    }
+    if (0 > 1 || 2 < 1) {
+        total = total - 1
+    } else {
+        total = total + step(i)
+    }
+    while (1 < 0) {
+        total = 0
+    }
+}
+print(total)
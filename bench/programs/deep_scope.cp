@@ -0,0 +1,18 @@
+!! 深层嵌套的块里读写外层变量
+int total = 0
+for (int i = 0; i < 400; i++) {
+  int a = i
+  if (a >= 0) {
+    int b = a + 1
+    if (b > 0) {
+      int c = b + 1
+      if (c > 0) {
+        int d = c + 1
+        for (int k = 0; k < 50; k++) {
+          total += a + b + c + d + k
+        }
+      }
+    }
+  }
+}
+print(total)
@@ -0,0 +1,25 @@
+!! 二维 DP: 两个序列的最长公共子序列
+int n = 120
+int x[n]
+int y[n]
+for (int i = 0; i < n; i++) {
+  x[i] = (i * 13 + 5) % 7
+  y[i] = (i * 17 + 3) % 7
+}
+int dp[n + 1][n + 1]
+for (int i = 1; i <= n; i++) {
+  for (int j = 1; j <= n; j++) {
+    if (x[i - 1] == y[j - 1]) {
+      dp[i][j] = dp[i - 1][j - 1] + 1
+    } else {
+      int up = dp[i - 1][j]
+      int left = dp[i][j - 1]
+      if (up > left) {
+        dp[i][j] = up
+      } else {
+        dp[i][j] = left
+      }
+    }
+  }
+}
+print(dp[n][n])
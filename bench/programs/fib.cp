@@ -0,0 +1,8 @@
+!! 递归函数调用
+func fib(int x) {
+  if (x < 2) {
+    return x
+  }
+  return fib(x - 1) + fib(x - 2)
+}
+print(fib(20))
@@ -0,0 +1,8 @@
+!! while 循环里的整数运算
+int i = 0
+int total = 0
+while (i < 50000) {
+  total = (total + i * i % 7 + (i >> 1)) % 1000003
+  i++
+}
+print(total)
@@ -0,0 +1,27 @@
+!! 循环条件和循环体里反复计算的不变量: n * n、obj.size、this.len
+class Buffer {
+    int len = 60
+    int base = 3
+    func total() {
+        int t = 0
+        int i = 0
+        while (i < this.len * this.base) {
+            t = t + (this.len - this.base) * 2 + i % this.base
+            i++
+        }
+        return t
+    }
+}
+Buffer buf = new Buffer()
+int n = 90
+int w = 7
+int acc = 0
+int i = 0
+while (i < n * n) {
+    acc = acc + (w * w + n) % 13 + buf.len
+    i++
+}
+for (int r = 0; r < 40; r++) {
+    acc = acc + buf.total() % 100
+}
+print(acc)
@@ -0,0 +1,25 @@
+!! 矩阵乘法, 二维数组
+int n = 24
+int a[n][n]
+int b[n][n]
+int c[n][n]
+for (int i = 0; i < n; i++) {
+  for (int j = 0; j < n; j++) {
+    a[i][j] = (i * 7 + j) % 10
+    b[i][j] = (i + j * 3) % 10
+  }
+}
+for (int i = 0; i < n; i++) {
+  for (int j = 0; j < n; j++) {
+    int s = 0
+    for (int k = 0; k < n; k++) {
+      s += a[i][k] * b[k][j]
+    }
+    c[i][j] = s
+  }
+}
+int trace = 0
+for (int i = 0; i < n; i++) {
+  trace += c[i][i]
+}
+print(trace, c[n - 1][0])
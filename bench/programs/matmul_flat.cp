@@ -0,0 +1,25 @@
+!! 与 matmul.cp 相同, 用一维数组手工算 i * n + j
+int n = 24
+int a[n * n]
+int b[n * n]
+int c[n * n]
+for (int i = 0; i < n; i++) {
+  for (int j = 0; j < n; j++) {
+    a[i * n + j] = (i * 7 + j) % 10
+    b[i * n + j] = (i + j * 3) % 10
+  }
+}
+for (int i = 0; i < n; i++) {
+  for (int j = 0; j < n; j++) {
+    int s = 0
+    for (int k = 0; k < n; k++) {
+      s += a[i * n + k] * b[k * n + j]
+    }
+    c[i * n + j] = s
+  }
+}
+int trace = 0
+for (int i = 0; i < n; i++) {
+  trace += c[i * n + i]
+}
+print(trace, c[(n - 1) * n])
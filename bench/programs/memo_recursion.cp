@@ -0,0 +1,21 @@
+!! 朴素递归: 斐波那契、网格路径数、组合数, 同样的参数反复算
+int MOD = 1000000007
+func fib(int n) {
+    if (n < 2) {
+        return n
+    }
+    return (fib(n - 1) + fib(n - 2)) % MOD
+}
+func paths(int r, int c) {
+    if (r == 0 || c == 0) {
+        return 1
+    }
+    return paths(r - 1, c) + paths(r, c - 1)
+}
+func choose(int n, int k) {
+    if (k == 0 || k == n) {
+        return 1
+    }
+    return choose(n - 1, k - 1) + choose(n - 1, k)
+}
+print(fib(20), paths(8, 8), choose(16, 8))
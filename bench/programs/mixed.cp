@@ -0,0 +1,17 @@
+!! 浮点, 字符串与 try/catch
+float x = 0.5
+int k = 0
+string tag = ""
+while (k < 3000) {
+  x = x * 1.000001 + 0.25
+  if (k % 500 == 0) {
+    tag += "#"
+  }
+  try {
+    x = x / 1
+  } catch (e) {
+    print(e)
+  }
+  k++
+}
+print(x, tag, sep=" | ")
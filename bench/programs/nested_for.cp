@@ -0,0 +1,9 @@
+!! 二重 for 循环
+int n = 200
+int acc = 0
+for (int i = 0; i < n; i++) {
+  for (int j = 0; j < n; j++) {
+    acc += (i ^ j) & 15
+  }
+}
+print(acc)
@@ -0,0 +1,21 @@
+!! 对象字段与方法调用
+class Counter {
+  int step = 3
+  func next(int x) {
+    return x + this.step
+  }
+}
+class Fast extends Counter {
+  int step = 5
+  func next(int x) {
+    return super.next(x) + this.step
+  }
+}
+Counter c = new Counter()
+Fast f = new Fast()
+int v = 0
+for (int i = 0; i < 10000; i++) {
+  v = c.next(v) % 9973
+  v = f.next(v) % 9973
+}
+print(v, c.step, f.step)
@@ -0,0 +1,37 @@
+!! 三层继承: 字段读取、this/super 方法调用和重载分派
+class Shape {
+  int w = 2
+  int h = 3
+  func area() {
+    return this.w * this.h
+  }
+  func scale(int k) {
+    return this.area() * k
+  }
+  func scale(float k) {
+    return this.area() * k
+  }
+}
+class Box extends Shape {
+  int d = 4
+  func area() {
+    return super.area() * this.d
+  }
+}
+class Cube extends Box {
+  int w = 4
+  int h = 4
+  func area() {
+    return super.area() + this.w + super.w
+  }
+}
+Shape s = new Shape()
+Box b = new Box()
+Cube c = new Cube()
+int acc = 0
+float facc = 0.0
+for (int i = 0; i < 3000; i++) {
+  acc = (acc + s.scale(i) + b.scale(i) + c.scale(i) + c.w + b.d) % 100003
+  facc = facc + c.scale(0.5)
+}
+print(acc, facc)
@@ -0,0 +1,7 @@
+!! 大量输出: sep 和 end 都会写进输出
+int n = 3000
+for (int i = 0; i < n; i++) {
+  print(i, i * 2, i * 3, i * 4, i * 5, sep = ",")
+  print(i % 7, i % 11, end = " ")
+  print(i % 13)
+}
@@ -0,0 +1,20 @@
+!! 循环里调用只有一条 return 的小函数
+func sq(int x) {
+    return x * x
+}
+func clamp(int v, int hi) {
+    return v % hi
+}
+func dist2(int x, int y) {
+    return sq(x) + sq(y)
+}
+func scaled(float v) {
+    return v * 0.5 + 1.0
+}
+int total = 0
+float f = 0.0
+for (int i = 0; i < 20000; i++) {
+    total = total + clamp(dist2(i % 50, i % 30), 1000) + sq(i % 7)
+    f = f + scaled(1.5)
+}
+print(total, f)
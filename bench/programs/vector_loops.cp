@@ -0,0 +1,25 @@
+!! 可以整体向量化的数组循环
+int n = 200000
+float x[n]
+float y[n]
+float z[n]
+int idx[n]
+for (int i = 0; i < n; i++) {
+    idx[i] = i % 1000
+}
+for (int i = 0; i < n; i++) {
+    x[i] = idx[i] * 0.5
+    y[i] = idx[i] / 4 + 1
+}
+int rounds = 10
+int r = 0
+while (r < rounds) {
+    for (int i = 0; i < n; i++) {
+        z[i] = x[i] * 2.5 + y[i] - r
+    }
+    for (int i = 1; i < n - 1; i++) {
+        y[i] = z[i - 1] + z[i + 1] - x[i]
+    }
+    r++
+}
+print(z[0], z[n - 1], y[1], y[n - 2])
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+检查优化前后输出一致: bench/programs 下 (或者命令行给出) 的每个程序在每个引擎上用 cp_optimize.verify 比较,
+同时列出各个 pass 的统计。
+
+    python bench/verify_optimize.py [engines] [program.cp ...]     # 默认所有引擎, bench/programs/*.cp
+"""
+
+import copy
+import glob
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cp_builtins import bind_builtins
+from cp_engine import ENGINES
+from cp_optimize import optimize, verify
+from cp_parser import calc_parser
+
+
+def main(argv):
+    engines = list(ENGINES)
+    if argv and not argv[0].endswith('.cp'):
+        engines = argv[0].split(',')
+        argv = argv[1:]
+    programs = argv or sorted(glob.glob(os.path.join(ROOT, 'bench', 'programs', '*.cp')))
+    failures = 0
+    for path in programs:
+        source = open(path, encoding='utf-8').read()
+        tree = calc_parser.parse(source)
+        bind_builtins(tree)
+        stats = optimize(copy.deepcopy(tree))
+        print(os.path.basename(path))
+        for name, stat in stats.items():
+            print(f'    {name}: {stat}')
+        for engine in engines:
+            same, expected, actual = verify(source, engine)
+            if not same:
+                failures += 1
+                print(f'FAIL {engine}:\n--- expected\n{expected}\n--- actual\n{actual}')
+    if failures:
+        raise SystemExit(f'{failures} failures')
+    print(f'{len(programs)} programs, {len(engines)} engines: output unchanged')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+检查热循环追踪编译 (cp_trace) 的正确性: 每个程序在 tree 引擎上跑两遍, 一遍打开追踪编译 (HOT_LOOP 调低,
+很快就生成 trace), 一遍把 cp_trace.HOT_LOOP 置为 0 (全部解释执行), 比较输出 (包括报错) 和结束时的数组。
+CASES 是固定的例子, 并检查其中的循环是否真的执行了 trace; 另外按种子随机生成一批带分支、break/continue、
+类型变化和运行时错误的循环。
+
+    python bench/verify_trace.py [随机程序个数] [种子]     # 默认 300, 1
+"""
+
+import io
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cp_trace
+from cp_engine import make_interpreter
+from cp_parser import calc_parser
+
+HOT_LOOP = 3
+
+SETUP = """
+int n = 30
+int a[n]
+float c[n]
+string w[n]
+bool m[n]
+int g[4][5]
+int k = 3
+float x = 0.5
+string s = "ab"
+bool t = True
+func h(int v) {
+    return v * 2 + 1
+}
+"""
+
+# (名字, 程序, 是否应该执行 trace)
+CASES = [
+    ('count', "int i = 0\nwhile (i < 1000) {\n i++\n}\nprint(i)", True),
+    ('sum', "int acc = 0\nfor (int i = 0; i < 500; i++) {\n acc += i * i % 7\n}\nprint(acc)", True),
+    ('float_acc', "float f = 0.0\nfor (int i = 1; i < 300; i++) {\n f = f + 1 / i\n}\nprint(f)", True),
+    ('do_while', "int i = 0\ndo {\n i += 3\n} while (i < 1000)\nprint(i)", True),
+    ('branches', "int p = 0\nint q = 0\nfor (int i = 0; i < 200; i++) {\n if (i % 2 == 0) {\n  p++\n }"
+                 " elif (i % 3 == 0) {\n  q += i\n } else {\n  p = p - q\n }\n}\nprint(p, q)", True),
+    ('late_branch', "int p = 0\nfor (int i = 0; i < 200; i++) {\n if (i > 150) {\n  p += 2\n }\n p++\n}\nprint(p)", True),
+    ('break', "int i = 0\nwhile (True) {\n i++\n if (i == 700) {\n  break\n }\n}\nprint(i)", True),
+    ('continue_for', "int p = 0\nfor (int i = 0; i < 100; i++) {\n if (i % 4 == 1) {\n  continue\n }\n p += i\n}\nprint(p)", True),
+    ('continue_while', "int i = 0\nint p = 0\nwhile (i < 100) {\n i++\n if (i % 4 == 1) {\n  continue\n }\n p += i\n}\nprint(p)", True),
+    ('continue_do', "int i = 0\nint p = 0\ndo {\n i++\n if (i % 4 == 1) {\n  continue\n }\n p += i\n} while (i < 100)\nprint(p)", True),
+    ('arrays', "int i = 0\nwhile (i < n) {\n a[i] = i * k\n c[i] = a[i] / 2\n i++\n}\nprint(a[n - 1], c[3])", True),
+    ('array_sum', "for (int i = 0; i < n; i++) {\n a[i] = i\n}\nint acc = 0\nint r = 0\n"
+                  "while (r < 50) {\n acc += a[r % n]\n r++\n}\nprint(acc)", True),
+    ('matrix', "for (int i = 0; i < 20; i++) {\n g[i % 4][i % 5] = g[i % 4][i % 5] + i\n}\nprint(g[3][4], g[0][0])", True),
+    ('strings', "string r = \"\"\nfor (int i = 0; i < 50; i++) {\n w[i % n] = s + \"x\"\n r = r + w[i % n]\n}\nprint(len(r))", True),
+    ('bools', "for (int i = 0; i < n; i++) {\n m[i] = i % 3 == 0\n}\nprint(m[3], m[4])", True),
+    ('print', "for (int i = 0; i < 20; i++) {\n print(i, i * x, s, sep=\",\", end=\";\")\n}\nprint()", True),
+    ('widen', "int i = 0\nwhile (i < n) {\n a[i] = 2147000000 + i * 20000 + a[i]\n i++\n}\nprint(a[n - 1])", True),
+    ('pow', "int p = 1\nfor (int i = 0; i < 20; i++) {\n p = p + k ** (i % 4)\n}\nprint(p)", True),
+    ('pow_negative', "float p = 1.0\nint e = 2\nfor (int i = 0; i < 20; i++) {\n e = 2 - i % 4\n"
+                     " p = p + k ** e\n}\nprint(p)", True),
+    ('declare', "int p = 0\nfor (int i = 0; i < 50; i++) {\n int d = i * 2\n float e\n p += d\n}\nprint(p)", True),
+    ('call', "int p = 0\nfor (int i = 0; i < 50; i++) {\n p += h(i)\n}\nprint(p)", False),
+    ('call_later', "int p = 0\nfor (int i = 0; i < 50; i++) {\n p++\n p += h(i)\n}\nprint(p)", True),
+    ('nested', "int p = 0\nfor (int i = 0; i < 30; i++) {\n for (int j = 0; j < i; j++) {\n  p += j\n }\n}\nprint(p)", True),
+    ('zero_div', "int p = 100\nfor (int i = 10; i > 0 - 5; i--) {\n p += 100 // i\n}\nprint(p)", True),
+    ('out_of_range', "int p = 0\nfor (int i = 0; i < 100; i++) {\n p += a[i]\n}\nprint(p)", True),
+    ('negative_index', "int p = 0\nfor (int i = 20; i > 0 - 40; i--) {\n p += a[i]\n}\nprint(p)", True),
+    ('type_error', "int p = 0\nfor (int i = 0; i < 50; i++) {\n p = k ** (30 - i)\n}\nprint(p)", True),
+    ('mismatch', "int i = 0\nwhile (i < n) {\n a[i] = k ** (19 - i)\n i++\n}\nprint(a[1])", True),
+    ('try', "int p = 0\nfor (int i = 0; i < 50; i++) {\n try {\n  p += 10 // (i % 5)\n } catch (e) {\n  print(e)\n }\n}\nprint(p)", False),
+    ('invariant_branches', "int p = 0\nfor (int i = 1; i < 20; i++) {\n for (int j = 0; j < 30; j++) {\n"
+                           "  if (j % 7 == 0) {\n   p += a[i - 1] + j\n  } else {\n   p += (i * k) % 5\n  }\n }\n}\nprint(p)", True),
+    ('global_later', "int p = 0\nfor (int i = 0; i < 50; i++) {\n p++\n}\nint late = 3\nprint(p, late)", True),
+    ('func_loop', "func f(int v) {\n int acc = 0\n for (int i = 0; i < v; i++) {\n  acc += i\n  if (acc > 1000) {\n"
+                  "   return acc\n  }\n }\n return acc\n}\nprint(f(10), f(30), f(100), f(5))", True),
+    ('short', "int p = 0\nfor (int i = 0; i < 2; i++) {\n p++\n}\nprint(p)", False),
+]
+
+OPS = ['+', '-', '*', '/', '//', '%', '**', '&', '|']
+INT_OPS = ['+', '-', '*', '//', '%', '&', '|']
+
+
+def random_expr(rng, depth, floats):
+    # floats 为假时多半只用 int 的运算数和运算, 偶尔混进 float 或 string, 制造类型不符和 guard 失败
+    if floats is False and rng.random() < 0.03:
+        floats = True
+    if depth <= 0 or rng.random() < 0.3:
+        kind = rng.random()
+        if kind < 0.4:
+            return rng.choice(['i', 'p', 'q', 'r'] if floats else ['i', 'p', 'q'])
+        if kind < 0.55:
+            return f'a[{rng.choice(["i", "i % n", "i + 1", "k"])} % n]'
+        if kind < 0.62:
+            return 'c[i % n]' if floats else 'k'
+        if kind < 0.65:
+            return 'h(i)'
+        if kind < 0.66:
+            return 's'
+        return rng.choice(['1', '2', '0', '3', '2.5', 'k', 'x'] if floats else ['1', '2', '0', '3', 'k'])
+    ops = OPS if floats else INT_OPS
+    left, right = random_expr(rng, depth - 1, floats), random_expr(rng, depth - 1, floats)
+    return f'({left} {rng.choice(ops)} {right})'
+
+
+def random_stmt(rng, depth):
+    kind = rng.random()
+    name = rng.choice(['p', 'q'])
+    if kind < 0.2:
+        # 取模让数值不会越算越大
+        return f'{name} = {random_expr(rng, 2, False)} % 1000'
+    if kind < 0.25:
+        return f'r = {random_expr(rng, 2, True)} * 0.5'
+    if kind < 0.35:
+        return f'{name} {rng.choice(["+=", "-="])} {random_expr(rng, 1, False)}'
+    if kind < 0.4:
+        return f'r {rng.choice(["+=", "-=", "*=", "/="])} {random_expr(rng, 1, True)}'
+    if kind < 0.5:
+        return f'{name}{rng.choice(["++", "--"])}'
+    if kind < 0.6:
+        return f'a[{rng.choice(["i", "p", "i * 2"])} % n] = {random_expr(rng, 1, False)} % 1000'
+    if kind < 0.65:
+        return f'c[i % n] = {random_expr(rng, 1, True)}'
+    if kind < 0.7:
+        return f'print({random_expr(rng, 1, True)}, end=" ")'
+    if kind < 0.73:
+        return rng.choice(['break', 'continue'])
+    if kind < 0.88 and depth < 2:
+        condition = f'{random_expr(rng, 1, False)} {rng.choice(["<", ">", "=="])} {random_expr(rng, 1, True)}'
+        lines = [f'if ({condition}) {{']
+        lines += [random_stmt(rng, depth + 1) for _ in range(rng.randint(1, 2))]
+        if rng.random() < 0.4:
+            lines.append(f'}} elif (i % {rng.randint(2, 5)} == 0) {{')
+            lines.append(random_stmt(rng, depth + 1))
+        if rng.random() < 0.5:
+            lines.append('} else {')
+            lines.append(random_stmt(rng, depth + 1))
+        lines.append('}')
+        return '\n'.join(lines)
+    return f'int d{rng.randint(0, 99)} = {random_expr(rng, 1, False)}'
+
+
+def random_program(rng):
+    head = "int p = 1\nint q = 2\nfloat r = 0.5\nint i = 0\n"
+    body = '\n'.join(random_stmt(rng, 0) for _ in range(rng.randint(1, 5)))
+    count = rng.randint(5, 80)
+    loop = rng.random()
+    if loop < 0.4:
+        program = f"for (i = 0; i < {count}; i++) {{\n{body}\n}}"
+    elif loop < 0.7:
+        program = f"while (i < {count}) {{\ni++\n{body}\n}}"
+    else:
+        program = f"do {{\ni++\n{body}\n}} while (i < {count})"
+    return head + program + "\nprint(i, p, q, r)\n"
+
+
+def snapshot(source):
+    tree = calc_parser.parse(source)
+    interpreter = make_interpreter('tree', stdin=io.StringIO())
+    try:
+        interpreter.execute(tree)
+        error = None
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+    arrays = {name: (getattr(storage, 'typecode', type(storage).__name__), list(storage))
+              for name, storage in interpreter.arrays.items()}
+    traced = sum(loop.iterations for loop in getattr(interpreter, 'loops', []))
+    return (interpreter.printResult, error, arrays), traced
+
+
+def compare(source):
+    """返回 (结果是否一致, trace 执行的迭代次数)"""
+    saved = cp_trace.HOT_LOOP
+    try:
+        cp_trace.HOT_LOOP = HOT_LOOP
+        traced, count = snapshot(source)
+        cp_trace.HOT_LOOP = 0
+        expected, _ = snapshot(source)
+    finally:
+        cp_trace.HOT_LOOP = saved
+    if traced != expected:
+        print(f'  traced:   {traced[:2]}\n  expected: {expected[:2]}')
+    return traced == expected, count
+
+
+def main(argv):
+    total = int(argv[0]) if argv else 300
+    seed = int(argv[1]) if len(argv) > 1 else 1
+    failures = 0
+    for name, body, expected in CASES:
+        same, count = compare(SETUP + body + "\n")
+        if not same or (count > 0) != expected:
+            failures += 1
+            print(f'FAIL {name}: same={same} traced={count}')
+    rng = random.Random(seed)
+    traced = 0
+    for number in range(total):
+        body = random_program(rng)
+        same, count = compare(SETUP + body)
+        traced += count > 0
+        if not same:
+            failures += 1
+            print(f'FAIL random #{number}:\n{body}')
+    print(f'tree     {len(CASES)} cases, {total} random programs ({traced} traced)')
+    if failures:
+        raise SystemExit(f'{failures} failures')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
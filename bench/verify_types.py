@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+检查静态类型检查 (cp_types) 的正确性:
+    运算的结果类型: binary_type/unary_type 与 Python 对样本值实际运算的结果比较, 说是一定出错的必须抛 TypeError;
+    程序: bench/programs 和按种子随机生成的程序在每个引擎上跑两遍, 一遍照常 (执行前检查, 跳过标注的检查),
+    一遍关掉 cp_types.REJECT 和 ELIDE_CHECKS (全部留到执行时检查), 比较输出和报错;
+    执行前报错的程序, 不检查地执行也必须报错: 一般是同一种异常, 前面的语句先出了别的错时另外计数;
+    例外是 UNREACHABLE: 一定出错的语句执行不到, 不检查地执行不会报错, 但执行不到的代码也检查, 执行前照样报错。
+
+    python bench/verify_types.py [engines] [随机程序个数] [种子]     # 默认所有引擎, 200, 1
+"""
+
+import glob
+import io
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cp_types
+from cp_engine import ENGINES, make_interpreter
+from cp_parser import calc_parser
+from cp_runtime import OPERATORS
+from cp_types import binary_type, known, unary_type
+from lark import Tree
+
+SAMPLES = {
+    int: [0, 3, -2, 7],
+    float: [0.0, 0.5, -1.5],
+    str: ['', 'ab', '%d'],
+    bool: [True, False],
+}
+
+UNARY = {'neg_op': lambda a: ~a, 'not_op': lambda a: not a}
+
+SETUP = """
+int i = 3
+int j = 0 - 2
+float f = 1.5
+string s = "ab"
+bool t = True
+func g(int a, float b) {
+    return a * b
+}
+func g(string a) {
+    return a + "!"
+}
+func h(int a) {
+    int c = a
+    c = c + 1
+    c++
+    return c
+}
+"""
+
+VARS = {'i': 'int', 'j': 'int', 'f': 'float', 's': 'string', 't': 'bool'}
+LITERALS = ['0', '1', '2', '2.5', '"x"', 'True', 'False']
+OPS = ['+', '-', '*', '/', '//', '%', '**', '&', '|', '<<', '<', '==']
+TYPE_NAMES = ['int', 'float', 'string', 'bool']
+
+# 执行不到的一定出错的语句: 没走的分支, 没调用的函数, 一次也不执行的循环
+UNREACHABLE = [
+    'int x = 1\nif (x > 100) {\n    x = "a"\n}\nprint("ok")\n',
+    'func bad(int x) {\n    return x + "a"\n}\nprint("ok")\n',
+    'int y = 0\nfor (int i = 0; i < 0; i++) {\n    y = 1.5\n}\nprint("ok")\n',
+]
+
+
+def check_operators():
+    failures = 0
+    for data, op in OPERATORS.items():
+        for a in SAMPLES:
+            for b in SAMPLES:
+                for x in SAMPLES[a]:
+                    for y in SAMPLES[b]:
+                        failures += not agrees(binary_type(data, a, b, Tree('const', [y])), op, x, y)
+    for data, op in UNARY.items():
+        for a in SAMPLES:
+            for x in SAMPLES[a]:
+                failures += not agrees(unary_type(data, a), op, x)
+    return failures
+
+
+def agrees(expected, op, *values):
+    # 一定出错时必须抛 TypeError; 确定类型时, 没出错就必须是这个类型 (除零、溢出等照常报错)
+    try:
+        result = op(*values)
+    except TypeError:
+        # 字符串格式化 (%) 的格式与参数不符时也抛 TypeError
+        if expected is None or not known(expected) or expected is str and type(values[0]) is str:
+            return True
+        print(f'FAIL operator {values!r}: TypeError, expected {expected.__name__}')
+        return False
+    except (ZeroDivisionError, ValueError, OverflowError):
+        if expected is not None:
+            return True
+        print(f'FAIL operator {values!r}: expected TypeError')
+        return False
+    if expected is None or known(expected) and type(result) is not expected:
+        print(f'FAIL operator {values!r}: {type(result).__name__}, expected {expected}')
+        return False
+    return True
+
+
+def random_expr(rng, depth):
+    if depth <= 0 or rng.random() < 0.3:
+        kind = rng.random()
+        if kind < 0.55:
+            return rng.choice(list(VARS))
+        if kind < 0.7:
+            return f'h({random_expr(rng, 0)})'
+        return rng.choice(LITERALS)
+    if rng.random() < 0.1:
+        return f'g({random_expr(rng, depth - 1)})'
+    left, right = random_expr(rng, depth - 1), random_expr(rng, depth - 1)
+    return f'({left} {rng.choice(OPS)} {right})'
+
+
+def random_stmt(rng, names):
+    kind = rng.random()
+    name = rng.choice(list(VARS))
+    if kind < 0.3:
+        return f'{name} = {random_expr(rng, 2)}'
+    if kind < 0.4:
+        return f'{name}{rng.choice(["++", "--"])}'
+    if kind < 0.5:
+        return f'{name} {rng.choice(["+=", "*=", "-="])} {random_expr(rng, 1)}'
+    if kind < 0.65:
+        names.append(f'v{len(names)}')
+        return f'{rng.choice(TYPE_NAMES)} {names[-1]} = {random_expr(rng, 2)}'
+    if kind < 0.75:
+        return f'print(g({random_expr(rng, 1)}, {random_expr(rng, 1)}))'
+    return f'print({random_expr(rng, 2)})'
+
+
+def random_program(rng):
+    # 大部分语句放进 try, 让一个程序里出错的语句不止一处
+    names = []
+    lines = []
+    for _ in range(rng.randint(3, 8)):
+        stmt = random_stmt(rng, names)
+        if rng.random() < 0.9:
+            stmt = f'try {{\n {stmt}\n}} catch (e) {{\n print(e)\n}}'
+        lines.append(stmt)
+    lines.append('print(i, j, f, s, t)')
+    return '\n'.join(lines) + '\n'
+
+
+def run(engine, source):
+    tree = calc_parser.parse(source)
+    interpreter = make_interpreter(engine, stdin=io.StringIO())
+    try:
+        interpreter.execute(tree)
+        error = None
+    except Exception as e:
+        error = e
+    return interpreter.printResult, error
+
+
+def compare(engine, source):
+    """返回 (是否一致, 执行前报错时不检查地执行抛的是不是同一种异常, 没有在执行前报错时为 None)"""
+    output, error = run(engine, source)
+    cp_types.REJECT = cp_types.ELIDE_CHECKS = False
+    try:
+        expected, expected_error = run(engine, source)
+    finally:
+        cp_types.REJECT = cp_types.ELIDE_CHECKS = True
+    rejected = error is not None and not output and str(error).startswith('line ')
+    if rejected:
+        return expected_error is not None, type(error) is type(expected_error)
+    same_error = (type(error), str(error)) == (type(expected_error), str(expected_error))
+    return output == expected and same_error, None
+
+
+def rejects_unreachable(engine, source):
+    # 执行前报错, 不检查时照常执行完
+    output, error = run(engine, source)
+    cp_types.REJECT = cp_types.ELIDE_CHECKS = False
+    try:
+        expected, expected_error = run(engine, source)
+    finally:
+        cp_types.REJECT = cp_types.ELIDE_CHECKS = True
+    return not output and str(error).startswith('line ') and expected == 'ok\n' and expected_error is None
+
+
+def main(argv):
+    engines = list(ENGINES)
+    if argv and not argv[0].isdigit():
+        engines = argv[0].split(',')
+        argv = argv[1:]
+    total = int(argv[0]) if argv else 200
+    seed = int(argv[1]) if len(argv) > 1 else 1
+    failures = check_operators()
+    programs = sorted(glob.glob(os.path.join(ROOT, 'bench', 'programs', '*.cp')))
+    for engine in engines:
+        for path in programs:
+            same, _ = compare(engine, open(path, encoding='utf-8').read())
+            if not same:
+                failures += 1
+                print(f'FAIL {engine} {os.path.basename(path)}')
+        for source in UNREACHABLE:
+            if not rejects_unreachable(engine, source):
+                failures += 1
+                print(f'FAIL {engine} unreachable:\n{source}')
+        rng = random.Random(seed)
+        rejected = earlier = 0
+        for number in range(total):
+            body = random_program(rng)
+            same, same_type = compare(engine, SETUP + body)
+            rejected += same_type is not None
+            earlier += same_type is False
+            if not same:
+                failures += 1
+                print(f'FAIL {engine} random #{number}:\n{body}')
+        print(f'{engine:<8} {len(programs)} programs, {len(UNREACHABLE)} unreachable, {total} random programs '
+              f'({rejected} rejected before running, {earlier} of them failed earlier with another error)')
+    if failures:
+        raise SystemExit(f'{failures} failures')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
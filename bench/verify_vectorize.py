@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+检查 for 循环向量化的正确性: 每个程序在每个引擎上跑两遍, 一遍允许向量化, 一遍把 cp_vectorize.numpy
+置为 None (全部逐次执行), 比较输出 (包括报错) 和结束时每个数组的存储类型与内容。
+CASES 是固定的例子, 并检查其中的循环是否真的走了向量化 (SETUP 用 while 循环, 不参与计数); 另外按种子随机生成一批循环。
+
+    python bench/verify_vectorize.py [engines] [随机程序个数] [种子]     # 默认所有引擎, 200, 1
+"""
+
+import io
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cp_vectorize
+from cp_engine import ENGINES, make_interpreter
+from cp_parser import calc_parser
+from cp_vectorize import vectorize
+
+SETUP = """
+int n = 20
+int a[n]
+int b[n]
+float c[n]
+float d[n]
+int k = 3
+float x = 0.5
+int j = 0
+while (j < n) {
+    a[j] = j * 7 % 11 - 4
+    b[j] = j % 5 + 1
+    c[j] = j / 3
+    d[j] = j * 0.25 - 2
+    j++
+}
+"""
+
+# (名字, 程序, 是否应该向量化)
+CASES = [
+    ('copy', "for (int i = 0; i < n; i++) {\n a[i] = b[i]\n}", True),
+    ('affine', "for (int i = 0; i < n - 2; i++) {\n a[i] = b[i + 2] * k + a[i] - 1\n}", True),
+    ('mixed', "for (int i = 0; i < n; i++) {\n c[i] = a[i] * x + d[i] / b[i]\n}", True),
+    ('chain', "for (int i = 0; i < n; i++) {\n a[i] = b[i] + 1\n b[i] = a[i] * a[i]\n}", True),
+    ('step', "for (int i = 1; i <= n - 1; i += 3) {\n c[i] = c[i] * 2 + i\n}", True),
+    ('reverse', "for (int i = 0; i < n; i++) {\n a[i] = b[n - 1 - i] - i\n}", True),
+    ('floor', "for (int i = 0; i < n; i++) {\n a[i] = a[i] // b[i] + a[i] % b[i]\n}", True),
+    ('float_limit', "for (int i = 0; i < 7.5; i++) {\n d[i] = i\n}", True),
+    ('widen', "for (int i = 0; i < n; i++) {\n a[i] = 2147483000 + i * 100\n}", True),
+    ('to_float', "for (int i = 0; i < n; i++) {\n c[i] = a[i] + b[i]\n}", True),
+    ('empty', "for (int i = 5; i < 2; i++) {\n a[i] = 1\n}", True),
+    ('carried', "for (int i = 1; i < n; i++) {\n a[i] = a[i - 1] + 1\n}", False),
+    ('same_elem', "for (int i = 0; i < n; i++) {\n a[i] = a[0] + 1\n}", False),
+    ('mismatch', "for (int i = 0; i < n; i++) {\n a[i] = c[i]\n}", False),
+    ('zero_div', "for (int i = 0; i < n; i++) {\n a[i] = b[i] // (a[i] - a[i])\n}", False),
+    ('out_of_range', "for (int i = 0; i < n; i++) {\n a[i] = b[i + 1]\n}", False),
+    ('negative', "for (int i = 0; i < n; i++) {\n a[i] = b[i - 1]\n}", False),
+    ('undefined', "for (int i = 0; i < n; i++) {\n a[i] = zz\n}", False),
+    # 多个向量化的循环, 其中一个被常量折叠改写或者作为死代码去掉, 其余循环的编号不能错位
+    ('folded_first', "for (int i = 0; i < n; i++) {\n a[i] = 4 & 5\n}\nfor (int i = 0; i < n; i++) {\n"
+                     " c[i] = i * 3\n}", True),
+    ('dead_first', "if (False) {\n for (int i = 0; i < n; i++) {\n  a[i] = 9\n }\n}\n"
+                   "for (int i = 0; i < n; i++) {\n c[i] = i * 3\n}\nfor (int i = 0; i < n; i++) {\n a[i] = b[i] + 1\n}", True),
+    ('overflow', "int big = 4000000000000000000\nfor (int i = 0; i < n; i++) {\n"
+                 " a[i] = a[i] + big\n a[i] = a[i] + big\n}", False),
+]
+
+OPS = ['+', '-', '*', '/', '//', '%']
+INDEXES = ['i', 'i + 1', 'i - 1', '2 * i', 'n - 1 - i', 'i + k', 'i * 1 + 0']
+
+
+def random_expr(rng, depth, written):
+    # 读被写的数组时多半用写它的下标, 偶尔故意制造跨迭代的依赖
+    if depth <= 0 or rng.random() < 0.3:
+        kind = rng.random()
+        if kind < 0.45:
+            name = rng.choice("abcd")
+            index = written[name] if name in written and rng.random() < 0.9 else rng.choice(INDEXES)
+            return f'{name}[{index}]'
+        if kind < 0.6:
+            return 'i'
+        if kind < 0.8:
+            return rng.choice(['k', 'x'])
+        return rng.choice(['1', '2', '0', '3.5', '7'])
+    left, right = random_expr(rng, depth - 1, written), random_expr(rng, depth - 1, written)
+    return f'({left} {rng.choice(OPS)} {right})'
+
+
+def random_program(rng):
+    # 范围取得让 INDEXES 里的下标都不越界; 目标多选 float 数组, 否则大多因为类型不符而不向量化
+    start, stop = rng.choice([(1, 'n / 2'), (1, 'n - 10'), (2, '9.5'), (1, 'k * 3')])
+    update = rng.choice(['i++', 'i += 2', '++i'])
+    targets = [(rng.choice("abcccddd"), rng.choice(INDEXES[:3])) for _ in range(rng.randint(1, 3))]
+    written = {}
+    for name, index in targets:
+        written.setdefault(name, index)
+    lines = [f' {name}[{index}] = {random_expr(rng, 3, written)}' for name, index in targets]
+    return f"for (int i = {start}; i < {stop}; {update}) {{\n" + '\n'.join(lines) + "\n}"
+
+
+def snapshot(engine, source):
+    tree = calc_parser.parse(source)
+    plans = vectorize(tree)
+    interpreter = make_interpreter(engine, stdin=io.StringIO())
+    try:
+        interpreter.execute(tree)
+        error = None
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+    arrays = {name: (getattr(storage, 'typecode', type(storage).__name__), list(storage))
+              for name, storage in interpreter.arrays.items()}
+    return (interpreter.printResult, error, arrays), sum(plan.vectorized for plan in plans)
+
+
+def compare(engine, source):
+    """返回 (结果是否一致, 向量化执行的次数)"""
+    saved = cp_vectorize.numpy
+    try:
+        vector, count = snapshot(engine, source)
+        cp_vectorize.numpy = None
+        scalar, _ = snapshot(engine, source)
+    finally:
+        cp_vectorize.numpy = saved
+    return vector == scalar, count
+
+
+def main(argv):
+    engines = list(ENGINES)
+    if argv and not argv[0].isdigit():
+        engines = argv[0].split(',')
+        argv = argv[1:]
+    total = int(argv[0]) if argv else 200
+    seed = int(argv[1]) if len(argv) > 1 else 1
+    if cp_vectorize.numpy is None:
+        raise SystemExit('numpy is not installed, nothing is vectorized')
+    cp_vectorize.MIN_COUNT = 1
+    failures = 0
+    for engine in engines:
+        for name, body, expected in CASES:
+            same, count = compare(engine, SETUP + body + "\nprint(a[0], a[n - 1], c[1])\n")
+            if not same or (count > 0) != expected:
+                failures += 1
+                print(f'FAIL {engine} {name}: same={same} vectorized={count}')
+        rng = random.Random(seed)
+        vectorized = 0
+        for number in range(total):
+            body = random_program(rng)
+            same, count = compare(engine, SETUP + body + "\n")
+            vectorized += count > 0
+            if not same:
+                failures += 1
+                print(f'FAIL {engine} random #{number}:\n{body}')
+        print(f'{engine:<8} {len(CASES)} cases, {total} random programs ({vectorized} vectorized)')
+    if failures:
+        raise SystemExit(f'{failures} failures')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
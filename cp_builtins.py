@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+数组内置函数。写法与普通函数调用相同, 数组参数直接写数组名:
+
+    fill(a, v)          a 的每个元素置为 v
+    sum(a)  min(a)  max(a)
+    sort(a)             原地升序
+    copy(dst, src)      dst[i] = src[i]
+    add(dst, a, b)      dst[i] = a[i] + b[i]
+    mul(dst, a, b)      dst[i] = a[i] * b[i]
+    scale(a, k)         a[i] = a[i] * k
+    dot(a, b)           a[i] * b[i] 之和
+    prefix_sum(dst, src)  dst[i] = src[0] + ... + src[i]
+
+执行前 bind_builtins() 把这些调用改写成 builtin_call 结点: 函数名在 BUILTINS 里、参数个数相同、
+数组位置上的参数是程序里声明过的数组名, 才当作内置函数 (数组位置的参数结点改为 array_name);
+其余调用仍按普通函数解析, 所以用户函数可以同名。
+
+数值数组 (array.array 存储) 用 NumPy 在原存储上一次算完; 没有 NumPy、string 数组、
+结果类型存不进目标数组, 或者 int 运算可能超出 int64 时, 退回逐个元素的 Python 实现,
+结果和类型规则与逐个元素赋值相同。浮点求和用 cumsum 保持从左到右的累加顺序。
+"""
+
+import array
+import itertools
+import operator
+
+from lark import Tree
+
+from cp_runtime import replace_values
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# int64 中间结果的安全上界
+INT_LIMIT = 2 ** 62
+INT32 = (-2 ** 31, 2 ** 31 - 1)
+
+
+def view(storage):
+    # array.array 存储上的零拷贝 NumPy 视图, 其他存储返回 None
+    if numpy is None or not isinstance(storage, array.array):
+        return None
+    return numpy.frombuffer(storage, dtype=storage.typecode)
+
+
+def elements(storage):
+    if isinstance(storage, array.array) and storage.typecode == 'b':
+        return [storage[i] for i in range(len(storage))]
+    return list(storage)
+
+
+def bound(v):
+    # 元素绝对值的上界
+    return max(abs(int(v.max())), abs(int(v.min())))
+
+
+def scalar(storage, value):
+    # NumPy 标量转回数组元素对应的 Python 类型
+    code = storage.typecode
+    if code == 'b':
+        return bool(value)
+    return float(value) if code == 'd' else int(value)
+
+
+def same_size(arrays, *names):
+    n = len(arrays[names[0]])
+    for name in names[1:]:
+        if len(arrays[name]) != n:
+            raise IndexError(f"Array '{name}' size differs from '{names[0]}'")
+    return n
+
+
+def store_vector(arrays, dst, result):
+    """把 NumPy 结果写进 dst; 类型存不进去时返回 False, 由调用方走 Python 实现报错"""
+    storage = arrays[dst]
+    code = getattr(storage, 'typecode', None)
+    if code == 'd' or (code in ('i', 'q') and result.dtype.kind == 'i'):
+        if code == 'i' and (result.min() < INT32[0] or result.max() > INT32[1]):
+            replace_values(arrays, dst, result.tolist())
+        else:
+            view(storage)[:] = result
+        return True
+    return False
+
+
+def fill(arrays, a, value):
+    # 先按数组赋值的规则存第一个元素 (检查类型, 必要时加宽), 再整体复制
+    storage = arrays[a]
+    try:
+        storage[0] = value
+    except (TypeError, OverflowError):
+        replace_values(arrays, a, [value] * len(storage))
+        return
+    v = view(storage)
+    if v is not None:
+        v.fill(v[0])
+    else:
+        replace_values(arrays, a, [storage[0]] * len(storage))
+
+
+def total(arrays, a):
+    storage = arrays[a]
+    v = view(storage)
+    if v is not None:
+        if v.dtype.kind == 'f':
+            return float(numpy.cumsum(v)[-1])
+        if len(v) * bound(v) < INT_LIMIT:
+            return int(v.sum(dtype=numpy.int64))
+    return sum(elements(storage))
+
+
+def minimum(arrays, a):
+    storage = arrays[a]
+    v = view(storage)
+    return min(elements(storage)) if v is None else scalar(storage, v.min())
+
+
+def maximum(arrays, a):
+    storage = arrays[a]
+    v = view(storage)
+    return max(elements(storage)) if v is None else scalar(storage, v.max())
+
+
+def sort(arrays, a):
+    storage = arrays[a]
+    v = view(storage)
+    if v is not None:
+        v.sort()
+    else:
+        replace_values(arrays, a, sorted(elements(storage)))
+
+
+def copy(arrays, dst, src):
+    same_size(arrays, dst, src)
+    result = view(arrays[src])
+    if result is None or not store_vector(arrays, dst, result):
+        replace_values(arrays, dst, elements(arrays[src]))
+
+
+def binary(arrays, dst, a, b, op, numpy_op, safe, b_array=True):
+    """dst[i] = op(a[i], b[i]); b 是数组名 (b_array) 或标量, safe(a 的界, b 的界) 判断 int64 不会溢出"""
+    storage = arrays[a]
+    va = view(storage)
+    if b_array:
+        vb = view(arrays[b])
+        b_float = vb is not None and vb.dtype.kind == 'f'
+    else:
+        vb = b if type(b) in (int, float, bool) else None
+        b_float = type(b) is float
+    if va is not None and vb is not None:
+        result = None
+        if va.dtype.kind == 'f' or b_float:
+            result = getattr(numpy, numpy_op)(va, vb, dtype=numpy.float64)
+        elif safe(bound(va), bound(vb) if b_array else abs(int(vb))):
+            result = getattr(numpy, numpy_op)(va, vb, dtype=numpy.int64)
+        if result is not None and store_vector(arrays, dst, result):
+            return
+    right = elements(arrays[b]) if b_array else itertools.repeat(b)
+    replace_values(arrays, dst, [op(x, y) for x, y in zip(elements(storage), right)])
+
+
+def add(arrays, dst, a, b):
+    same_size(arrays, dst, a, b)
+    binary(arrays, dst, a, b, operator.add, 'add', lambda x, y: x + y < INT_LIMIT)
+
+
+def mul(arrays, dst, a, b):
+    same_size(arrays, dst, a, b)
+    binary(arrays, dst, a, b, operator.mul, 'multiply', lambda x, y: x * y < INT_LIMIT)
+
+
+def scale(arrays, a, k):
+    binary(arrays, a, a, k, operator.mul, 'multiply', lambda x, y: x * y < INT_LIMIT, b_array=False)
+
+
+def dot(arrays, a, b):
+    n = same_size(arrays, a, b)
+    va, vb = view(arrays[a]), view(arrays[b])
+    if va is not None and vb is not None:
+        if va.dtype.kind == 'f' or vb.dtype.kind == 'f':
+            return float(numpy.cumsum(numpy.multiply(va, vb, dtype=numpy.float64))[-1])
+        if n * bound(va) * bound(vb) < INT_LIMIT:
+            return int(numpy.dot(va.astype(numpy.int64), vb.astype(numpy.int64)))
+    return sum(x * y for x, y in zip(elements(arrays[a]), elements(arrays[b])))
+
+
+def prefix_sum(arrays, dst, src):
+    n = same_size(arrays, dst, src)
+    v = view(arrays[src])
+    if v is not None:
+        if v.dtype.kind == 'f':
+            result = numpy.cumsum(v, dtype=numpy.float64)
+        elif n * bound(v) < INT_LIMIT:
+            result = numpy.cumsum(v, dtype=numpy.int64)
+        else:
+            result = None
+        if result is not None and store_vector(arrays, dst, result):
+            return
+    replace_values(arrays, dst, list(itertools.accumulate(elements(arrays[src]))))
+
+
+# 名字 -> (参数种类, 实现); 'a' 是数组名, 'v' 是普通值
+BUILTINS = {
+    'fill': ('av', fill),
+    'sum': ('a', total),
+    'min': ('a', minimum),
+    'max': ('a', maximum),
+    'sort': ('a', sort),
+    'copy': ('aa', copy),
+    'add': ('aaa', add),
+    'mul': ('aaa', mul),
+    'scale': ('av', scale),
+    'dot': ('aa', dot),
+    'prefix_sum': ('aa', prefix_sum),
+}
+
+# 会改写第一个数组参数的内置函数, 其余的只读数组
+WRITERS = {'fill', 'sort', 'copy', 'add', 'mul', 'scale', 'prefix_sum'}
+
+
+def call_builtin(arrays, name, args):
+    kinds, function = BUILTINS[name]
+    for kind, arg in zip(kinds, args):
+        if kind == 'a' and arg not in arrays:
+            raise NameError(f"Array '{arg}' not defined")
+    return function(arrays, *args)
+
+
+def bind_builtins(tree):
+    """把数组内置函数的调用改写成 builtin_call 结点, 可以重复调用"""
+    if not isinstance(tree, Tree):
+        return
+    declared = {str(node.children[1]) for node in tree.find_data('array_def')}
+    for node in list(tree.find_data('func_call_stmt')):
+        spec = BUILTINS.get(str(node.children[0]))
+        args = node.children[1].children if node.children[1] is not None else []
+        if spec is None or len(args) != len(spec[0]):
+            continue
+        positions = [i for i, kind in enumerate(spec[0]) if kind == 'a']
+        if all(isinstance(args[i], Tree) and args[i].data == 'var' and str(args[i].children[0]) in declared
+               for i in positions):
+            node.data = 'builtin_call'
+            for i in positions:
+                args[i].data = 'array_name'
@@ -0,0 +1,897 @@
+# -*- coding: utf-8 -*-
+"""
+闭包编译引擎
+
+语法树只遍历一次: 每个节点变成一个预先绑定好子节点的 Python 闭包,
+执行程序就是调用这些闭包, 不再按 tree.data 分派。
+
+表达式闭包 f(frame) 返回值; 语句闭包 f(frame) 正常结束返回 None,
+break/continue/return 返回 BREAK/CONTINUE/RETURN 三个单例, 返回值写在 frame[1]。
+frame 是一个 list: frame[0] 是当前 this, frame[1] 是返回值, 局部变量从下标 2 开始,
+槽位和作用域规则与 cp_vm 相同。
+"""
+
+from lark import Tree, Token
+
+from cp_builtins import bind_builtins, call_builtin
+from cp_input import InputTarget
+from cp_optimize import UNCOMPUTED, optimize
+from cp_resolve import resolve
+from cp_runtime import MISSING, Runtime, OPERATORS, AUG_OPS, TYPES, CATCH_PREFIX, signature, store_element
+from cp_types import check_types
+from cp_vectorize import vectorize
+
+
+BREAK = object()
+CONTINUE = object()
+RETURN = object()
+
+THIS = 0
+RESULT = 1
+FIRST_SLOT = 2
+
+
+class ClosureFunction:
+    __slots__ = ('name', 'nargs', 'nlocals', 'body')
+
+    def __init__(self, name, nargs):
+        self.name = name
+        self.nargs = nargs
+        self.nlocals = FIRST_SLOT
+        self.body = None
+
+    def __repr__(self):
+        return f'<closure function {self.name}/{self.nargs}>'
+
+
+def memoized(function, memo):
+    """function 的副本, 函数体先按实参查 memo, 没有时照常执行再记下返回值"""
+    body = function.body
+    end = FIRST_SLOT + function.nargs
+    key_of, lookup, store = memo.key, memo.lookup, memo.store
+
+    def memo_body(f):
+        key = key_of(f[FIRST_SLOT:end])
+        value = lookup(key)
+        if value is MISSING:
+            body(f)
+            value = store(key, f[RESULT])
+        f[RESULT] = value
+    copy = ClosureFunction(function.name, function.nargs)
+    copy.nlocals = function.nlocals
+    copy.body = memo_body
+    return copy
+
+
+def run_stmts(stmts):
+    if len(stmts) == 1:
+        return stmts[0]
+
+    def block(f):
+        for stmt in stmts:
+            signal = stmt(f)
+            if signal is not None:
+                return signal
+    return block
+
+
+def nothing(f):
+    return None
+
+
+class ClosureCompiler:
+    def __init__(self, runtime):
+        self.rt = runtime
+        self.function = None
+        self.scopes = []
+        self.loop_depth = 0
+        self.is_main = True
+
+    def compile_program(self, tree, no_memo=frozenset(), memo_capacity=None):
+        bind_builtins(tree)
+        # 未定义的名字和 tree 引擎一样在执行前报错 (去掉的死代码里的也算)
+        resolve(tree)
+        check_types(tree)
+        optimize(tree, no_memo, memo_capacity)
+        vectorize(tree)
+        self.function = ClosureFunction('<main>', 0)
+        if isinstance(tree, Tree) and tree.data == 'start':
+            stmts = tree.children
+        else:
+            stmts = [tree]
+        # 顶层语句的 break/continue/return 信号只结束这一条语句
+        body = [stmt for stmt in (self.stmt(child) for child in stmts) if stmt is not nothing]
+
+        def main(f):
+            for stmt in body:
+                stmt(f)
+        self.function.body = main
+        return self.function
+
+    # names
+
+    def lookup(self, name):
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope[name]
+        return None
+
+    def declare(self, name):
+        slot = self.function.nlocals
+        self.function.nlocals += 1
+        self.scopes[-1][name] = slot
+        return slot
+
+    def load(self, name):
+        slot = self.lookup(name)
+        if slot is not None:
+            return lambda f: f[slot]
+        g = self.rt.globals
+
+        def load_global(f):
+            try:
+                return g[name]
+            except KeyError:
+                raise ValueError(f"Undefined variable '{name}'") from None
+        return load_global
+
+    def store(self, name, value):
+        # 不做类型检查的写入 (复合赋值)
+        slot = self.lookup(name)
+        if slot is not None:
+            def store_fast(f):
+                f[slot] = value(f)
+            return store_fast
+        g = self.rt.globals
+
+        def store_global(f):
+            v = value(f)
+            if name not in g:
+                raise ValueError(f"Undefined variable '{name}'")
+            g[name] = v
+        return store_global
+
+    # statements
+
+    def stmt(self, tree):
+        if tree is None or isinstance(tree, Token):
+            return nothing
+        handler = getattr(self, 'stmt_' + tree.data, None)
+        if handler is not None:
+            return handler(tree)
+        if tree.data in AUG_OPS:
+            return self.stmt_aug(tree)
+        expr = self.expr(tree)
+
+        def expr_stmt(f):
+            expr(f)
+        return expr_stmt
+
+    def block(self, tree, new_scope=True):
+        if new_scope:
+            self.scopes.append({})
+        stmts = [stmt for stmt in (self.stmt(child) for child in tree.children) if stmt is not nothing]
+        if new_scope:
+            self.scopes.pop()
+        if not stmts:
+            return nothing
+        return run_stmts(stmts)
+
+    def stmt_comment_stmt(self, tree):
+        return nothing
+
+    def stmt_block_stmt(self, tree):
+        return self.block(tree)
+
+    def declare_value(self, name, value):
+        if not self.scopes:
+            g = self.rt.globals
+
+            def declare_global(f):
+                v = value(f)
+                if name in g:
+                    raise ValueError(f"Variable '{name}' already exists")
+                g[name] = v
+            return declare_global
+        if name in self.scopes[-1]:
+            def redeclare(f):
+                value(f)
+                raise ValueError(f"Variable '{name}' already exists")
+            return redeclare
+        slot = self.declare(name)
+
+        def declare_fast(f):
+            f[slot] = value(f)
+        return declare_fast
+
+    def stmt_assign_stmt(self, tree):
+        is_string = tree.children[0].data == 'string_type'
+        stmts = []
+        for var_factor in tree.children[1:]:
+            node = var_factor.children[0]
+            name = str(node.children[0])
+            if node.data == 'unassign_stmt':
+                default = '' if is_string else 0
+                value = lambda f, default=default: default
+            elif getattr(node, 'typed', False):
+                value = self.expr(node.children[1])
+            else:
+                value = self.checked_decl(name, is_string, self.expr(node.children[1]))
+            stmts.append(self.declare_value(name, value))
+        return run_stmts(stmts)
+
+    def checked_decl(self, name, is_string, expr):
+        def value(f):
+            v = expr(f)
+            if (type(v) == str) != is_string:
+                raise TypeError(f"Cannot assign {str(type(v))} value to variable '{name}'.")
+            return v
+        return value
+
+    def stmt_reassign_stmt(self, tree):
+        name = str(tree.children[0])
+        expr = self.expr(tree.children[1])
+        if getattr(tree, 'typed', False):
+            # cp_types 证明了类型相同, 不用再检查
+            return self.store(name, expr)
+        slot = self.lookup(name)
+        if slot is not None:
+            def assign_fast(f):
+                value = expr(f)
+                if type(f[slot]) != type(value):
+                    raise TypeError(f"Cannot assign {type(value).__name__} value to variable '{name}' of type {type(f[slot]).__name__}")
+                f[slot] = value
+            return assign_fast
+        g = self.rt.globals
+
+        def assign_global(f):
+            value = expr(f)
+            if name not in g:
+                raise ValueError(f"Undefined variable '{name}'")
+            if type(g[name]) != type(value):
+                raise TypeError(f"Cannot assign {type(value).__name__} value to variable '{name}' of type {type(g[name]).__name__}")
+            g[name] = value
+        return assign_global
+
+    def incr(self, name, delta, typed):
+        sign = '++' if delta > 0 else '--'
+        slot = self.lookup(name)
+        if slot is not None and typed:
+            def incr_typed(f):
+                f[slot] += delta
+            return incr_typed
+        if slot is not None:
+            def incr_fast(f):
+                value = f[slot]
+                if type(value) != int:
+                    raise TypeError(f"Cannot use {sign} operator on non-integer variable '{name}'")
+                f[slot] = value + delta
+            return incr_fast
+        g = self.rt.globals
+
+        def incr_global(f):
+            if name not in g:
+                raise ValueError(f"Undefined variable '{name}'")
+            value = g[name]
+            if not typed and type(value) != int:
+                raise TypeError(f"Cannot use {sign} operator on non-integer variable '{name}'")
+            g[name] = value + delta
+        return incr_global
+
+    def stmt_self_add(self, tree):
+        return self.incr(str(tree.children[0]), 1, getattr(tree, 'typed', False))
+
+    def stmt_self_sub(self, tree):
+        return self.incr(str(tree.children[0]), -1, getattr(tree, 'typed', False))
+
+    def stmt_aug(self, tree):
+        name = str(tree.children[0])
+        return self.store(name, self.binary(AUG_OPS[tree.data], self.load(name), self.expr(tree.children[1])))
+
+    def stmt_print_stmt(self, tree):
+        factors = [factor for factor in tree.children[:-2] if factor is not None]
+        sep, end = tree.children[-2], tree.children[-1]
+        parts = []
+        for i, factor in enumerate(factors):
+            parts.append(self.expr(factor.children[0]))
+            if sep is None:
+                if i < len(factors) - 1:
+                    parts.append(' ')
+            else:
+                parts.append(self.expr(sep.children[0]))
+        parts.append('\n' if end is None else self.expr(end.children[0]))
+        parts = tuple(parts)
+        out = self.rt.out.write
+
+        # 逐个求值并输出: 表达式里的调用也可能 print
+        def print_stmt(f):
+            for part in parts:
+                if part.__class__ is str:
+                    out(part)
+                else:
+                    out(str(part(f)))
+        return print_stmt
+
+    def stmt_input_stmt(self, tree):
+        rt = self.rt
+        stmts = []
+        for factor in tree.children:
+            name = str(factor.children[0])
+            if factor.data == 'input_array_stmt':
+                index = self.array_index(name, factor.children[1:])
+
+                def input_element(f, name=name, index=index):
+                    rt.input_element(name, index(f))
+                stmts.append(input_element)
+                continue
+            if factor.data == 'input_array_fill':
+                def input_array(f, name=name):
+                    rt.input_array(name)
+                stmts.append(input_array)
+                continue
+            slot = self.lookup(name)
+            if slot is not None:
+                def input_fast(f, slot=slot, target=InputTarget()):
+                    f[slot] = rt.read_value(target, f[slot])
+                stmts.append(input_fast)
+                continue
+            g = rt.globals
+
+            def input_global(f, name=name, target=InputTarget()):
+                if name not in g:
+                    raise ValueError(f"Variable '{name}' not found")
+                g[name] = rt.read_value(target, g[name])
+            stmts.append(input_global)
+        return run_stmts(stmts)
+
+    def stmt_array_def(self, tree):
+        elem_type = TYPES[tree.children[0].data]
+        name = str(tree.children[1])
+        dims = [self.expr(child) for child in tree.children[2:]]
+        rt = self.rt
+
+        def array_def(f):
+            rt.array_def(name, elem_type, [dim(f) for dim in dims])
+        return array_def
+
+    def array_index(self, name, children):
+        # 一个下标就是扁平位置, 多个下标由数组的 indexer 按 stride 换算
+        if len(children) == 1:
+            return self.expr(children[0])
+        indexers = self.rt.indexers
+        indexes = [self.expr(child) for child in children]
+        if len(indexes) == 2:
+            i, j = indexes
+            return lambda f: indexers[name](i(f), j(f))
+        return lambda f: indexers[name](*[index(f) for index in indexes])
+
+    def stmt_array_assign(self, tree):
+        name = str(tree.children[0])
+        index = self.array_index(name, tree.children[1:-1])
+        value = self.expr(tree.children[-1])
+        array = self.rt.array
+        arrays = self.rt.arrays
+
+        def array_assign(f):
+            i = int(index(f))
+            v = value(f)
+            try:
+                array(name, i)[i] = v
+            except (TypeError, OverflowError):
+                store_element(arrays, name, i, v)
+        return array_assign
+
+    def leave(self, signal):
+        # 循环外的 break/continue: 在函数里等同于 return, 在顶层只结束当前语句
+        if self.loop_depth == 0 and not self.is_main:
+            return lambda f: RETURN
+        return lambda f: signal
+
+    def stmt_break_stmt(self, tree):
+        return self.leave(BREAK)
+
+    def stmt_continue_stmt(self, tree):
+        return self.leave(CONTINUE)
+
+    def stmt_return_stmt(self, tree):
+        if tree.children[0] is None:
+            return lambda f: RETURN
+        value = self.expr(tree.children[0])
+
+        def return_stmt(f):
+            f[RESULT] = value(f)
+            return RETURN
+        return return_stmt
+
+    def condition(self, tree):
+        exprs = [self.expr(child) for child in tree.children]
+        if tree.data == 'condition_func':
+            return exprs[0]
+        if tree.data == 'condition_and_func':
+            def condition_and(f):
+                for expr in exprs:
+                    if not expr(f):
+                        return False
+                return True
+            return condition_and
+
+        def condition_or(f):
+            for expr in exprs:
+                if expr(f):
+                    return True
+            return False
+        return condition_or
+
+    def stmt_if_else_stmt(self, tree):
+        clauses = []
+        orelse = None
+        for clause in tree.children:
+            if clause is None:
+                continue
+            if clause.data == 'else_stmt':
+                orelse = self.block(clause.children[0])
+            else:
+                clauses.append((self.condition(clause.children[0]), self.block(clause.children[1])))
+        if len(clauses) == 1:
+            condition, body = clauses[0]
+            if orelse is None:
+                def if_stmt(f):
+                    if condition(f):
+                        return body(f)
+                return if_stmt
+
+            def if_else(f):
+                if condition(f):
+                    return body(f)
+                return orelse(f)
+            return if_else
+        clauses = tuple(clauses)
+
+        def if_chain(f):
+            for condition, body in clauses:
+                if condition(f):
+                    return body(f)
+            if orelse is not None:
+                return orelse(f)
+        return if_chain
+
+    def stmt_if_stmt(self, tree):
+        return self.stmt_if_else_stmt(Tree('if_else_stmt', [tree]))
+
+    def loop_body(self, tree):
+        self.loop_depth += 1
+        body = self.block(tree)
+        self.loop_depth -= 1
+        return body
+
+    def stmt_while_stmt(self, tree):
+        condition = self.condition(tree.children[0])
+        body = self.loop_body(tree.children[1])
+
+        def while_stmt(f):
+            while condition(f):
+                signal = body(f)
+                if signal is not None:
+                    if signal is BREAK:
+                        break
+                    if signal is RETURN:
+                        return signal
+        return while_stmt
+
+    def stmt_do_while_stmt(self, tree):
+        body = self.loop_body(tree.children[0])
+        condition = self.condition(tree.children[1])
+
+        def do_while_stmt(f):
+            while True:
+                signal = body(f)
+                if signal is not None:
+                    if signal is BREAK:
+                        break
+                    if signal is RETURN:
+                        return signal
+                if not condition(f):
+                    break
+        return do_while_stmt
+
+    def stmt_for_stmt(self, tree):
+        self.scopes.append({})
+        init = self.stmt(tree.children[0])
+        condition = self.condition(tree.children[1]) if tree.children[1] is not None else (lambda f: True)
+        body = self.loop_body(tree.children[3]) if tree.children[3] is not None else nothing
+        update = self.stmt(tree.children[2])
+        self.scopes.pop()
+
+        def for_stmt(f):
+            init(f)
+            while condition(f):
+                signal = body(f)
+                if signal is not None:
+                    if signal is BREAK:
+                        break
+                    if signal is RETURN:
+                        return signal
+                update(f)
+        return for_stmt
+
+    def stmt_vector_for_stmt(self, tree):
+        # 整体执行不了时退回逐次执行的循环
+        plan = tree.plan
+        g = self.rt.globals
+        loads = [(lambda f, name=name: g.get(name)) if slot is None else (lambda f, slot=slot: f[slot])
+                 for name, slot in ((name, self.lookup(name)) for name in plan.names)]
+        loop = self.stmt_for_stmt(tree)
+        arrays = self.rt.arrays
+
+        def vector_for_stmt(f):
+            if not plan.run(arrays, [load(f) for load in loads]):
+                return loop(f)
+        return vector_for_stmt
+
+    def stmt_hoist_stmt(self, tree):
+        # 循环不变量放在隐藏的槽位里, 进入循环时清空
+        slots = []
+        for node in tree.invariants:
+            node.slot = self.function.nlocals
+            self.function.nlocals += 1
+            slots.append(node.slot)
+        loop = self.stmt(tree.children[0])
+
+        def hoist_stmt(f):
+            for slot in slots:
+                f[slot] = UNCOMPUTED
+            return loop(f)
+        return hoist_stmt
+
+    def stmt_try_catch_stmt(self, tree):
+        body = self.block(tree.children[0])
+        self.scopes.append({})
+        slot = self.declare(str(tree.children[1]))
+        handler = self.block(tree.children[2], new_scope=False)
+        self.scopes.pop()
+
+        def try_catch_stmt(f):
+            try:
+                return body(f)
+            except Exception as e:
+                f[slot] = CATCH_PREFIX + str(e)
+                return handler(f)
+        return try_catch_stmt
+
+    # functions and classes
+
+    def compile_function(self, name, arg_list, block):
+        params = []
+        types = []
+        if arg_list is not None:
+            for arg in arg_list.children:
+                types.append(TYPES[arg.children[0].data])
+                params.append(str(arg.children[1]))
+        saved = (self.function, self.scopes, self.loop_depth, self.is_main)
+        self.function = ClosureFunction(name, len(params))
+        self.scopes = [{}]
+        self.loop_depth = 0
+        self.is_main = False
+        for param in params:
+            self.declare(param)
+        self.function.body = self.block(block, new_scope=False)
+        function = self.function
+        self.function, self.scopes, self.loop_depth, self.is_main = saved
+        return tuple(types), function
+
+    def stmt_func_def_stmt(self, tree):
+        name = str(tree.children[0])
+        types, function = self.compile_function(name, tree.children[1], tree.children[2])
+        define = self.rt.define_function
+        return lambda f: define(name, types, function)
+
+    def stmt_memo_def_stmt(self, tree):
+        node = tree.children[0]
+        name = str(node.children[0])
+        types, function = self.compile_function(name, node.children[1], node.children[2])
+        define_memo = self.rt.define_memo
+        capacity = tree.capacity
+        return lambda f: define_memo(name, types, function, memoized, capacity)
+
+    def class_body(self, var_list, func_list):
+        fields = []
+        values = []
+        if var_list is not None:
+            children = var_list.children
+            for i in range(0, len(children), 2):
+                arg, value = children[i], children[i + 1]
+                if value is None:
+                    default = '' if arg.children[0].data == 'string_type' else 0
+                    values.append(lambda f, default=default: default)
+                else:
+                    values.append(self.expr(value))
+                fields.append(str(arg.children[1]))
+        methods = []
+        if func_list is not None:
+            children = func_list.children
+            for i in range(0, len(children), 3):
+                name = str(children[i])
+                types, function = self.compile_function(name, children[i + 1], children[i + 2])
+                methods.append(((name, types), function))
+        return tuple(fields), tuple(values), tuple(methods)
+
+    def define_class(self, name, base, var_list, func_list):
+        fields, values, methods = self.class_body(var_list, func_list)
+        define = self.rt.define_class
+        return lambda f: define(name, base, fields, methods, [value(f) for value in values])
+
+    def stmt_class_def(self, tree):
+        return self.define_class(str(tree.children[0]), None, tree.children[1], tree.children[2])
+
+    def stmt_class_extends(self, tree):
+        return self.define_class(str(tree.children[0]), str(tree.children[1]), tree.children[2], tree.children[3])
+
+    def stmt_class_instance(self, tree):
+        args = tuple(str(child) for child in tree.children)
+        new_instance = self.rt.new_instance
+        return lambda f: new_instance(*args)
+
+    def stmt_class_instance_trans(self, tree):
+        name, class_type2 = (str(child) for child in tree.children)
+        new_instance = self.rt.new_instance
+        return lambda f: new_instance(None, name, class_type2)
+
+    # expressions
+
+    def expr(self, tree):
+        data = tree.data
+        if data in OPERATORS:
+            return self.binary(data, self.expr(tree.children[0]), self.expr(tree.children[1]))
+        return getattr(self, 'expr_' + data)(tree)
+
+    def binary(self, data, a, b):
+        if data == 'add':
+            return lambda f: a(f) + b(f)
+        if data == 'sub':
+            return lambda f: a(f) - b(f)
+        if data == 'mul':
+            return lambda f: a(f) * b(f)
+        if data == 'less_than':
+            return lambda f: a(f) < b(f)
+        if data == 'less_than_equal':
+            return lambda f: a(f) <= b(f)
+        if data == 'greater_than':
+            return lambda f: a(f) > b(f)
+        if data == 'greater_than_equal':
+            return lambda f: a(f) >= b(f)
+        if data == 'equal':
+            return lambda f: a(f) == b(f)
+        if data == 'not_equal':
+            return lambda f: a(f) != b(f)
+        if data == 'mod':
+            return lambda f: a(f) % b(f)
+        op = OPERATORS[data]
+        return lambda f: op(a(f), b(f))
+
+    def constant(self, value):
+        return lambda f: value
+
+    def expr_const(self, tree):
+        return self.constant(tree.children[0])
+
+    def expr_number(self, tree):
+        num_str = str(tree.children[0])
+        try:
+            value = int(num_str) if '.' not in num_str else float(num_str)
+        except ValueError as e:
+            message = str(e)
+
+            def bad_number(f):
+                raise ValueError(message)
+            return bad_number
+        return self.constant(value)
+
+    def expr_string(self, tree):
+        return self.constant(str(tree.children[0][1:-1]))
+
+    def expr_true_bool(self, tree):
+        return self.constant(True)
+
+    def expr_false_bool(self, tree):
+        return self.constant(False)
+
+    def expr_var(self, tree):
+        return self.load(str(tree.children[0]))
+
+    def expr_grouped_expr(self, tree):
+        return self.expr(tree.children[0])
+
+    def expr_neg_op(self, tree):
+        a = self.expr(tree.children[0])
+        return lambda f: ~a(f)
+
+    def expr_not_op(self, tree):
+        a = self.expr(tree.children[0])
+        return lambda f: not a(f)
+
+    def expr_invariant(self, tree):
+        slot = tree.slot
+        expr = self.expr(tree.children[0])
+
+        def invariant(f):
+            value = f[slot]
+            if value is UNCOMPUTED:
+                value = f[slot] = expr(f)
+            return value
+        return invariant
+
+    def expr_array_access(self, tree):
+        name = str(tree.children[0])
+        index = self.array_index(name, tree.children[1:])
+        array = self.rt.array
+
+        def array_access(f):
+            i = int(index(f))
+            return array(name, i)[i]
+        return array_access
+
+    def args(self, arg_values):
+        if arg_values is None:
+            return ()
+        return tuple(self.expr(child) for child in arg_values.children)
+
+    def invoke(self, function, this, args):
+        frame = [this, None]
+        frame += args
+        if function.nlocals > len(frame):
+            frame += [None] * (function.nlocals - len(frame))
+        function.body(frame)
+        return frame[RESULT]
+
+    def expr_func_call_stmt(self, tree):
+        name = str(tree.children[0])
+        args = self.args(tree.children[1])
+        lookup = self.rt.function
+        invoke = self.invoke
+        arg_types = getattr(tree, 'arg_types', None)
+        if arg_types is not None:
+            # 实参类型由 cp_types 确定, 函数表的键在编译时就拼好
+            key = (name, arg_types)
+            functions = self.rt.functions
+
+            def typed_call(f):
+                values = [arg(f) for arg in args]
+                function = functions.get(key)
+                if function is None:
+                    function = lookup(name, values)
+                return invoke(function, f[THIS], values)
+            return typed_call
+
+        def func_call(f):
+            values = [arg(f) for arg in args]
+            return invoke(lookup(name, values), f[THIS], values)
+        return func_call
+
+    def expr_inline_call(self, tree):
+        # 实参检查类型后放进隐藏的槽位 (类型已经确定时不检查); 函数体只看得到参数和全局变量
+        name = str(tree.children[0])
+        params, types = signature(tree.children[2])
+        args = self.args(tree.children[1])
+        slots = tuple(range(self.function.nlocals, self.function.nlocals + len(params)))
+        self.function.nlocals += len(params)
+        saved, self.scopes = self.scopes, [dict(zip(params, slots))]
+        body = self.expr(tree.children[3])
+        self.scopes = saved
+        typed = getattr(tree, 'arg_types', None) == types
+        if typed and len(slots) == 1:
+            arg, slot = args[0], slots[0]
+
+            def inline_typed1(f):
+                f[slot] = arg(f)
+                return body(f)
+            return inline_typed1
+        if typed:
+            def inline_typed(f):
+                values = [arg(f) for arg in args]
+                for slot, value in zip(slots, values):
+                    f[slot] = value
+                return body(f)
+            return inline_typed
+        if len(slots) == 1:
+            arg, slot, arg_type = args[0], slots[0], types[0]
+
+            def inline_call1(f):
+                value = arg(f)
+                if type(value) is not arg_type:
+                    raise NameError(f"Function '{name}' not defined")
+                f[slot] = value
+                return body(f)
+            return inline_call1
+
+        def inline_call(f):
+            values = [arg(f) for arg in args]
+            if tuple(map(type, values)) != types:
+                raise NameError(f"Function '{name}' not defined")
+            for slot, value in zip(slots, values):
+                f[slot] = value
+            return body(f)
+        return inline_call
+
+    def expr_builtin_call(self, tree):
+        name = str(tree.children[0])
+        args = [(lambda f, array=str(arg.children[0]): array) if arg.data == 'array_name' else self.expr(arg)
+                for arg in tree.children[1].children]
+        arrays = self.rt.arrays
+
+        def builtin_call(f):
+            return call_builtin(arrays, name, [arg(f) for arg in args])
+        return builtin_call
+
+    def expr_class_var(self, tree):
+        name, var = str(tree.children[0]), str(tree.children[1])
+        rt = self.rt
+
+        def class_var(f):
+            if name not in rt.classes:
+                raise NameError(f"Class instance '{name}' not defined")
+            return rt.load_field(name, var)
+        return class_var
+
+    def current_this(self, f):
+        this = f[THIS]
+        if this is None:
+            raise NameError("No class instance defined")
+        return this
+
+    def expr_this_var(self, tree):
+        var = str(tree.children[0])
+        load_field = self.rt.load_field
+        current_this = self.current_this
+        return lambda f: load_field(current_this(f), var)
+
+    def expr_super_var(self, tree):
+        var = str(tree.children[0])
+        rt = self.rt
+        current_this = self.current_this
+        return lambda f: rt.load_field(rt.super_of(current_this(f)), var)
+
+    def expr_class_func(self, tree):
+        name, func_name = str(tree.children[0]), str(tree.children[1])
+        args = self.args(tree.children[2])
+        rt = self.rt
+        invoke = self.invoke
+
+        def class_func(f):
+            values = [arg(f) for arg in args]
+            if name not in rt.classes:
+                raise NameError(f"Class '{name}' not defined")
+            return invoke(rt.method(name, func_name, values), name, values)
+        return class_func
+
+    def expr_this_func(self, tree):
+        func_name = str(tree.children[0])
+        args = self.args(tree.children[1])
+        rt = self.rt
+        invoke = self.invoke
+        current_this = self.current_this
+
+        def this_func(f):
+            values = [arg(f) for arg in args]
+            this = current_this(f)
+            return invoke(rt.method(this, func_name, values), this, values)
+        return this_func
+
+    def expr_super_func(self, tree):
+        func_name = str(tree.children[0])
+        args = self.args(tree.children[1])
+        rt = self.rt
+        invoke = self.invoke
+        current_this = self.current_this
+
+        def super_func(f):
+            values = [arg(f) for arg in args]
+            this = rt.super_of(current_this(f))
+            return invoke(rt.method(this, func_name, values), this, values)
+        return super_func
+
+
+class ClosureEngine(Runtime):
+    def execute(self, tree):
+        main = ClosureCompiler(self).compile_program(tree, self.no_memo, self.memo_capacity)
+        frame = [None, None] + [None] * (main.nlocals - FIRST_SLOT)
+        main.body(frame)
@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""
+副作用分析: 一段语法树执行时会写哪些变量、数组和类/实例名, 包括通过函数和方法调用间接写到的。
+
+    program = ProgramEffects(tree)
+    effects = program.effects(loop)      # loop 执行时可能写到的东西
+
+函数和方法按名字汇总: 同名的重载 (以及各个类里同名的方法) 合在一起, 调用时按名字取汇总;
+函数只看得到自己的局部变量和全局变量, 所以汇总里只记写到的全局变量, 局部变量按作用域规则排除。
+函数之间互相调用时反复合并, 直到不再变化。调用没有定义过的函数 (执行时会报错) 不影响结果。
+
+类实例的字段只在 new 和定义类时设定, 之后不会再改; 所以字段是否变化只看实例名有没有被重新 new。
+
+pure_functions(tree) 找出纯函数: 结果只取决于实参, 执行时不写任何函数外面的东西, 规则见 Purity。
+"""
+
+from collections import Counter
+
+from lark import Tree
+
+from cp_builtins import WRITERS
+from cp_runtime import AUG_OPS, signature
+
+
+# 写变量的语句, 变量名是 children[0]
+VARIABLE_WRITES = {'reassign_stmt', 'self_add', 'self_sub', 'input_factor_stmt'} | set(AUG_OPS)
+
+ARRAY_WRITES = {'array_assign', 'input_array_stmt', 'input_array_fill'}
+
+
+class Effects:
+    def __init__(self):
+        self.variables = set()   # 写到的变量名
+        self.arrays = set()      # 写到或重新定义的数组名
+        self.objects = set()     # 重新 new 的实例名和新定义的类名
+        self.io = False          # print 或 cin
+        self.functions = set()   # 直接调用的函数名
+        self.methods = set()     # 直接调用的方法名 (x.f() / this.f() / super.f())
+
+    def update(self, other):
+        """合并 other 写到的东西, 返回是否有变化"""
+        before = len(self.variables), len(self.arrays), len(self.objects), self.io
+        self.variables |= other.variables
+        self.arrays |= other.arrays
+        self.objects |= other.objects
+        self.io = self.io or other.io
+        return before != (len(self.variables), len(self.arrays), len(self.objects), self.io)
+
+    def __repr__(self):
+        return (f'Effects(variables={sorted(self.variables)}, arrays={sorted(self.arrays)}, '
+                f'objects={sorted(self.objects)}, io={self.io})')
+
+
+class Collector:
+    """
+    收集一段语法树直接产生的写操作。scopes 为 None 时记下所有写到的名字,
+    否则按 cp_resolve 的作用域规则跳过局部变量 (用来汇总函数体)。
+    函数定义和类方法的函数体不在这里执行, 不进去。
+    """
+
+    def __init__(self, scopes=None):
+        self.effects = Effects()
+        self.scopes = scopes
+
+    def local(self, name):
+        return self.scopes is not None and any(name in scope for scope in self.scopes)
+
+    def declare(self, name):
+        if self.scopes is None:
+            self.effects.variables.add(name)
+        elif self.scopes:
+            self.scopes[-1].add(name)
+        else:
+            # 函数体之外的顶层声明
+            self.effects.variables.add(name)
+
+    def write(self, name):
+        if not self.local(name):
+            self.effects.variables.add(name)
+
+    def visit(self, node):
+        if not isinstance(node, Tree):
+            return
+        data = node.data
+        effects = self.effects
+        if data in VARIABLE_WRITES:
+            self.write(str(node.children[0]))
+        elif data in ARRAY_WRITES:
+            effects.arrays.add(str(node.children[0]))
+        elif data == 'array_def':
+            effects.arrays.add(str(node.children[1]))
+        elif data == 'builtin_call':
+            if str(node.children[0]) in WRITERS:
+                effects.arrays.add(str(node.children[1].children[0].children[0]))
+        elif data == 'class_instance':
+            effects.objects.add(str(node.children[1]))
+        elif data == 'class_instance_trans':
+            effects.objects.add(str(node.children[0]))
+        elif data in ('class_def', 'class_extends'):
+            effects.objects.add(str(node.children[0]))
+            # 字段初值在定义类时求值, 方法体不执行
+            for child in node.children[1:-1]:
+                self.visit(child)
+            return
+        elif data == 'func_def_stmt':
+            return
+        elif data in ('print_stmt', 'input_stmt'):
+            effects.io = True
+        elif data == 'func_call_stmt':
+            effects.functions.add(str(node.children[0]))
+        elif data == 'inline_call':
+            # 内联的参数每次调用都重新赋值, 当作写到了同名变量
+            effects.variables.update(signature(node.children[2])[0])
+        elif data == 'class_func':
+            effects.methods.add(str(node.children[1]))
+        elif data in ('this_func', 'super_func'):
+            effects.methods.add(str(node.children[0]))
+        if data == 'assign_stmt':
+            # 先求初值再声明: int x = x + 1 右边的 x 是外层的
+            for var_factor in node.children[1:]:
+                stmt = var_factor.children[0]
+                if stmt.data == 'assign_stmt2':
+                    self.visit(stmt.children[1])
+                self.declare(str(stmt.children[0]))
+        elif data in ('block_stmt', 'for_stmt', 'vector_for_stmt') and self.scopes is not None:
+            self.scopes.append(set())
+            self.visit_children(node)
+            self.scopes.pop()
+        elif data == 'try_catch_stmt':
+            self.visit(node.children[0])
+            if self.scopes is not None:
+                self.scopes.append(set())
+            self.declare(str(node.children[1]))
+            self.visit_children(node.children[2])
+            if self.scopes is not None:
+                self.scopes.pop()
+        else:
+            self.visit_children(node)
+
+    def visit_children(self, node):
+        for child in node.children:
+            if isinstance(child, Tree):
+                self.visit(child)
+
+
+def function_effects(arg_list, block):
+    params = set()
+    if arg_list is not None:
+        params = {str(arg.children[1]) for arg in arg_list.children}
+    collector = Collector([params])
+    collector.visit_children(block)
+    return collector.effects
+
+
+class ProgramEffects:
+    """整个程序里各个函数名、方法名的汇总 (已经包含它们间接调用到的)"""
+
+    def __init__(self, tree):
+        self.functions = {}
+        self.methods = {}
+        for node in tree.iter_subtrees():
+            if node.data == 'func_def_stmt':
+                self.add(self.functions, str(node.children[0]), node.children[1], node.children[2])
+            elif node.data == 'class_func_list':
+                children = node.children
+                for i in range(0, len(children), 3):
+                    self.add(self.methods, str(children[i]), children[i + 1], children[i + 2])
+        changed = True
+        while changed:
+            changed = False
+            for table in (self.functions, self.methods):
+                for effects in table.values():
+                    for callee in self.callees(effects):
+                        if callee is not effects and effects.update(callee):
+                            changed = True
+
+    @staticmethod
+    def add(table, name, arg_list, block):
+        effects = function_effects(arg_list, block)
+        if name in table:
+            table[name].update(effects)
+            table[name].functions |= effects.functions
+            table[name].methods |= effects.methods
+        else:
+            table[name] = effects
+
+    def callees(self, effects):
+        for name in effects.functions:
+            if name in self.functions:
+                yield self.functions[name]
+        for name in effects.methods:
+            if name in self.methods:
+                yield self.methods[name]
+
+    def effects(self, node):
+        """node 执行时可能写到的所有东西: 直接写的 (不分局部全局) 加上调用到的函数/方法写的全局变量"""
+        collector = Collector()
+        collector.visit(node)
+        effects = collector.effects
+        for callee in list(self.callees(effects)):
+            effects.update(callee)
+        return effects
+
+
+# 纯函数里不能出现的结点: 输入输出、数组 (都是全局的)、内置函数、类和实例、this/super、函数定义
+IMPURE = {'print_stmt', 'input_stmt', 'array_def', 'array_access', 'array_assign', 'input_array_stmt',
+          'input_array_fill', 'builtin_call', 'vector_for_stmt', 'class_def', 'class_extends',
+          'class_instance', 'class_instance_trans', 'class_var', 'class_func', 'this_var', 'this_func',
+          'super_var', 'super_func', 'func_def_stmt', 'memo_def_stmt'}
+
+
+class Purity:
+    """
+    检查一个函数体是否纯: 没有 IMPURE 里的结点, 读写的变量都是参数和自己的局部变量,
+    或者只读 constants 里的全局常量。调用到的函数名记在 calls 里, 由 pure_functions 再检查。
+    """
+
+    def __init__(self, params, constants):
+        self.scopes = [set(params)]
+        self.constants = constants
+        self.calls = set()
+
+    def local(self, name):
+        return any(name in scope for scope in self.scopes)
+
+    def check(self, node):
+        if not isinstance(node, Tree):
+            return True
+        data = node.data
+        if data in IMPURE:
+            return False
+        if data == 'var':
+            name = str(node.children[0])
+            return self.local(name) or name in self.constants
+        if data in VARIABLE_WRITES:
+            if not self.local(str(node.children[0])):
+                return False
+        elif data in ('func_call_stmt', 'inline_call'):
+            # 内联的函数体是被调函数的副本, 和普通调用一样按函数名检查
+            self.calls.add(str(node.children[0]))
+            return self.check(node.children[1])
+        elif data == 'assign_stmt':
+            for var_factor in node.children[1:]:
+                stmt = var_factor.children[0]
+                if stmt.data == 'assign_stmt2' and not self.check(stmt.children[1]):
+                    return False
+                self.scopes[-1].add(str(stmt.children[0]))
+            return True
+        elif data in ('block_stmt', 'for_stmt'):
+            self.scopes.append(set())
+            pure = self.check_children(node)
+            self.scopes.pop()
+            return pure
+        elif data == 'try_catch_stmt':
+            if not self.check(node.children[0]):
+                return False
+            self.scopes.append({str(node.children[1])})
+            pure = self.check_children(node.children[2])
+            self.scopes.pop()
+            return pure
+        return self.check_children(node)
+
+    def check_children(self, node):
+        return all(self.check(child) for child in node.children)
+
+
+def constants(tree):
+    """
+    全局常量: 在顶层声明过一次, 整个程序里再也没有同名的声明、参数、catch 变量, 也没有写过的变量。
+    声明之前读它会报错, 声明之后值就不会再变。
+    """
+    top = Counter()
+    bindings = Counter()
+    for node in tree.iter_subtrees():
+        data = node.data
+        if data == 'assign_stmt':
+            for var_factor in node.children[1:]:
+                bindings[str(var_factor.children[0].children[0])] += 1
+        elif data in VARIABLE_WRITES or data == 'arg':
+            bindings[str(node.children[0 if data != 'arg' else 1])] += 1
+        elif data == 'try_catch_stmt':
+            bindings[str(node.children[1])] += 1
+    if tree.data == 'start':
+        for stmt in tree.children:
+            if isinstance(stmt, Tree) and stmt.data == 'assign_stmt':
+                for var_factor in stmt.children[1:]:
+                    top[str(var_factor.children[0].children[0])] += 1
+    return {name for name, count in top.items() if count == 1 and bindings[name] == 1}
+
+
+def pure_functions(tree):
+    """
+    纯函数名 -> 它调用的函数名。同名的重载都纯才算; 调用了不纯的或者没有定义的函数的也不纯,
+    反复去掉直到不再变化 (互相递归的纯函数留下)。
+    """
+    defs = {}
+    for node in tree.iter_subtrees():
+        if node.data == 'func_def_stmt':
+            defs.setdefault(str(node.children[0]), []).append(node)
+    names = constants(tree)
+    calls = {}
+    for name, nodes in defs.items():
+        callees = set()
+        for node in nodes:
+            checker = Purity(signature(node.children[1])[0], names)
+            if not checker.check_children(node.children[2]):
+                break
+            callees |= checker.calls
+        else:
+            calls[name] = callees
+    changed = True
+    while changed:
+        changed = False
+        for name in list(calls):
+            if not calls[name] <= calls.keys():
+                del calls[name]
+                changed = True
+    return calls
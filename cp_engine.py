@@ -0,0 +1,1149 @@
+# -*- coding: utf-8 -*-
+"""
+cp 解释器核心, 不依赖 Qt; graphviz 只在画语法树时才导入。
+
+    from cp_engine import run
+    run(source, stdin=io.StringIO("1 2"))              # 输出写到 sys.stdout, 也可以传 stdout=f
+
+    interpreter = make_interpreter('vm', out=FileSink('out.txt'))   # 其他去处见 cp_output
+
+    python cp_engine.py program.cp --engine closure --stats     # --stats: 优化统计写到 stderr
+    python cp_engine.py program.cp --verify < input.txt         # --verify: 比较优化前后的输出
+    python cp_engine.py program.cp --no-memo f,g --memo-capacity 100   # 记忆化的函数和缓存容量
+    python cp_engine.py program.cp --engine vm --stack-budget 1024      # 调用栈的内存预算 (MB), 只用于 vm
+
+语句的返回值 (控制流信号):
+None     - 正常执行完
+CONTINUE - continue信号
+BREAK    - break信号
+RETURN   - return语句, 返回值放在当前帧的 result 里
+三个信号都是预先建好的单例, 正常执行的语句不分配任何对象。
+"""
+
+import importlib
+
+from lark import Tree
+from lark.visitors import Interpreter
+
+from cp_parser import calc_grammar, calc_parser
+from cp_builtins import bind_builtins, call_builtin
+from cp_input import TokenReader
+from cp_optimize import UNCOMPUTED, optimize, verify
+from cp_output import MemorySink, StreamSink
+from cp_resolve import resolve, LOCAL
+from cp_runtime import MISSING, OPERATORS, ClassTable, Indexers, Memo, array_shape, make_indexer, new_array, store_element, input_element, input_array, signature
+from cp_trace import FIRST_EXIT, HEAD_EXIT, LOOPS, MISS, TAIL_EXIT, prepare_loop, quickened
+from cp_types import check_types
+from cp_vectorize import vectorize
+
+
+# 全局变量表里还没有执行到声明的位置
+UNSET = object()
+
+# 类型特化 (quickening): 执行前把算术和比较结点换成 adaptive, 它执行 QUICKEN_WARMUP 次, 记录两边运算数的类型,
+# 一直是同一种 int/float/str 时换成按运算、类型和两边运算数的种类 (局部变量/全局变量/常量/其他结点) 生成的
+# 特化结点 (如 quick_add_int_slot_const): 运算数直接从槽位或结点上取值, 不再经过 visit; 先检查类型 (guard,
+# 常量不用查), 符合时直接用 Python 的运算符计算, 不再调用通用的函数; 不符时退回 adaptive 重新观察 (deopt),
+# 观察的次数加倍。退回超过 QUICKEN_MAX_DEOPTS 次或者观察到两边类型不同时换成 quick: 运算数照样直接取,
+# 运算用 operator 里的通用函数。内联的运算符和通用函数对任何类型都一样, 所以特化前后结果和报错都一样。
+# cp_types 推断出两边运算数类型的结点 (operands) 不用观察, 直接换成不带 guard 的特化结点。
+# QUICKEN 为 False 时不做特化。循环结点同时换成 traced_loop, 热了以后按执行的路径编译成 Python 函数执行, 见 cp_trace。
+QUICKEN = True
+QUICKEN_WARMUP = 8
+QUICKEN_MAX_DEOPTS = 4
+
+# 特化的运算和特化结点里内联的运算符
+INLINE_OPS = {
+    'add': '+', 'sub': '-', 'mul': '*', 'div': '/', 'div_int': '//', 'mod': '%', 'pow': '**',
+    'less_than': '<', 'less_than_equal': '<=', 'greater_than': '>', 'greater_than_equal': '>=',
+    'equal': '==', 'not_equal': '!=',
+}
+
+QUICK_OPS = {name: OPERATORS[name] for name in INLINE_OPS}
+
+COMPARISONS = ('less_than', 'less_than_equal', 'greater_than', 'greater_than_equal', 'equal', 'not_equal')
+
+# 特化的 (运算, 两边运算数的类型); 字符串只特化拼接和比较
+SPECIALIZED = {(op, kind) for kind, ops in ((int, INLINE_OPS), (float, INLINE_OPS), (str, ('add',) + COMPARISONS))
+               for op in ops}
+
+# quick 结点的运算数: (种类, 槽位/值/结点)
+SLOT_OPERAND = 0
+GLOBAL_OPERAND = 1
+CONST_OPERAND = 2
+NODE_OPERAND = 3
+OPERAND_NAMES = ('slot', 'global', 'const', 'node')
+
+
+def quicken(tree):
+    """
+    执行前把算术/比较结点换成 adaptive, ++/-- 换成 incr (局部或全局的 int 变量直接加减), 循环换成 traced_loop;
+    原来的结点名记在 generic 上, 执行完由 unquicken 换回来, 其他引擎还能用同一棵树。返回各循环的 Loop。
+    """
+    loops = []
+    for node in tree.iter_subtrees():
+        data = node.data
+        if data in LOOPS:
+            loop = prepare_loop(node)
+            if loop is not None:
+                node.generic = data
+                node.data = 'traced_loop'
+                node.loop = loop
+                loops.append(loop)
+        elif not QUICKEN:
+            continue
+        elif data in QUICK_OPS:
+            node.generic = data
+            node.data = 'adaptive'
+            node.func = QUICK_OPS[data]
+            node.left = operand(node.children[0])
+            node.right = operand(node.children[1])
+            node.warmup = QUICKEN_WARMUP
+            node.deopts = 0
+            kind = getattr(node, 'operands', None)
+            if (data, kind) in SPECIALIZED:
+                node.data = specialize(node, kind, guard=False)
+        elif data == 'self_add' or data == 'self_sub':
+            node.generic = data
+            node.data = 'incr'
+            node.local = node.address[0] == LOCAL
+            node.slot = node.address[1]
+            node.delta = 1 if data == 'self_add' else -1
+    return loops
+
+
+def unquicken(tree):
+    for node in tree.iter_subtrees():
+        if quickened(node.data):
+            node.data = node.generic
+
+
+def operand(node):
+    if node.data == 'var':
+        depth, slot = node.address
+        return (SLOT_OPERAND if depth == LOCAL else GLOBAL_OPERAND, slot)
+    if node.data == 'const':
+        return (CONST_OPERAND, node.children[0])
+    return (NODE_OPERAND, node)
+
+
+# 特化结点按运算数的种类取值的代码, 和 CalculateTree.quick 一样
+FETCH = {
+    SLOT_OPERAND: "    {name} = slots[tree.{side}[1]]\n",
+    GLOBAL_OPERAND: "    {name} = self.global_vars[tree.{side}[1]]\n"
+                    "    if {name} is UNSET:\n"
+                    "        {name} = self.visit(tree.children[{index}])\n",
+    CONST_OPERAND: "    {name} = tree.{side}[1]\n",
+    NODE_OPERAND: "    {name} = self.visit(tree.children[{index}])\n",
+}
+
+
+def specialize(tree, kind, guard=True):
+    """
+    tree 的运算在两边都是 kind 类型时的特化结点名; 第一次用到时按 INLINE_OPS 和 FETCH 生成方法,
+    装到 CalculateTree 上。guard 为 False 时类型已经确定, 不检查
+    """
+    left, right = tree.left[0], tree.right[0]
+    name = f'quick_{tree.generic}_{kind.__name__}_{OPERAND_NAMES[left]}_{OPERAND_NAMES[right]}'
+    if not guard:
+        name += '_typed'
+    if not hasattr(CalculateTree, name):
+        lines = [f'def {name}(self, tree):\n']
+        if SLOT_OPERAND in (left, right):
+            lines.append('    slots = self.frame.slots\n')
+        lines.append(FETCH[left].format(name='a', side='left', index=0))
+        lines.append(FETCH[right].format(name='b', side='right', index=1))
+        guards = [f'type({value}) is {kind.__name__}'
+                  for value, source in (('a', left), ('b', right)) if guard and source != CONST_OPERAND]
+        if guards:
+            lines.append(f'    if {" and ".join(guards)}:\n')
+            lines.append(f'        return a {INLINE_OPS[tree.generic]} b\n')
+            lines.append('    return self.deopt(tree, a, b)\n')
+        else:
+            lines.append(f'    return a {INLINE_OPS[tree.generic]} b\n')
+        namespace = {'UNSET': UNSET}
+        exec(''.join(lines), namespace)
+        setattr(CalculateTree, name, namespace[name])
+    return name
+
+
+class Signal:
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+
+BREAK = Signal('break')
+CONTINUE = Signal('continue')
+RETURN = Signal('return')
+
+
+class Frame:
+    """函数 (或主程序) 的一次执行: slots 按槽位存放局部变量, this 是当前类实例, back 指向调用者的帧, result 是 return 的值"""
+    __slots__ = ('slots', 'this', 'back', 'result')
+
+    def __init__(self, size):
+        self.slots = [None] * size
+        self.this = None
+        self.back = None
+        self.result = None
+
+
+class CalculateTree(Interpreter):
+    def __init__(self, stdin=None, out=None, no_memo=frozenset(), memo_capacity=None):
+        self.stdin = stdin
+        self.no_memo = no_memo
+        self.memo_capacity = memo_capacity
+        self.out = MemorySink() if out is None else out
+        self.reader = TokenReader(stdin, self.out.flush)
+        self.global_vars = []
+        self.frame = Frame(0)
+        self.frame_pool = {}
+        self.functions = {}
+        self.functions_version = 0
+        self.classes = ClassTable()
+        self.arrays = {}
+        self.indexers = Indexers()
+        self.memos = []
+        self.loops = []
+
+    @property
+    def printResult(self):
+        return self.out.getvalue()
+
+    # 先求值再写出: 表达式里的函数调用自己也会 print
+    def print_factor_stmt(self, tree):
+        self.out.write(str(self.visit(tree.children[0])))
+
+    def print_sep_stmt(self, tree):
+        self.out.write(str(self.visit(tree.children[0])))
+
+    def print_end_stmt(self, tree):
+        self.out.write(str(self.visit(tree.children[0])))
+
+    def print_stmt(self, tree):
+        for i in range(0, len(tree.children) - 2):
+            stmt = tree.children[i]
+            if stmt == None:
+                continue
+            self.visit(stmt)
+            if tree.children[-2] == None:
+                # print(end=' ')
+                if i < len(tree.children) - 3:
+                    self.out.write(' ')
+            else:
+                self.visit(tree.children[-2])
+        if(tree.children[-1] == None):
+            # print(end='\n')
+            self.out.write('\n')
+        else:
+            self.visit(tree.children[-1])
+
+    def input_stmt(self, tree):
+        for stmt in tree.children[0:]:
+            self.visit(stmt)
+
+    def execute(self, tree):
+        # 先认出数组内置函数, 按写出来的程序解析一遍, 未定义的名字和一定出错的类型在这里就报错
+        # (去掉的死代码里的也算); 然后做完优化, 再认出可以向量化的循环, 最后重新解析变量地址
+        bind_builtins(tree)
+        resolve(tree)
+        check_types(tree)
+        optimize(tree, self.no_memo, self.memo_capacity)
+        vectorize(tree)
+        nglobals, nlocals = resolve(tree)
+        self.global_vars = [UNSET] * nglobals
+        self.frame = Frame(nlocals)
+        if not isinstance(tree, Tree):
+            self.visit(tree)
+            return
+        self.loops = quicken(tree)
+        try:
+            self.visit(tree)
+        finally:
+            unquicken(tree)
+
+    def input_factor_stmt(self, tree):
+        depth, slot = tree.address
+        frame = self.frame.slots if depth == LOCAL else self.global_vars
+        if frame[slot] is UNSET:
+            raise ValueError(f"Variable '{tree.children[0]}' not found")
+        frame[slot] = tree.target.read(self.reader, frame[slot])
+
+    def input_array_stmt(self, tree):
+        name = str(tree.children[0])
+        index = self.array_index(name, tree.children[1:])
+        self.array(name, index)
+        input_element(self.arrays, self.reader, name, index)
+
+    def input_array_fill(self, tree):
+        name = str(tree.children[0])
+        self.array(name, 0)
+        input_array(self.arrays, self.reader, name)
+
+    def assign_stmt(self, tree):
+        var_type = self.visit(tree.children[0])
+        for var_factor in tree.children[1:]:
+            stmt = var_factor.children[0]
+            if stmt.data == 'unassign_stmt':
+                self.unassign_stmt(stmt, var_type)
+            else:
+                self.assign_stmt2(stmt, var_type)
+
+    def assign_to_var(self, tree, name, value):
+        # address 为 None: 同一作用域里重复声明
+        if tree.address is None:
+            raise ValueError(f"Variable '{name}' already exists")
+        depth, slot = tree.address
+        if depth == LOCAL:
+            self.frame.slots[slot] = value
+        else:
+            if self.global_vars[slot] is not UNSET:
+                raise ValueError(f"Variable '{name}' already exists")
+            self.global_vars[slot] = value
+
+    def unassign_stmt(self, tree, var_type):
+        name = str(tree.children[0])
+        value = 0
+        if var_type is str:
+            value = ''
+        self.assign_to_var(tree, name, value)
+
+    # typed: cp_types 证明了执行时的类型检查一定通过
+    def assign_stmt2(self, tree, var_type):
+        name = str(tree.children[0])
+        value = self.visit(tree.children[1])
+        if not tree.typed and (type(value) == str) != (var_type is str):
+            raise TypeError(f"Cannot assign {str(type(value))} value to variable '{name}'.")
+        self.assign_to_var(tree, name, value)
+
+    def reassign_stmt(self, tree):
+        value = self.visit(tree.children[1])
+        if tree.typed:
+            depth, slot = tree.address
+            if depth == LOCAL:
+                self.frame.slots[slot] = value
+                return
+            if self.global_vars[slot] is not UNSET:
+                self.global_vars[slot] = value
+                return
+        name = str(tree.children[0])
+        old = self.get_val(tree)
+        if type(old) != type(value):
+            raise TypeError(f"Cannot assign {type(value).__name__} value to variable '{name}' of type {type(old).__name__}")
+        self.modify_val(tree, value)
+
+    def and_op(self, tree): 
+        return self.visit(tree.children[0]) & self.visit(tree.children[1])
+
+    def or_op(self, tree):
+        return self.visit(tree.children[0]) | self.visit(tree.children[1])
+    
+    def xor_op(self, tree):
+        return self.visit(tree.children[0]) ^ self.visit(tree.children[1])
+    
+    def neg_op(self, tree):
+        return ~self.visit(tree.children[0])
+    
+    def not_op(self, tree):
+        return not self.visit(tree.children[0])
+    
+    def left_shift_op(self, tree):
+        return self.visit(tree.children[0]) << self.visit(tree.children[1])
+    
+    def right_shift_op(self, tree):
+        return self.visit(tree.children[0]) >> self.visit(tree.children[1])
+
+    def add(self, tree):
+        return self.visit(tree.children[0]) + self.visit(tree.children[1])
+
+    def sub(self, tree):
+        return self.visit(tree.children[0]) - self.visit(tree.children[1])
+
+    def mul(self, tree):
+        return self.visit(tree.children[0]) * self.visit(tree.children[1])
+
+    def pow(self, tree):
+        return self.visit(tree.children[0]) ** self.visit(tree.children[1])
+
+    def div(self, tree):
+        return self.visit(tree.children[0]) / self.visit(tree.children[1])
+
+    def div_int(self, tree):
+        return self.visit(tree.children[0]) // self.visit(tree.children[1])
+
+    def mod(self, tree):
+        return self.visit(tree.children[0]) % self.visit(tree.children[1])
+
+    # 类型特化, 见 quicken; tree.func 就是通用的实现, 所以特化前后结果和报错都一样
+    def adaptive(self, tree):
+        a = self.visit(tree.children[0])
+        b = self.visit(tree.children[1])
+        kind = type(a)
+        if kind is not type(b) or (tree.generic, kind) not in SPECIALIZED:
+            tree.data = 'quick'
+        else:
+            tree.warmup -= 1
+            if tree.warmup <= 0:
+                tree.data = specialize(tree, kind)
+        return tree.func(a, b)
+
+    def deopt(self, tree, a, b):
+        # 特化结点的 guard 不符: 退回 adaptive 重新观察, 观察的次数加倍; 运算数已经求过值, 不能再求一遍
+        tree.deopts += 1
+        if tree.deopts > QUICKEN_MAX_DEOPTS:
+            tree.data = 'quick'
+        else:
+            tree.data = 'adaptive'
+            tree.warmup = QUICKEN_WARMUP << tree.deopts
+        return tree.func(a, b)
+
+    # 两边类型不同, 或者退回太多次: 运算数照样直接取, 运算用通用的实现
+    def quick(self, tree):
+        kind, a = tree.left
+        if kind == SLOT_OPERAND:
+            a = self.frame.slots[a]
+        elif kind == GLOBAL_OPERAND:
+            a = self.global_vars[a]
+            if a is UNSET:
+                a = self.visit(tree.children[0])
+        elif kind == NODE_OPERAND:
+            a = self.visit(a)
+        kind, b = tree.right
+        if kind == SLOT_OPERAND:
+            b = self.frame.slots[b]
+        elif kind == GLOBAL_OPERAND:
+            b = self.global_vars[b]
+            if b is UNSET:
+                b = self.visit(tree.children[1])
+        elif kind == NODE_OPERAND:
+            b = self.visit(b)
+        return tree.func(a, b)
+
+    def incr(self, tree):
+        values = self.frame.slots if tree.local else self.global_vars
+        value = values[tree.slot]
+        if type(value) is int:
+            values[tree.slot] = value + tree.delta
+            return
+        # 不是 int (或者还没有声明): 通用实现报错
+        tree.data = tree.generic
+        return self.visit(tree)
+
+    # tree.address 由 cp_resolve 在执行前填好
+    def get_val(self, tree):
+        depth, slot = tree.address
+        if depth == LOCAL:
+            return self.frame.slots[slot]
+        value = self.global_vars[slot]
+        if value is UNSET:
+            raise ValueError(f"Undefined variable '{tree.children[0]}'")
+        return value
+
+    def modify_val(self, tree, value):
+        depth, slot = tree.address
+        if depth == LOCAL:
+            self.frame.slots[slot] = value
+        else:
+            self.global_vars[slot] = value
+
+    def self_add(self, tree):
+        name = str(tree.children[0])
+        value = self.get_val(tree)
+        if not tree.typed and type(value) != int:
+            raise TypeError(f"Cannot use ++ operator on non-integer variable '{name}'")
+        self.modify_val(tree, value + 1)
+    
+    def self_sub(self, tree):
+        name = str(tree.children[0])
+        value = self.get_val(tree)
+        if not tree.typed and type(value) != int:
+            raise TypeError(f"Cannot use -- operator on non-integer variable '{name}'")
+        self.modify_val(tree, value - 1)
+    
+    def aug_add(self, tree):
+        self.modify_val(tree, self.get_val(tree) + self.visit(tree.children[1]))
+    
+    def aug_sub(self, tree):
+        self.modify_val(tree, self.get_val(tree) - self.visit(tree.children[1]))
+    
+    def aug_mul(self, tree):
+        self.modify_val(tree, self.get_val(tree) * self.visit(tree.children[1]))
+
+    def aug_div(self, tree):
+        self.modify_val(tree, self.get_val(tree) / self.visit(tree.children[1]))
+    
+    def aug_mod(self, tree):
+        self.modify_val(tree, self.get_val(tree) % self.visit(tree.children[1]))
+    
+    def aug_div_int(self, tree):
+        self.modify_val(tree, self.get_val(tree) // self.visit(tree.children[1]))
+
+    def aug_pow(self, tree):
+        self.modify_val(tree, self.get_val(tree) ** self.visit(tree.children[1]))
+
+    def aug_right_shift(self, tree):
+        self.modify_val(tree, self.get_val(tree) >> self.visit(tree.children[1]))
+
+    def aug_left_shift(self, tree):
+        self.modify_val(tree, self.get_val(tree) << self.visit(tree.children[1]))
+
+    def aug_or(self, tree):
+        self.modify_val(tree, self.get_val(tree) | self.visit(tree.children[1]))
+
+    def aug_xor(self, tree):
+        self.modify_val(tree, self.get_val(tree) ^ self.visit(tree.children[1]))
+
+    def aug_and(self, tree):
+        self.modify_val(tree, self.get_val(tree) & self.visit(tree.children[1]))
+
+    # cp_optimize 预先解码好的字面量和折叠好的常量
+    def const(self, tree):
+        return tree.children[0]
+
+    def number(self, tree):
+        num_str = str(tree.children[0])
+        return int(num_str) if '.' not in num_str else float(num_str)
+
+    def string(self, tree):
+        str =  tree.children[0][1:-1]
+        return str
+
+    # 类型直接用 Python 的类型对象, 重载按 type(arg) 查表
+    def int_type(self, tree):
+        return int
+
+    def float_type(self, tree):
+        return float
+
+    def string_type(self, tree):
+        return str
+
+    def bool_type(self, tree):
+        return bool
+
+    def var(self, tree):
+        depth, slot = tree.address
+        if depth == LOCAL:
+            return self.frame.slots[slot]
+        return self.get_val(tree)
+
+    def true_bool(self, tree):
+        return True
+
+    def false_bool(self, tree):
+        return False
+
+    def grouped_expr(self, tree):
+        return self.visit(tree.children[0])
+
+    def comment_stmt(self, tree):
+            pass  # 忽略注释
+
+    def less_than(self, tree):
+        return self.visit(tree.children[0]) < self.visit(tree.children[1])
+
+    def less_equal(self, tree):
+        return self.visit(tree.children[0]) <= self.visit(tree.children[1])
+
+    def greater_than(self, tree):
+        return self.visit(tree.children[0]) > self.visit(tree.children[1])
+
+    def greater_equal(self, tree):
+        return self.visit(tree.children[0]) >= self.visit(tree.children[1])
+
+    def equal(self, tree):
+        return self.visit(tree.children[0]) == self.visit(tree.children[1])
+
+    def not_equal(self, tree):
+        return self.visit(tree.children[0]) != self.visit(tree.children[1])
+
+    def less_than_equal(self, tree):
+        return self.visit(tree.children[0]) <= self.visit(tree.children[1])
+
+    def greater_than_equal(self, tree):
+        return self.visit(tree.children[0]) >= self.visit(tree.children[1])
+
+    def condition_func(self, tree):
+        return self.visit(tree.children[0])
+
+    def condition_and_func(self, tree):
+        for stmt in tree.children:
+            if not self.visit(stmt):
+                return False
+        return True
+
+    def condition_or_func(self, tree):
+        for stmt in tree.children:
+            if self.visit(stmt):
+                return True
+        return False
+
+    # 块不再压栈: 块内变量在解析时已经分到了帧里各自的槽位
+    # 表达式语句的值不是 Signal, 直接丢掉
+    def block_stmt(self, tree):
+        for stmt in tree.children:
+            if stmt is None:
+                continue
+            signal = self.visit(stmt)
+            if signal.__class__ is Signal:
+                return signal
+
+    def if_else_stmt(self, tree):
+        for stmt in tree.children:
+            if stmt is None:
+                continue
+            if stmt.data == 'else_stmt':
+                return self.visit(stmt.children[0])
+            if self.visit(stmt.children[0]):
+                return self.visit(stmt.children[1])
+
+    def while_stmt(self, tree):
+        condition, block = tree.children
+        while self.visit(condition):
+            signal = self.visit(block)
+            if signal is BREAK:
+                break
+            if signal is RETURN:
+                return signal
+
+    # continue 之后也要检查条件
+    def do_while_stmt(self, tree):
+        block, condition = tree.children
+        while True:
+            signal = self.visit(block)
+            if signal is BREAK:
+                break
+            if signal is RETURN:
+                return signal
+            if not self.visit(condition):
+                break
+
+    def for_stmt(self, tree):
+        init, condition, update, block = tree.children
+        if init is not None:
+            self.visit(init)
+        while condition is None or self.visit(condition):
+            if block is not None:
+                signal = self.visit(block)
+                if signal is BREAK:
+                    break
+                if signal is RETURN:
+                    return signal
+            if update is not None:
+                self.visit(update)
+
+    # cp_vectorize 认出的循环: 能整体算就一次算完, 否则照常逐次执行
+    def vector_for_stmt(self, tree):
+        if not self.run_vector(tree):
+            return self.for_stmt(tree)
+
+    def run_vector(self, tree):
+        plan = tree.plan
+        values = []
+        for node in plan.nodes:
+            depth, slot = node.address
+            values.append(self.frame.slots[slot] if depth == LOCAL else self.global_vars[slot])
+        return plan.run(self.arrays, values)
+
+    # 追踪编译的循环, 见 cp_trace: 每次迭代先执行 trace, 没有 trace 或者没有进入时解释执行一次迭代,
+    # 中途退出时从退出的语句接着解释执行; 热了以后解释执行时记录每个 if 走的分支
+    def traced_loop(self, tree):
+        loop = tree.loop
+        if tree.generic == 'vector_for_stmt' and self.run_vector(tree):
+            return
+        if loop.init is not None:
+            self.visit(loop.init)
+        condition, block, update = loop.condition, loop.block, loop.update
+        while True:
+            code = MISS if loop.function is None else loop.run(self)
+            if code < MISS:
+                return
+            if code <= HEAD_EXIT:
+                if loop.test_first and condition is not None and not self.visit(condition):
+                    return
+                if block is None:
+                    signal = None
+                elif loop.hot:
+                    signal = self.record_stmt(block, loop.taken)
+                else:
+                    signal = self.visit(block)
+            elif code == TAIL_EXIT:
+                signal = None
+            else:
+                signal = self.resume(loop.points[code - FIRST_EXIT], loop.taken)
+            if signal is BREAK:
+                return
+            if signal is RETURN:
+                return signal
+            if update is not None:
+                self.visit(update)
+            if not loop.test_first and not self.visit(condition):
+                return
+            loop.iterated(self)
+
+    def record_stmt(self, tree, taken):
+        data = tree.data
+        if data == 'block_stmt':
+            return self.record_block(tree, taken)
+        if data != 'if_else_stmt':
+            return self.visit(tree)
+        for index, stmt in enumerate(tree.children):
+            if stmt is None:
+                continue
+            if stmt.data == 'else_stmt':
+                taken.add((id(tree), index))
+                return self.record_stmt(stmt.children[0], taken)
+            if self.visit(stmt.children[0]):
+                taken.add((id(tree), index))
+                return self.record_stmt(stmt.children[1], taken)
+        taken.add((id(tree), len(tree.children)))
+
+    def record_block(self, tree, taken, start=0):
+        children = tree.children
+        for index in range(start, len(children)):
+            stmt = children[index]
+            if stmt is None:
+                continue
+            signal = self.record_stmt(stmt, taken)
+            if signal.__class__ is Signal:
+                return signal
+
+    # trace 在 chain 里最内层的那条语句上退出: 从这条语句执行完所在的块, 再逐层执行外面的块剩下的语句
+    def resume(self, chain, taken):
+        start = 0
+        for block, index in chain:
+            signal = self.record_block(block, taken, index + start)
+            if signal.__class__ is Signal:
+                return signal
+            start = 1
+
+    # cp_optimize 提出的循环不变量: 进入循环时清空, 第一次执行到时求值
+    def hoist_stmt(self, tree):
+        slots = self.frame.slots
+        for node in tree.invariants:
+            slots[node.slot] = UNCOMPUTED
+        return self.visit(tree.children[0])
+
+    def invariant(self, tree):
+        slots = self.frame.slots
+        value = slots[tree.slot]
+        if value is UNCOMPUTED:
+            value = slots[tree.slot] = self.visit(tree.children[0])
+        return value
+
+    def break_stmt(self, tree):
+        return BREAK
+
+    def continue_stmt(self, tree):
+        return CONTINUE
+
+    def func_def_stmt(self, tree):
+        func_name = str(tree.children[0])
+        argsAndTypes = [[], []]
+        if tree.children[1] != None:
+            argsAndTypes = self.visit(tree.children[1])
+        args = argsAndTypes[0]
+        types = tuple(argsAndTypes[1])
+        if (func_name, types) in self.functions:
+            raise ValueError(f"Function '{func_name}' already defined")
+        body = tree.children[2]
+        self.functions[(func_name, types)] = (args, body, None)
+        self.functions_version += 1
+
+    # cp_optimize 记忆化的函数: 照常定义, 再在函数表里配上结果缓存
+    def memo_def_stmt(self, tree):
+        node = tree.children[0]
+        self.visit(node)
+        key = (str(node.children[0]), signature(node.children[1])[1])
+        memo = Memo(*key, tree.capacity)
+        self.memos.append(memo)
+        self.functions[key] = self.functions[key][:2] + (memo,)
+    
+    def arg_list(self, tree):
+        args = []
+        types = []
+        for arg in tree.children:
+            name = str(arg.children[1])
+            arg_type = self.visit(arg.children[0])
+            args.append(name)
+            types.append(arg_type)
+        return [args, types]
+        
+    def dispatch(self, tree, table, version, func_name, arg_values):
+        # 调用点缓存 tree.cache = (函数表, 版本, 参数类型, 函数): 函数表和版本没变、
+        # 参数类型逐个是同一个类型对象时直接用上次的结果, 不再拼 key 查表
+        types = tuple(map(type, arg_values))
+        cache = tree.cache
+        if cache is not None and cache[0] is table and cache[1] == version and cache[2] == types:
+            return cache[3]
+        target = table.get((func_name, types))
+        if target is not None:
+            tree.cache = (table, version, types, target)
+        return target
+
+    def func_call_stmt(self, tree):
+        arg_values = []
+        if tree.children[1] is not None:
+            arg_values = self.visit(tree.children[1])
+        target = self.dispatch(tree, self.functions, self.functions_version, tree.children[0], arg_values)
+        if target is None:
+            raise NameError(f"Function '{tree.children[0]}' not defined")
+        args, body, memo = target
+        if memo is not None:
+            key = memo.key(arg_values)
+            value = memo.lookup(key)
+            if value is not MISSING:
+                return value
+        # 参数占帧的前几个槽位; 不论正常返回还是异常穿出, 都要弹出帧。压入弹出直接写在这里
+        # (class_func_impl 也一样), 每层 cp 调用不多占一个 Python 栈帧
+        frame = self.push_frame(body.nlocals, self.frame.this)
+        frame.slots[:len(arg_values)] = arg_values
+        try:
+            value = frame.result if self.visit(body) is RETURN else None
+        finally:
+            self.pop_frame()
+        if memo is not None:
+            memo.store(key, value)
+        return value
+    
+    # cp_optimize 内联的调用: 参数放进当前帧的隐藏槽位, 再求函数体表达式
+    def inline_call(self, tree):
+        arg_values = []
+        if tree.children[1] is not None:
+            arg_values = self.visit(tree.children[1])
+        if tuple(map(type, arg_values)) != tree.types:
+            raise NameError(f"Function '{tree.children[0]}' not defined")
+        slots = self.frame.slots
+        for slot, value in zip(tree.slots, arg_values):
+            slots[slot] = value
+        return self.visit(tree.children[3])
+
+    def builtin_call(self, tree):
+        args = [str(arg.children[0]) if arg.data == 'array_name' else self.visit(arg)
+                for arg in tree.children[1].children]
+        return call_builtin(self.arrays, str(tree.children[0]), args)
+
+    def push_frame(self, size, this):
+        pool = self.frame_pool.get(size)
+        frame = pool.pop() if pool else Frame(size)
+        frame.this = this
+        frame.back = self.frame
+        self.frame = frame
+        return frame
+
+    def pop_frame(self):
+        # 用完的帧放回池里按大小复用; 槽位里的旧值会在下次使用前被覆盖
+        frame = self.frame
+        self.frame = frame.back
+        frame.back = frame.this = frame.result = None
+        self.frame_pool.setdefault(len(frame.slots), []).append(frame)
+
+    def arg_values(self, tree):
+        arg_values = []
+        for arg in tree.children:
+            arg_values.append(self.visit(arg))
+        return arg_values
+    
+    def return_stmt(self, tree):
+        if tree.children[0] != None:
+            return_value = self.visit(tree.children[0])
+        else:
+            return_value = None
+        self.frame.result = return_value
+        return RETURN
+
+    # 类和实例放在 ClassTable 里 (cp_runtime), 与编译型引擎共用;
+    # 帧里的 this 直接是 ClassLayout / Instance 对象
+    def class_def(self, tree):
+        class_name = str(tree.children[0])
+        if class_name in self.classes:
+            raise NameError(f"Class '{class_name}' already defined")
+        self.define_class(class_name, None, tree.children[1], tree.children[2])
+
+    def class_extends(self, tree):
+        class_name = str(tree.children[0])
+        base_class = str(tree.children[1])
+        if base_class not in self.classes:
+            raise NameError(f"Class '{base_class}' not defined")
+        if class_name in self.classes:
+            raise NameError(f"Class '{class_name}' already defined")
+        self.define_class(class_name, base_class, tree.children[2], tree.children[3])
+
+    def define_class(self, class_name, base_class, var_list, func_list):
+        class_vars = {}
+        class_funcs = {}
+        if var_list is not None:
+            class_vars = self.visit(var_list)
+        if func_list is not None:
+            class_funcs = self.visit(func_list)
+        self.classes.define(class_name, base_class, class_vars.keys(), class_funcs.items(), class_vars.values())
+
+    def class_arg_list(self, tree):
+        class_vars = {}
+        for i in range(0, len(tree.children), 2):
+            arg = tree.children[i]
+            value = tree.children[i+1]
+            name = str(arg.children[1])
+            if value is None:
+                value = 0
+                if self.visit(arg.children[0]) is str:
+                    value = ''
+            else:
+                value = self.visit(value)
+            class_vars[name] = value
+        return class_vars
+
+    def class_func_list(self, tree):
+        class_funcs = {}
+        for i in range(0, len(tree.children), 3):
+            name = str(tree.children[i])
+            args = []
+            types = []
+            if tree.children[i+1] is not None:
+                argsAndTypes = self.visit(tree.children[i+1])
+                args = argsAndTypes[0]
+                types = argsAndTypes[1]
+            types = tuple(types)
+            body = tree.children[i+2]
+            if (name, types) in class_funcs:
+                raise ValueError(f"Function '{name}' already defined")
+            class_funcs[(name, types)] = (args, body)
+        return class_funcs
+
+    def class_instance(self, tree):
+        class_type, class_name, class_type2 = (str(child) for child in tree.children)
+        self.classes.new_instance(class_type, class_name, class_type2)
+
+    def class_instance_trans(self, tree):
+        class_name, class_type2 = (str(child) for child in tree.children)
+        self.classes.new_instance(None, class_name, class_type2)
+
+    def class_func_impl(self, tree, obj, func_name):
+        func_values = []
+        if tree.children[-1] is not None:
+            func_values = self.visit(tree.children[-1])
+        # 类的方法表建好后不再修改, 版本固定为 0
+        target = self.dispatch(tree, obj.methods, 0, func_name, func_values)
+        if target is None:
+            raise NameError(f"Class '{obj.name}' has no function '{func_name}'")
+        args, body = target
+        frame = self.push_frame(body.nlocals, obj)
+        frame.slots[:len(func_values)] = func_values
+        try:
+            return frame.result if self.visit(body) is RETURN else None
+        finally:
+            self.pop_frame()
+
+    def field(self, tree, obj, var):
+        # 调用点缓存 tree.cache = (布局, 槽位): 同一个布局的对象直接按下标取字段
+        layout = obj.layout
+        cache = tree.cache
+        if cache is not None and cache[0] is layout:
+            return obj.fields[cache[1]]
+        value = self.classes.field(obj, var)
+        tree.cache = (layout, layout.field_index[var])
+        return value
+
+    def current_this(self):
+        this = self.frame.this
+        if this is None:
+            raise NameError("No class instance defined")
+        return this
+
+    def class_var(self, tree):
+        name = str(tree.children[0])
+        if name not in self.classes:
+            raise NameError(f"Class instance '{name}' not defined")
+        return self.field(tree, self.classes[name], tree.children[1])
+
+    def class_func(self, tree):
+        class_name = str(tree.children[0])
+        if class_name not in self.classes:
+            raise NameError(f"Class '{class_name}' not defined")
+        return self.class_func_impl(tree, self.classes[class_name], str(tree.children[1]))
+
+    def this_var(self, tree):
+        return self.field(tree, self.current_this(), tree.children[0])
+
+    def this_func(self, tree):
+        return self.class_func_impl(tree, self.current_this(), str(tree.children[0]))
+
+    def super_var(self, tree):
+        base = self.classes.super_of(self.current_this())
+        return self.field(tree, base, tree.children[0])
+
+    def super_func(self, tree):
+        base = self.classes.super_of(self.current_this())
+        return self.class_func_impl(tree, base, str(tree.children[0]))
+
+    def try_catch_stmt(self, tree):
+        try:
+            return self.visit(tree.children[0])
+        except Exception as e:
+            self.frame.slots[tree.slot] = "try-catch warning : " + str(e)
+            return self.visit(tree.children[2])
+
+    def array_def(self, tree):
+        var_type = self.visit(tree.children[0])
+        name = str(tree.children[1])
+        shape, size = array_shape([self.visit(child) for child in tree.children[2:]])
+        self.arrays[name] = new_array(var_type, size)
+        self.indexers[name] = make_indexer(name, shape)
+
+    # 一个下标就是扁平存储里的位置, 多个下标按行优先的 stride 换算
+    def array_index(self, name, children):
+        if len(children) == 1:
+            return int(self.visit(children[0]))
+        indexes = [self.visit(child) for child in children]
+        return self.indexers[name](*indexes)
+
+    def array(self, name, index):
+        if name not in self.arrays:
+            raise NameError(f"Array '{name}' not defined")
+        array = self.arrays[name]
+        if index >= len(array):
+            raise IndexError(f"Array '{name}' index out of range")
+        return array
+
+    def array_access(self, tree):
+        name = str(tree.children[0])
+        if len(tree.children) == 2:
+            index = int(self.visit(tree.children[1]))
+        else:
+            index = self.array_index(name, tree.children[1:])
+        return self.array(name, index)[index]
+
+    # 元素类型由数组存储本身检查, 失败时才走 store_element (加宽或报类型不符)
+    def array_assign(self, tree):
+        name = str(tree.children[0])
+        index = self.array_index(name, tree.children[1:-1])
+        value = self.visit(tree.children[-1])
+        try:
+            self.array(name, index)[index] = value
+        except (TypeError, OverflowError):
+            store_element(self.arrays, name, index, value)
+
+
+def draw_tree(tree, graph, parent=None, count=0):
+    node_id = str(count)
+    label = tree.data if isinstance(tree, Tree) else str(tree)
+    graph.node(node_id, label)
+
+    if parent is not None:
+        graph.edge(parent, node_id)
+
+    count += 1
+    for child in tree.children:
+        if isinstance(child, Tree):
+            count = draw_tree(child, graph, node_id, count)
+        else:
+            leaf_id = str(count)
+            graph.node(leaf_id, str(child))
+            graph.edge(node_id, leaf_id)
+            count += 1
+    return count
+
+def visualize_tree(tree):
+    from graphviz import Digraph
+    graph = Digraph(format="png")
+    draw_tree(tree, graph)
+    return graph
+
+
+# 可选的执行引擎: 名字 -> (模块, 类), 用到时才导入
+ENGINES = {
+    'tree': ('cp_engine', 'CalculateTree'),
+    'vm': ('cp_vm', 'VM'),
+    'closure': ('cp_closure', 'ClosureEngine'),
+    'python': ('cp_transpile', 'PythonEngine'),
+}
+
+
+def make_interpreter(engine='tree', stdin=None, out=None, no_memo=frozenset(), memo_capacity=None, stack_budget=None):
+    """
+    no_memo 是这个程序里不做记忆化的函数名, memo_capacity 是每个记忆化函数的缓存容量 (默认 MEMO_CAPACITY),
+    stack_budget 是 vm 调用栈的内存预算 (字节, 默认 cp_vm.STACK_BUDGET), 其它引擎不用
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}', expected one of {', '.join(ENGINES)}")
+    module, name = ENGINES[engine]
+    engine_class = getattr(importlib.import_module(module), name)
+    options = {'stack_budget': stack_budget} if engine == 'vm' else {}
+    return engine_class(stdin=stdin, out=out, no_memo=no_memo, memo_capacity=memo_capacity, **options)
+
+
+def run(source, stdin=None, stdout=None, engine='tree'):
+    """
+    执行程序, 输出边执行边分块写到 stdout (默认 sys.stdout); 出错时已经 print 的部分也会写出。
+    source 是源码, 也可以是已经解析好的语法树。
+    """
+    tree = calc_parser.parse(source) if isinstance(source, str) else source
+    out = StreamSink(stdout)
+    try:
+        make_interpreter(engine, stdin, out).execute(tree)
+    finally:
+        out.flush()
+
+
+def main(argv=None):
+    import argparse
+    import copy
+    import sys
+    parser = argparse.ArgumentParser(description='run a cp program')
+    parser.add_argument('file')
+    parser.add_argument('--engine', default='tree', choices=list(ENGINES))
+    parser.add_argument('--stats', action='store_true', help='print optimizer statistics to stderr')
+    parser.add_argument('--verify', action='store_true',
+                        help='run with and without the optimizer and check that the output is the same')
+    parser.add_argument('--no-memo', default='', metavar='NAMES',
+                        help='comma-separated functions that are never memoized')
+    parser.add_argument('--memo-capacity', type=int, metavar='N',
+                        help='results kept per memoized function (least recently used are evicted)')
+    parser.add_argument('--stack-budget', type=int, metavar='MB',
+                        help='memory budget of the vm call stack; deeper recursion raises RecursionError')
+    args = parser.parse_args(argv)
+    no_memo = frozenset(name for name in args.no_memo.split(',') if name)
+    stack_budget = args.stack_budget * 1024 * 1024 if args.stack_budget is not None else None
+    with open(args.file, encoding='utf-8') as f:
+        source = f.read()
+    if args.verify:
+        # 要执行两遍, 输入先全部读进来; 没有重定向时当作没有输入
+        stdin = '' if sys.stdin.isatty() else sys.stdin.read()
+        same, expected, actual = verify(source, args.engine, stdin, no_memo, args.memo_capacity, stack_budget)
+        sys.stdout.write(actual)
+        if not same:
+            print(f'optimized output differs, expected:\n{expected}', file=sys.stderr)
+            sys.exit(1)
+        print('optimized output is the same', file=sys.stderr)
+        return
+    tree = calc_parser.parse(source)
+    if args.stats:
+        # 在副本上统计: 引擎要先按原来的程序解析变量, 再自己做检查和优化
+        stats_tree = copy.deepcopy(tree)
+        bind_builtins(stats_tree)
+        print(f'types: {check_types(stats_tree)}', file=sys.stderr)
+        for name, stats in optimize(stats_tree, no_memo, args.memo_capacity).items():
+            print(f'{name}: {stats}', file=sys.stderr)
+    out = StreamSink()
+    interpreter = make_interpreter(args.engine, out=out, no_memo=no_memo, memo_capacity=args.memo_capacity,
+                                   stack_budget=stack_budget)
+    try:
+        interpreter.execute(tree)
+    finally:
+        out.flush()
+        if args.stats:
+            # 记忆化的命中情况要执行完才知道
+            for memo in interpreter.memos:
+                print(f'memo {memo}', file=sys.stderr)
+            for loop in getattr(interpreter, 'loops', []):
+                if loop.compiles:
+                    print(f'trace {loop}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+cin 的输入: 按空白切分的 token 流, 所有引擎共用。
+
+    TokenReader()                 从 sys.stdin 读
+    TokenReader(io.StringIO(s))   从文件对象读
+    TokenReader("1 2 3")          直接给出全部输入
+
+不是终端的输入第一次用到时一次读完再切分; 终端输入一次读一行, 读之前调用 before_read
+(引擎传入 out.flush, 让提示先显示出来)。
+
+每个 >> 目标读一个 token, 按变量当前值的类型转换: str 原样, float 用 float(), 其余按 int();
+转换函数由每个目标自己的 InputTarget 解析一次后复用。
+数组元素按数组的存储类型转换 (见 cp_runtime.input_element / input_array)。
+"""
+
+import sys
+
+
+CONVERTERS = {str: str, float: float}
+
+
+def converter(value):
+    return CONVERTERS.get(type(value), int)
+
+
+class TokenReader:
+    def __init__(self, source=None, before_read=None):
+        self.before_read = before_read
+        self.tokens = []
+        self.pos = 0
+        if isinstance(source, str):
+            self.tokens = source.split()
+            source = None
+        elif source is None:
+            source = sys.stdin
+        self.source = source
+        isatty = getattr(source, 'isatty', None)
+        self.interactive = isatty is not None and isatty()
+
+    def fill(self):
+        # 当前 token 用完了, 再读一批; 没有更多输入时返回 False
+        if self.source is None:
+            return False
+        if self.interactive:
+            if self.before_read is not None:
+                self.before_read()
+            line = self.source.readline()
+            if not line:
+                self.source = None
+                return False
+            self.tokens = line.split()
+        else:
+            self.tokens = self.source.read().split()
+            self.source = None
+        self.pos = 0
+        return True
+
+    def next(self):
+        while self.pos >= len(self.tokens):
+            if not self.fill():
+                raise EOFError("EOF when reading a line")
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def take(self, n):
+        while len(self.tokens) - self.pos < n:
+            rest = self.tokens[self.pos:]
+            if not self.fill():
+                raise EOFError("EOF when reading a line")
+            self.tokens = rest + self.tokens
+            self.pos = 0
+        tokens = self.tokens[self.pos:self.pos + n]
+        self.pos += n
+        return tokens
+
+
+class InputTarget:
+    """
+    一个 >> 变量目标的转换函数: 第一次读入时按变量当前值的类型解析, 之后类型没变就直接复用。
+    读进来的值就是转换的结果, 类型不会再变, 所以同一个目标一般只解析一次。
+    """
+
+    __slots__ = ('type', 'convert')
+
+    def __init__(self):
+        self.type = None
+        self.convert = None
+
+    def read(self, reader, old):
+        """读一个 token, 按 old 的类型转换"""
+        if old.__class__ is not self.type:
+            self.type = old.__class__
+            self.convert = converter(old)
+        return self.convert(reader.next())
@@ -0,0 +1,673 @@
+# -*- coding: utf-8 -*-
+"""
+执行前在语法树上做的优化, 所有引擎共用。optimize(tree) 依次执行 PASSES 里的各个 pass,
+返回 {pass 名: 统计}; 每个 pass 都可以对同一棵树重复执行。
+
+fold (fold_constants): 字面量预先解码, 常量子表达式预先算好
+    number/string/True/False 变成 const 结点, children[0] 就是值, 执行时不再解析 token 文本;
+    运算数都是 const 的算术、比较、位运算、~、! 直接算出结果, 也变成 const;
+    grouped_expr 去掉, 直接换成里面的表达式;
+    && / || 条件里的常量: 能决定结果时整个条件变成常量, 不能决定时去掉。
+    运算会出错 (除以 0、类型不符、数字写法不对) 或者结果太大时不折叠, 留到执行时照常报错。
+
+dead_code (eliminate_dead_code): 去掉执行不到的语句和没有用到的顶层 func/class, 规则见 DeadCode。
+
+inline (inline_functions): 只有一条 return 表达式的小函数在调用点内联, 规则见 Inliner。
+
+memo (memoize_functions): 递归的纯函数记住每组实参的结果, 规则见 memoize_functions。
+
+hoist (hoist_invariants): 循环不变量外提, 循环写到哪些东西由 cp_effects 分析, 规则见 Hoister。
+
+verify(source) 在关掉所有 pass (disabled) 和正常优化时各执行一遍, 检查输出是否一致。
+"""
+
+import copy
+import io
+import operator
+
+from lark import Token, Tree
+
+from cp_builtins import WRITERS
+from cp_effects import ProgramEffects, pure_functions
+from cp_runtime import OPERATORS, signature
+
+
+# 折叠结果的上限: 超过时留到执行时再算
+MAX_BITS = 4096
+MAX_STRING = 4096
+
+UNARY = {
+    'neg_op': operator.invert,
+    'not_op': operator.not_,
+}
+
+LITERALS = {
+    'true_bool': True,
+    'false_bool': False,
+}
+
+
+def is_const(node):
+    return isinstance(node, Tree) and node.data == 'const'
+
+
+def decode(node):
+    """字面量结点的值, 解码不了时抛 ValueError"""
+    if node.data == 'number':
+        text = str(node.children[0])
+        return int(text) if '.' not in text else float(text)
+    if node.data == 'string':
+        return str(node.children[0][1:-1])
+    return LITERALS[node.data]
+
+
+def too_big(data, a, b):
+    # 只对 int 和 str 做检查, float 运算的结果大小固定
+    if type(a) is int and type(b) is int:
+        if data == 'pow':
+            return b > 0 and a not in (0, 1, -1) and a.bit_length() * b > MAX_BITS
+        if data == 'left_shift_op':
+            return a.bit_length() + b > MAX_BITS
+    if data == 'mul':
+        for s, n in ((a, b), (b, a)):
+            if type(s) is str and type(n) is int and len(s) * n > MAX_STRING:
+                return True
+    return False
+
+
+def replace(node, data, children):
+    node.data = data
+    node.children = children
+
+
+class FoldStats:
+    def __init__(self):
+        self.decoded = 0
+        self.folded = 0
+        self.removed = 0
+
+    def __repr__(self):
+        return f'{self.folded} expressions folded, {self.removed} nodes removed, {self.decoded} literals decoded'
+
+
+class Folder:
+    def __init__(self):
+        self.stats = FoldStats()
+
+    def fold(self, tree):
+        # iter_subtrees 自底向上, 处理一个结点时它的子结点已经折叠过了
+        for node in list(tree.iter_subtrees()):
+            data = node.data
+            if data in ('number', 'string') or data in LITERALS:
+                self.literal(node)
+            elif data == 'grouped_expr':
+                child = node.children[0]
+                replace(node, child.data, child.children)
+                node.__dict__.update(child.__dict__)
+                self.stats.removed += 1
+            elif data in OPERATORS:
+                a, b = node.children
+                if is_const(a) and is_const(b):
+                    self.binary(node, a.children[0], b.children[0])
+            elif data in UNARY:
+                if is_const(node.children[0]):
+                    self.fold_to(node, UNARY[data], node.children[0].children[0])
+            elif data in ('condition_and_func', 'condition_or_func'):
+                self.condition(node, data == 'condition_or_func')
+        return self.stats
+
+    def literal(self, node):
+        try:
+            value = decode(node)
+        except ValueError:
+            return
+        replace(node, 'const', [value])
+        self.stats.decoded += 1
+
+    def binary(self, node, a, b):
+        if not too_big(node.data, a, b):
+            self.fold_to(node, OPERATORS[node.data], a, b)
+
+    def fold_to(self, node, op, *args):
+        try:
+            value = op(*args)
+        except Exception:
+            return
+        self.stats.folded += 1
+        self.stats.removed += len(node.children)
+        replace(node, 'const', [value])
+
+    def condition(self, node, is_or):
+        """
+        && 遇到假 / || 遇到真的常量时结果已定, 后面的表达式不会执行, 去掉;
+        不起作用的常量也去掉。前面留下的表达式照样执行 (可能有副作用)。
+        """
+        before = len(node.children)
+        kept = []
+        decided = False
+        for child in node.children:
+            if not is_const(child):
+                kept.append(child)
+            elif bool(child.children[0]) == is_or:
+                decided = True
+                break
+        if not kept:
+            # 全是常量: 条件本身就是常量
+            replace(node, 'condition_func', [Tree('const', [is_or if decided else not is_or])])
+            self.stats.folded += 1
+            self.stats.removed += before - 1
+            return
+        if decided:
+            kept.append(Tree('const', [is_or]))
+        if len(kept) == 1:
+            # 只剩一个表达式时, 条件的真假就是它本身的真假
+            replace(node, 'condition_func', kept)
+        else:
+            node.children = kept
+        self.stats.removed += before - len(kept)
+
+
+def fold_constants(tree):
+    if not isinstance(tree, Tree):
+        return FoldStats()
+    return Folder().fold(tree)
+
+
+def size(node):
+    return sum(1 for _ in node.iter_subtrees()) if isinstance(node, Tree) else 0
+
+
+def const_condition(condition):
+    """条件是常量时返回 (值,), 否则返回 None"""
+    if condition.data == 'condition_func' and is_const(condition.children[0]):
+        return (condition.children[0].children[0],)
+    return None
+
+
+def names(node):
+    # 子树里出现的所有名字
+    return {str(child) for subtree in node.iter_subtrees() for child in subtree.children if isinstance(child, Token)}
+
+
+def definition_key(stmt):
+    # 重复定义时报错的依据: 函数是名字和参数类型, 类是名字
+    if stmt.data == 'func_def_stmt':
+        return ('func', str(stmt.children[0]), signature(stmt.children[1])[1])
+    return ('class', str(stmt.children[0]))
+
+
+class DeadCodeStats:
+    def __init__(self):
+        self.branches = 0
+        self.statements = 0
+        self.functions = 0
+        self.classes = 0
+        self.removed = 0
+
+    def __repr__(self):
+        return (f'{self.branches} branches, {self.statements} unreachable statements, '
+                f'{self.functions} functions, {self.classes} classes removed ({self.removed} nodes)')
+
+
+class DeadCode:
+    """
+    去掉执行不到的代码, 在常量折叠之后做:
+    - if/elif 的条件是常量: 假的分支去掉, 真的分支变成 else, 后面的分支去掉;
+      只剩 else 时整个 if 换成那个块 (块照样是一层作用域), 一个分支都不剩时去掉整条语句;
+    - while 的条件是常量假: 去掉整条语句 (do-while 至少执行一次, for 的初始化语句有作用, 都不动);
+    - 块里 return/break/continue 后面的语句 (顶层的这三种语句只结束当前这条语句, 后面照常执行, 不动);
+    - 没有被用到的顶层 func/class: 从其他顶层语句里出现的名字出发, 用到的 func/class 里出现的名字也算用到,
+      一直找不到的去掉 (互相调用但没人调用的也去掉); 类要求字段初值都是常量 (定义类时不会出错也没有副作用);
+      同名同参数类型的函数、同名的类定义了不止一次时都不动, 执行到第二个时照样报错。
+    """
+
+    def __init__(self):
+        self.stats = DeadCodeStats()
+
+    def run(self, tree):
+        # 自底向上: 处理一个块时, 里面的块已经处理过了
+        for node in list(tree.iter_subtrees()):
+            if node.data == 'block_stmt' or node.data == 'start':
+                node.children = self.stmts(node.children, node.data == 'block_stmt')
+        if tree.data == 'start':
+            self.definitions(tree)
+        return self.stats
+
+    def stmts(self, children, in_block):
+        kept = []
+        for index, stmt in enumerate(children):
+            if isinstance(stmt, Tree):
+                before = size(stmt)
+                if stmt.data == 'if_else_stmt':
+                    stmt = self.if_else(stmt)
+                elif stmt.data == 'while_stmt':
+                    value = const_condition(stmt.children[0])
+                    if value is not None and not value[0]:
+                        self.stats.branches += 1
+                        stmt = None
+                self.stats.removed += before - size(stmt)
+            if stmt is None:
+                continue
+            kept.append(stmt)
+            if in_block and isinstance(stmt, Tree) and stmt.data in ('return_stmt', 'break_stmt', 'continue_stmt'):
+                rest = [child for child in children[index + 1:] if child is not None]
+                self.stats.statements += len(rest)
+                self.stats.removed += sum(size(child) for child in rest)
+                break
+        return kept
+
+    def if_else(self, node):
+        clauses = []
+        for clause in node.children:
+            if clause is None:
+                continue
+            if clause.data == 'else_stmt':
+                clauses.append(clause)
+                break
+            value = const_condition(clause.children[0])
+            if value is None:
+                clauses.append(clause)
+                continue
+            self.stats.branches += 1
+            if value[0]:
+                clauses.append(Tree('else_stmt', [clause.children[1]]))
+                break
+        if not clauses:
+            return None
+        if clauses[0].data == 'else_stmt':
+            block = clauses[0].children[0]
+            replace(node, block.data, block.children)
+        else:
+            node.children = clauses
+        return node
+
+    def definitions(self, tree):
+        # 从其他顶层语句用到的名字出发, 找出能用到的 func/class, 剩下的去掉
+        removable = [stmt for stmt in tree.children if isinstance(stmt, Tree) and self.removable(stmt)]
+        counts = {}
+        for def_ in removable:
+            key = definition_key(def_)
+            counts[key] = counts.get(key, 0) + 1
+        removable = [def_ for def_ in removable if counts[definition_key(def_)] == 1]
+        used = set()
+        for stmt in tree.children:
+            if not any(stmt is def_ for def_ in removable):
+                used.update(names(stmt))
+        pending = removable
+        while True:
+            reached = [def_ for def_ in pending if str(def_.children[0]) in used]
+            if not reached:
+                break
+            pending = [def_ for def_ in pending if str(def_.children[0]) not in used]
+            for def_ in reached:
+                used.update(names(def_))
+        # Tree 的 == 比较结构, 按对象本身去掉
+        dead = {id(def_) for def_ in pending}
+        tree.children = [stmt for stmt in tree.children if id(stmt) not in dead]
+        for def_ in pending:
+            self.stats.removed += size(def_)
+            if def_.data == 'func_def_stmt':
+                self.stats.functions += 1
+            else:
+                self.stats.classes += 1
+
+    def removable(self, stmt):
+        if stmt.data == 'func_def_stmt':
+            return True
+        if stmt.data != 'class_def':
+            return False
+        fields = stmt.children[1]
+        return fields is None or all(value is None or is_const(value) for value in fields.children[1::2])
+
+
+def eliminate_dead_code(tree):
+    if not isinstance(tree, Tree):
+        return DeadCodeStats()
+    return DeadCode().run(tree)
+
+
+# 内联的上限: 被调函数的函数体 (里面的调用也内联之后) 的结点数, 整个程序因为内联增加的结点数
+INLINE_MAX_NODES = 40
+INLINE_MAX_GROWTH = 20000
+
+
+class InlineStats:
+    def __init__(self):
+        self.functions = 0
+        self.sites = 0
+        self.nodes = 0
+
+    def __repr__(self):
+        return f'{self.sites} calls to {self.functions} functions inlined ({self.nodes} nodes added)'
+
+
+class Inliner:
+    """
+    把小函数的调用换成函数体。可以内联的函数:
+    - 整个程序里只有这一个同名的 func 定义 (没有重载), 并且在顶层开头连续的 func 定义里,
+      其他语句执行之前就已经定义好;
+    - 函数体只有一条 return 表达式, 参数不重名;
+    - 不直接或间接调用自己 (只看普通函数调用);
+    - 函数体里的调用也内联之后, 结点数不超过 INLINE_MAX_NODES。
+    参数个数对得上的调用点换成 inline_call(函数名, 实参, 形参表, 函数体的副本), 程序增加的结点数超过
+    INLINE_MAX_GROWTH 后不再内联。
+
+    引擎执行 inline_call 时按顺序求实参, 参数类型和形参表不一致时与普通调用一样报 "Function not defined",
+    然后把实参放进当前帧里的隐藏槽位, 在只有这些参数和全局变量的作用域里求函数体; this 与普通函数调用
+    一样沿用调用者的。函数定义本身保留。
+    """
+
+    def __init__(self, tree):
+        self.stats = InlineStats()
+        self.candidates = {}
+        self.expanded = {}
+        self.inlined = set()
+        defs = {}
+        for node in tree.find_data('func_def_stmt'):
+            defs.setdefault(str(node.children[0]), []).append(node)
+        leading = set()
+        for stmt in tree.children if tree.data == 'start' else []:
+            if isinstance(stmt, Tree) and stmt.data == 'memo_def_stmt':
+                stmt = stmt.children[0]
+            if not isinstance(stmt, Tree) or stmt.data != 'func_def_stmt':
+                break
+            leading.add(id(stmt))
+        calls = {name: {str(call.children[0]) for node in nodes for call in node.find_data('func_call_stmt')}
+                 for name, nodes in defs.items()}
+        for name, nodes in defs.items():
+            if len(nodes) != 1 or id(nodes[0]) not in leading or self.recursive(name, calls):
+                continue
+            _, arg_list, block = nodes[0].children
+            stmts = [stmt for stmt in block.children if stmt is not None]
+            if len(stmts) != 1 or stmts[0].data != 'return_stmt' or stmts[0].children[0] is None:
+                continue
+            params, _ = signature(arg_list)
+            if len(set(params)) == len(params):
+                self.candidates[name] = (arg_list, stmts[0].children[0])
+
+    @staticmethod
+    def recursive(name, calls):
+        seen = set()
+        pending = list(calls[name])
+        while pending:
+            callee = pending.pop()
+            if callee == name:
+                return True
+            if callee in calls and callee not in seen:
+                seen.add(callee)
+                pending.extend(calls[callee])
+        return False
+
+    def body(self, name):
+        # 展开了里面的调用的函数体, 太大时为 None; 不递归, 所以一定能展开完
+        if name not in self.expanded:
+            body = copy.deepcopy(self.candidates[name][1])
+            self.substitute(body, False)
+            self.expanded[name] = body if size(body) <= INLINE_MAX_NODES else None
+        return self.expanded[name]
+
+    def substitute(self, tree, count):
+        for node in list(tree.iter_subtrees()):
+            if node.data != 'func_call_stmt':
+                continue
+            name = str(node.children[0])
+            if name not in self.candidates:
+                continue
+            arg_list = self.candidates[name][0]
+            nargs = len(node.children[1].children) if node.children[1] is not None else 0
+            if nargs != len(signature(arg_list)[0]):
+                continue
+            body = self.body(name)
+            if body is None:
+                continue
+            if count:
+                if self.stats.nodes + size(body) > INLINE_MAX_GROWTH:
+                    return
+                self.stats.sites += 1
+                self.stats.nodes += size(body)
+                self.inlined.add(name)
+            replace(node, 'inline_call', [node.children[0], node.children[1],
+                                          copy.deepcopy(arg_list), copy.deepcopy(body)])
+
+    def run(self, tree):
+        self.substitute(tree, True)
+        self.stats.functions = len(self.inlined)
+        return self.stats
+
+
+def inline_functions(tree):
+    if not isinstance(tree, Tree):
+        return InlineStats()
+    return Inliner(tree).run(tree)
+
+
+class MemoStats:
+    def __init__(self):
+        self.functions = []
+
+    def __repr__(self):
+        names = f' ({", ".join(self.functions)})' if self.functions else ''
+        return f'{len(self.functions)} recursive pure functions memoized{names}'
+
+
+def reaches(start, target, calls):
+    # start 直接或间接调用 target
+    seen = set()
+    pending = list(calls[start])
+    while pending:
+        callee = pending.pop()
+        if callee == target:
+            return True
+        if callee in calls and callee not in seen:
+            seen.add(callee)
+            pending.extend(calls[callee])
+    return False
+
+
+def tail_only(body, cycle):
+    """
+    body 里对 cycle 中函数的调用是不是都在 try 外面, 并且直接是 return 的值 (可以带括号), 也就是尾调用。
+    这样的函数每次调用最多沿一条路径递归下去, 同样的实参碰不上第二次, 记忆化只是白占内存,
+    还会挡住 vm 引擎的 TAIL_CALL。
+    """
+    def walk(node, in_try):
+        if not isinstance(node, Tree):
+            return True
+        if node.data == 'try_catch_stmt':
+            in_try = True
+        if node.data == 'return_stmt' and node.children[0] is not None and not in_try:
+            value = node.children[0]
+            while isinstance(value, Tree) and value.data == 'grouped_expr':
+                value = value.children[0]
+            if isinstance(value, Tree) and value.data == 'func_call_stmt':
+                return all(walk(child, in_try) for child in value.children[1:])
+        if node.data == 'func_call_stmt' and str(node.children[0]) in cycle:
+            return False
+        return all(walk(child, in_try) for child in node.children)
+    return walk(body, False)
+
+
+def memoize_functions(tree, exclude=frozenset(), capacity=None):
+    """
+    直接或间接调用自己的纯函数 (cp_effects.pure_functions: 只读写参数、局部变量和全局常量,
+    不输入输出, 不碰数组和类, 调用的也都是纯函数) 结果只取决于实参, 同样的实参不用再算一遍。
+    这样的函数的每个定义换成 memo_def_stmt(原定义), 名字在 exclude 里的除外 (命令行 --no-memo)。
+
+    引擎执行 memo_def_stmt 时照常定义函数, 再给它配一个 cp_runtime.Memo (容量是结点上的 capacity,
+    None 时为 MEMO_CAPACITY, LRU 淘汰): 调用时先按实参查缓存, 有就直接返回; 没有就照常执行,
+    正常返回后记下结果。出错时什么也不记, 下次照常执行再报一样的错。一组参数类型只对应一个定义,
+    所以缓存不用区分重载。
+
+    递归调用 (调到和它互相递归的函数, 包括自己) 全是 try 外面的尾调用的函数 (tail_only) 不做记忆化:
+    缓存不会命中, vm 引擎要靠 TAIL_CALL 复用帧才能跑很深的尾递归。
+    """
+    stats = MemoStats()
+    if not isinstance(tree, Tree):
+        return stats
+    calls = pure_functions(tree)
+    done = {id(node.children[0]) for node in tree.find_data('memo_def_stmt')}
+    for node in list(tree.find_data('func_def_stmt')):
+        name = str(node.children[0])
+        if id(node) in done or name not in calls or name in exclude or not Inliner.recursive(name, calls):
+            continue
+        cycle = {name} | {callee for callee in calls if reaches(callee, name, calls)}
+        if all(tail_only(other, cycle) for other in tree.find_data('func_def_stmt')
+               if str(other.children[0]) == name):
+            continue
+        replace(node, 'memo_def_stmt', [copy.copy(node)])
+        node.capacity = capacity
+        if name not in stats.functions:
+            stats.functions.append(name)
+    return stats
+
+
+# 可以提到循环外的表达式结点: 求值不会写任何东西, 结果只取决于读到的变量、数组元素和字段
+PURE = set(OPERATORS) | set(UNARY) | {'const', 'var', 'class_var', 'this_var', 'super_var',
+                                      'array_access', 'builtin_call', 'array_name', 'invariant'}
+
+LOOPS = ('while_stmt', 'do_while_stmt', 'for_stmt', 'vector_for_stmt')
+
+# 单独一个变量或常量不值得缓存
+TRIVIAL = ('var', 'const', 'array_name')
+
+# invariant 结点还没有算过值
+UNCOMPUTED = type('Uncomputed', (), {'__repr__': lambda self: 'UNCOMPUTED'})()
+
+
+class HoistStats:
+    def __init__(self):
+        self.loops = 0
+        self.hoisted = 0
+        self.nodes = 0
+
+    def __repr__(self):
+        return f'{self.hoisted} expressions ({self.nodes} nodes) hoisted out of {self.loops} loops'
+
+
+class Hoister:
+    """
+    循环不变量外提。循环里 (for 的初始化语句除外) 不依赖循环中会被写到的东西的表达式,
+    每次进入循环只算一次:
+    - 循环写到的东西由 cp_effects 分析, 包括调用的函数/方法间接写到的全局变量、数组和实例;
+    - 表达式只由 PURE 里的结点组成: 变量、常量、运算、字段、数组元素、只读数组的内置函数;
+      用到的变量、数组、实例名都不在循环写到的范围里; this/super 的字段在一次调用里不会变;
+    - 取最大的这样的子表达式, 单独的变量和常量不动; 外层循环里也不变的, 提到最外层,
+      内层循环可以再把包含它的更大的表达式提出来。
+
+    表达式结点换成 invariant(原表达式), 循环换成 hoist_stmt(原循环), hoist_stmt.invariants 是它的
+    invariant 结点。引擎给每个 invariant 在当前帧里分一个隐藏的槽位, 进入 hoist_stmt 时置为 UNCOMPUTED,
+    第一次执行到 invariant 时照常求值并记下, 之后直接取值。求值还在原来的位置进行, 所以循环一次都不执行、
+    表达式在没有执行到的分支里、或者求值出错 (除以 0、未定义的名字) 时, 行为都和原来一样。
+    """
+
+    def __init__(self, tree):
+        self.program = ProgramEffects(tree)
+        self.stats = HoistStats()
+
+    def run(self, tree):
+        done = {id(node.children[0]) for node in tree.find_data('hoist_stmt')}
+        # 自顶向下: 外层循环先取走在外层也不变的表达式
+        loops = [node for node in tree.iter_subtrees_topdown() if node.data in LOOPS and id(node) not in done]
+        for loop in loops:
+            effects = self.program.effects(loop)
+            parts = loop.children[1:] if loop.data in ('for_stmt', 'vector_for_stmt') else loop.children
+            found = []
+            for part in parts:
+                self.collect(part, effects, found)
+            if not found:
+                continue
+            for node in found:
+                self.stats.nodes += size(node)
+                replace(node, 'invariant', [copy.copy(node)])
+            inner = copy.copy(loop)
+            replace(loop, 'hoist_stmt', [inner])
+            loop.__dict__.pop('plan', None)
+            loop.invariants = found
+            self.stats.loops += 1
+            self.stats.hoisted += len(found)
+        return self.stats
+
+    def collect(self, node, effects, found):
+        if not isinstance(node, Tree) or node.data in ('func_def_stmt', 'class_func_list', 'invariant'):
+            return
+        if node.data not in TRIVIAL and self.invariant(node, effects):
+            found.append(node)
+            return
+        for child in node.children:
+            self.collect(child, effects, found)
+
+    def invariant(self, node, effects):
+        if not isinstance(node, Tree):
+            return True
+        data = node.data
+        if data not in PURE:
+            return False
+        if data == 'invariant':
+            # 外层循环提出来的, 在这一层也不变
+            return True
+        if data == 'var':
+            return str(node.children[0]) not in effects.variables
+        if data in ('array_access', 'array_name'):
+            if str(node.children[0]) in effects.arrays:
+                return False
+        elif data == 'class_var':
+            return str(node.children[0]) not in effects.objects
+        elif data == 'builtin_call':
+            if str(node.children[0]) in WRITERS:
+                return False
+            return all(self.invariant(arg, effects) for arg in node.children[1].children)
+        return all(self.invariant(child, effects) for child in node.children)
+
+
+def hoist_invariants(tree):
+    if not isinstance(tree, Tree):
+        return HoistStats()
+    return Hoister(tree).run(tree)
+
+
+PASSES = [
+    ('fold', fold_constants),
+    ('dead_code', eliminate_dead_code),
+    ('inline', inline_functions),
+    ('memo', memoize_functions),
+    ('hoist', hoist_invariants),
+]
+
+# 关掉的 pass 名字, verify() 用它得到不做优化时的结果
+disabled = set()
+
+
+def optimize(tree, no_memo=frozenset(), memo_capacity=None):
+    """依次执行各个 pass, 返回 {pass 名: 统计}; no_memo 是不做记忆化的函数名, memo_capacity 是结果缓存的容量"""
+    options = {'memo': {'exclude': no_memo, 'capacity': memo_capacity}}
+    return {name: run(tree, **options.get(name, {})) for name, run in PASSES if name not in disabled}
+
+
+def execute(tree, engine, stdin, no_memo, memo_capacity, stack_budget):
+    # 返回输出, 出错时在后面加上错误信息; 各个 pass 会改动语法树, 每次执行用一份副本
+    from cp_engine import make_interpreter
+    interpreter = make_interpreter(engine, io.StringIO(stdin), no_memo=no_memo, memo_capacity=memo_capacity,
+                                   stack_budget=stack_budget)
+    try:
+        interpreter.execute(copy.deepcopy(tree))
+    except Exception as e:
+        return interpreter.printResult + f'<{type(e).__name__}: {e}>'
+    return interpreter.printResult
+
+
+def verify(source, engine='tree', stdin='', no_memo=frozenset(), memo_capacity=None, stack_budget=None):
+    """
+    程序分别在关掉和打开所有 pass 时执行一遍, 比较输出 (包括出错信息),
+    返回 (是否一致, 不优化的输出, 优化后的输出)。
+    """
+    from cp_parser import calc_parser
+    tree = calc_parser.parse(source)
+    saved = set(disabled)
+    disabled.update(name for name, _ in PASSES)
+    try:
+        expected = execute(tree, engine, stdin, no_memo, memo_capacity, stack_budget)
+    finally:
+        disabled.clear()
+        disabled.update(saved)
+    actual = execute(tree, engine, stdin, no_memo, memo_capacity, stack_budget)
+    return expected == actual, expected, actual
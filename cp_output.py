@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+程序输出的去处 (sink)。所有引擎的 print 都只调用 out.write(text):
+
+    MemorySink()              攒在内存里, getvalue() 取出全部输出 (引擎默认用它, printResult 就是它)
+    StreamSink(stream)        写到文件对象, 默认 sys.stdout
+    FileSink(path)            写到文件, close() 时关闭
+    CallbackSink(callback)    每攒够一块就调用 callback(text), 给 GUI 用
+
+除 MemorySink 外, 写入的文本先攒在 list 里, 攒够 chunk_size 个字符才整块写出去,
+flush() 立即写出已攒的部分 (对文件对象还会调用它的 flush)。
+引擎从终端读输入之前会 flush, 保证提示先显示出来; 执行结束后由调用方 flush 或 close。
+"""
+
+import sys
+
+
+CHUNK_SIZE = 8192
+
+
+class OutputSink:
+    def __init__(self, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.parts = []
+        self.pending = 0
+
+    def write(self, text):
+        self.parts.append(text)
+        self.pending += len(text)
+        if self.pending >= self.chunk_size:
+            self.drain()
+
+    def drain(self):
+        # 把攒下的文本整块交给 emit
+        if self.parts:
+            text = ''.join(self.parts)
+            self.parts.clear()
+            self.pending = 0
+            self.emit(text)
+
+    def flush(self):
+        self.drain()
+
+    def emit(self, text):
+        raise NotImplementedError
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MemorySink(OutputSink):
+    def __init__(self):
+        super().__init__()
+        # 不分块, write 就是 list.append
+        self.write = self.parts.append
+
+    def drain(self):
+        pass
+
+    def getvalue(self):
+        text = ''.join(self.parts)
+        self.parts[:] = [text]
+        return text
+
+
+class StreamSink(OutputSink):
+    def __init__(self, stream=None, chunk_size=CHUNK_SIZE):
+        super().__init__(chunk_size)
+        self.stream = sys.stdout if stream is None else stream
+
+    def emit(self, text):
+        self.stream.write(text)
+
+    def flush(self):
+        self.drain()
+        if hasattr(self.stream, 'flush'):
+            self.stream.flush()
+
+
+class FileSink(StreamSink):
+    def __init__(self, path, encoding='utf-8', chunk_size=CHUNK_SIZE):
+        super().__init__(open(path, 'w', encoding=encoding), chunk_size)
+
+    def close(self):
+        if not self.stream.closed:
+            self.flush()
+            self.stream.close()
+
+
+class CallbackSink(OutputSink):
+    def __init__(self, callback, chunk_size=CHUNK_SIZE):
+        super().__init__(chunk_size)
+        self.callback = callback
+
+    def emit(self, text):
+        self.callback(text)
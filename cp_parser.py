@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+cp 语法与解析器
+
+calc_grammar 的 LALR 分析表会序列化到磁盘缓存中, 缓存文件名由 calc_grammar
+与 lark 版本的哈希决定; 语法不变时直接加载, 语法或 lark 版本变化时才重新构建。
+
+缓存目录默认为 ~/.cache/cp, 可以用环境变量 CP_CACHE_DIR 修改,
+CP_CACHE_DIR 为空串时关闭缓存。
+"""
+
+import hashlib
+import os
+
+import lark
+from lark import Lark
+
+calc_grammar = r"""
+    ?start: (stmt | NEWLINE)*
+
+    ?stmt: simple_stmt | compound_stmt | comment_stmt
+
+    ?comment_stmt: COMMENT                    -> comment_stmt
+    
+    ?simple_stmt: (expr | print | input | assign | self_calc | reassign | aug_op | break_stmt | continue_stmt | return_stmt | array_def | array_assign)
+    
+    print: "print" "(" (print_factor)*  [sep_factor] [end_factor]")" -> print_stmt
+    print_factor: [","] + expr -> print_factor_stmt
+    sep_factor: [","] + "sep" "=" expr -> print_sep_stmt
+    end_factor: [","] + "end" "=" expr -> print_end_stmt
+
+    input: "cin" (input_factor)+ -> input_stmt
+    input_factor: ">>" NAME -> input_factor_stmt
+                | ">>" NAME _index+ -> input_array_stmt
+                | ">>" NAME "[" "]" -> input_array_fill
+
+    assign: type var_factor ("," var_factor)*  -> assign_stmt
+    var_factor: (unassign_var | assign_var)
+    unassign_var: NAME -> unassign_stmt
+    assign_var: NAME "=" expr -> assign_stmt2
+
+    array_def: type NAME _index+ -> array_def
+    array_access: NAME _index+ -> array_access
+    array_assign: NAME _index+ "=" expr -> array_assign
+    _index: "[" expr "]"
+    
+    self_calc: NAME "++"        -> self_add
+          | NAME "--"        -> self_sub
+          | "++" NAME        -> self_add
+          | "--" NAME        -> self_sub
+        
+    reassign: NAME "=" expr       -> reassign_stmt
+    
+    aug_op: NAME "+=" expr -> aug_add
+          | NAME "-=" expr -> aug_sub
+          | NAME "*=" expr -> aug_mul
+          | NAME "/=" expr -> aug_div
+          | NAME "//=" expr -> aug_div_int
+          | NAME "**=" expr -> aug_pow
+          | NAME "%=" expr  -> aug_mod
+          | NAME ">>=" expr -> aug_right_shift
+          | NAME "<<=" expr -> aug_left_shift
+          | NAME "&=" expr -> aug_and
+          | NAME "|=" expr -> aug_or
+          | NAME "^=" expr -> aug_xor
+
+
+    break_stmt: "break" -> break_stmt
+
+    continue_stmt: "continue" -> continue_stmt
+
+    return_stmt: "return" [expr] -> return_stmt
+
+    ?compound_stmt: (if_stmt | for_stmt | while_stmt | do_while_stmt | func_def | class_def | class_instance | class_extends | try_catch_stmt | class_instance_trans)
+    
+    if_stmt : ifstmt (elifstmt)* (elsestmt)? -> if_else_stmt
+    ifstmt: "if" "(" condition ")" block     -> if_stmt
+    elifstmt: "elif" "(" condition ")" block -> if_stmt
+    elsestmt: "else" block              -> else_stmt
+    condition: expr                           -> condition_func
+            | expr + (("&&" | "and") + expr)+ -> condition_and_func
+            | expr + (("||" | "or") + expr)+ -> condition_or_func
+    
+            
+    while_stmt : "while" "(" condition ")" block -> while_stmt
+    do_while_stmt : "do" block "while" "(" condition ")" -> do_while_stmt
+    for_stmt: "for" "(" [simple_stmt] ";" [condition] ";" [simple_stmt] ")" block -> for_stmt
+    
+    func_def: "func" NAME "(" [arg_list] ")" block -> func_def_stmt
+    func_call: NAME "(" [arg_values] ")" -> func_call_stmt
+
+    class_def: "class" NAME "{" [class_arg_list] [class_func_list] "}" -> class_def
+    class_extends: "class" NAME "extends" NAME "{" [class_arg_list] [class_func_list] "}" -> class_extends
+    class_instance: NAME NAME "=" "new" NAME "(" ")"-> class_instance
+    class_instance_trans: NAME "=" "new" NAME "(" ")" -> class_instance_trans
+    class_var: NAME "." NAME -> class_var
+    class_func: NAME "." NAME "(" [arg_values] ")" -> class_func
+    class_arg_list: (arg ["=" expr])+ -> class_arg_list
+    class_func_list : ("func" NAME "(" [arg_list] ")" block)+ -> class_func_list
+    this_var: "this" "." NAME -> this_var
+    this_func: "this" "." NAME "(" [arg_values] ")" -> this_func
+    super_var: "super" "." NAME -> super_var
+    super_func: "super" "." NAME "(" [arg_values] ")" -> super_func
+
+    try_catch_stmt: "try" block "catch" "(" NAME ")" block -> try_catch_stmt
+
+    block: "{" [stmt+] "}"                      -> block_stmt
+    arg_list: arg ("," arg)* -> arg_list
+    arg: type NAME
+    arg_values: expr ("," expr)* -> arg_values
+
+    COMMENT: "!!" /[^\n]*/ NEWLINE
+    
+    NEWLINE: "\n"
+
+    ?type: "int"              -> int_type
+         | "float"            -> float_type
+         | "string"           -> string_type
+         | "bool"             -> bool_type
+
+    ?expr: sum
+         | comparison
+
+    ?comparison: expr "<" expr  -> less_than
+         | expr ">" expr  -> greater_than
+         | expr "==" expr -> equal
+         | expr "!=" expr -> not_equal
+         | expr "<=" expr -> less_than_equal
+         | expr ">=" expr -> greater_than_equal
+    
+    ?sum: compute_op
+         | sum "&" compute_op  -> and_op
+         | expr "|" compute_op  -> or_op
+         | expr "^" compute_op  -> xor_op
+         | "~" compute_op -> neg_op
+         | "!" compute_op -> not_op
+         | expr "<<" compute_op  -> left_shift_op
+         | expr ">>" compute_op  -> right_shift_op
+    ?compute_op: product
+        | compute_op "+" product    -> add
+        | compute_op "-" product    -> sub
+
+    ?product: atom
+        | product "**" atom   -> pow
+        | product "*" atom    -> mul
+        | product "/" atom    -> div
+        | product "//" atom   -> div_int
+        | product "%" atom    -> mod
+
+    ?atom: NUMBER              -> number
+         | STRING              -> string
+         | NAME                -> var
+         | "True"              -> true_bool
+         | "False"             -> false_bool
+         | func_call
+         | class_var
+         | class_func
+         | this_var
+         | this_func
+         | super_var
+         | super_func
+         | array_access
+         | "(" expr ")"        -> grouped_expr
+
+    %import common.CNAME -> NAME
+    %import common.NUMBER
+    %import common.WS
+    %import common.ESCAPED_STRING -> STRING
+
+    %ignore WS
+    %ignore COMMENT
+    %ignore NEWLINE
+"""
+
+
+def default_cache_dir():
+    return os.environ.get('CP_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'cp'))
+
+
+def cache_path(cache_dir=None):
+    if cache_dir is None:
+        cache_dir = default_cache_dir()
+    if not cache_dir:
+        return None
+    key = hashlib.sha256((calc_grammar + lark.__version__).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, f'calc_grammar_{key}.lark')
+
+
+def load_parser(cache_dir=None):
+    path = cache_path(cache_dir)
+    if path is None:
+        return Lark(calc_grammar, parser='lalr', lexer='contextual')
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    except OSError:
+        # 缓存目录不可写时退化为每次重新构建
+        return Lark(calc_grammar, parser='lalr', lexer='contextual')
+    if os.path.exists(path):
+        # lark 会校验缓存文件头中的哈希, 不匹配时重新构建并覆盖
+        return Lark(calc_grammar, parser='lalr', lexer='contextual', cache=path)
+    # 先写到临时文件再改名, 多个进程同时冷启动时不会读到写了一半的缓存
+    tmp = f'{path}.{os.getpid()}.tmp'
+    parser = Lark(calc_grammar, parser='lalr', lexer='contextual', cache=tmp)
+    try:
+        os.replace(tmp, path)
+    except OSError:
+        pass
+    return parser
+
+
+calc_parser = load_parser()
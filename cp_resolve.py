@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+CalculateTree 执行前的名字解析
+
+每个用到变量名的结点 (var, reassign_stmt, self_add/self_sub, aug_*, input_factor_stmt)
+和每个声明结点 (unassign_stmt, assign_stmt2) 都会得到 address = (depth, slot):
+
+    depth == LOCAL   当前函数 (或主程序) 帧里的第 slot 个位置
+    depth == GLOBAL  全局变量表里的第 slot 个位置
+
+作用域规则与 cp_vm 相同: 函数只看得到自己的局部变量和全局变量, 每个块是一层新作用域,
+函数体与参数共用一层, catch 变量与 catch 块共用一层, for 的初始化语句外面再包一层;
+顶层声明的变量是全局变量。槽位不复用, 所以帧的大小在解析时就确定了:
+函数体 (以及类方法体) 的 block 结点上记录 nlocals, 主程序的大小由 resolve() 返回。
+
+函数/方法调用结点 (func_call_stmt, class_func, this_func, super_func) 和字段结点
+(class_var, this_var, super_var) 的 cache 置为 None, CalculateTree 在上面记录这个位置
+上次选中的重载或字段槽位。cin 的变量目标 (input_factor_stmt) 的 target 是它的 cp_input.InputTarget。
+
+循环不变量 (cp_optimize 的 invariant 结点) 在帧里也占一个槽位, 记在 slot 上;
+内联调用 (inline_call) 的参数各占一个槽位, 记在 slots 上, 参数类型记在 types 上。
+
+同一作用域里重复声明的结点 address 为 None, 执行到时再报错 (可以被 try/catch 捕获)。
+从任何作用域都找不到、顶层也没有声明过的名字在执行前直接报错。
+"""
+
+from lark import Tree
+from lark.visitors import Interpreter
+
+from cp_input import InputTarget
+from cp_runtime import AUG_OPS, signature
+
+
+LOCAL = 0
+GLOBAL = 1
+
+
+class Resolver(Interpreter):
+    def __init__(self):
+        self.globals = {}
+        self.scopes = []
+        self.nlocals = 0
+
+    def resolve(self, tree):
+        # 先收集所有顶层声明, 函数体里可以用到在函数定义之后才声明的全局变量
+        stmts = tree.children if isinstance(tree, Tree) and tree.data == 'start' else [tree]
+        for stmt in stmts:
+            if isinstance(stmt, Tree) and stmt.data == 'assign_stmt':
+                for var_factor in stmt.children[1:]:
+                    name = str(var_factor.children[0].children[0])
+                    self.globals.setdefault(name, len(self.globals))
+        if isinstance(tree, Tree):
+            self.visit(tree)
+        return len(self.globals), self.nlocals
+
+    def __default__(self, tree):
+        if tree.data in AUG_OPS:
+            self.use(tree, "Undefined variable '{}'")
+        self.visit_children(tree)
+
+    # names
+
+    def lookup(self, name):
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return (LOCAL, scope[name])
+        if name in self.globals:
+            return (GLOBAL, self.globals[name])
+        return None
+
+    def declare(self, name):
+        slot = self.nlocals
+        self.nlocals += 1
+        self.scopes[-1][name] = slot
+        return slot
+
+    def use(self, tree, message):
+        name = str(tree.children[0])
+        tree.address = self.lookup(name)
+        if tree.address is None:
+            raise ValueError(message.format(name))
+
+    def var(self, tree):
+        self.use(tree, "Undefined variable '{}'")
+
+    def reassign_stmt(self, tree):
+        self.use(tree, "Undefined variable '{}'")
+        self.visit_children(tree)
+
+    def self_add(self, tree):
+        self.use(tree, "Undefined variable '{}'")
+
+    def self_sub(self, tree):
+        self.use(tree, "Undefined variable '{}'")
+
+    def input_factor_stmt(self, tree):
+        self.use(tree, "Variable '{}' not found")
+        tree.target = InputTarget()
+
+    def assign_stmt(self, tree):
+        for var_factor in tree.children[1:]:
+            node = var_factor.children[0]
+            name = str(node.children[0])
+            if node.data == 'assign_stmt2':
+                self.visit(node.children[1])
+            if not self.scopes:
+                node.address = (GLOBAL, self.globals[name])
+            elif name in self.scopes[-1]:
+                node.address = None
+            else:
+                node.address = (LOCAL, self.declare(name))
+
+    def site(self, tree):
+        tree.cache = None
+        self.visit_children(tree)
+
+    func_call_stmt = class_func = this_func = super_func = site
+    class_var = this_var = super_var = site
+
+    # scopes
+
+    def block_stmt(self, tree):
+        self.scopes.append({})
+        self.visit_children(tree)
+        self.scopes.pop()
+
+    def for_stmt(self, tree):
+        self.scopes.append({})
+        self.visit_children(tree)
+        self.scopes.pop()
+
+    vector_for_stmt = for_stmt
+
+    def hoist_stmt(self, tree):
+        # 循环不变量的值放在当前帧的隐藏槽位里
+        for node in tree.invariants:
+            node.slot = self.nlocals
+            self.nlocals += 1
+        self.visit_children(tree)
+
+    def try_catch_stmt(self, tree):
+        self.visit(tree.children[0])
+        self.scopes.append({})
+        tree.slot = self.declare(str(tree.children[1]))
+        self.visit_children(tree.children[2])
+        self.scopes.pop()
+
+    def function(self, arg_list, block):
+        saved = self.scopes, self.nlocals
+        self.scopes, self.nlocals = [{}], 0
+        if arg_list is not None:
+            for arg in arg_list.children:
+                self.declare(str(arg.children[1]))
+        self.visit_children(block)
+        block.nlocals = self.nlocals
+        self.scopes, self.nlocals = saved
+
+    def inline_call(self, tree):
+        # 内联的函数体只看得到参数和全局变量, 参数放在当前帧的隐藏槽位里
+        if tree.children[1] is not None:
+            self.visit(tree.children[1])
+        params, tree.types = signature(tree.children[2])
+        tree.slots = list(range(self.nlocals, self.nlocals + len(params)))
+        self.nlocals += len(params)
+        saved, self.scopes = self.scopes, [dict(zip(params, tree.slots))]
+        self.visit(tree.children[3])
+        self.scopes = saved
+
+    def func_def_stmt(self, tree):
+        self.function(tree.children[1], tree.children[2])
+
+    def class_func_list(self, tree):
+        for i in range(0, len(tree.children), 3):
+            self.function(tree.children[i + 1], tree.children[i + 2])
+
+
+def resolve(tree):
+    """给语法树标注变量地址, 返回 (全局变量个数, 主程序帧大小)"""
+    return Resolver().resolve(tree)
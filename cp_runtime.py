@@ -0,0 +1,507 @@
+# -*- coding: utf-8 -*-
+"""
+编译型引擎 (cp_vm, cp_closure) 共用的运行时状态: 全局变量、函数表、类与实例、数组、输入输出。
+
+类模型 (ClassTable) 与 CalculateTree 共用: 类定义时算好字段槽位和方法表,
+实例是按槽位存放的字段 list; 方法表的键是 (方法名, 参数类型 tuple)。
+记忆化函数 (cp_optimize 的 memo pass) 的结果缓存 Memo 也与 CalculateTree 共用。
+"""
+
+import array
+import operator
+from collections import OrderedDict
+
+from cp_input import TokenReader, converter
+from cp_output import MemorySink
+
+
+OPERATORS = {
+    'add': operator.add,
+    'sub': operator.sub,
+    'mul': operator.mul,
+    'div': operator.truediv,
+    'div_int': operator.floordiv,
+    'mod': operator.mod,
+    'pow': operator.pow,
+    'and_op': operator.and_,
+    'or_op': operator.or_,
+    'xor_op': operator.xor,
+    'left_shift_op': operator.lshift,
+    'right_shift_op': operator.rshift,
+    'less_than': operator.lt,
+    'less_than_equal': operator.le,
+    'greater_than': operator.gt,
+    'greater_than_equal': operator.ge,
+    'equal': operator.eq,
+    'not_equal': operator.ne,
+}
+
+AUG_OPS = {
+    'aug_add': 'add',
+    'aug_sub': 'sub',
+    'aug_mul': 'mul',
+    'aug_div': 'div',
+    'aug_div_int': 'div_int',
+    'aug_pow': 'pow',
+    'aug_mod': 'mod',
+    'aug_right_shift': 'right_shift_op',
+    'aug_left_shift': 'left_shift_op',
+    'aug_and': 'and_op',
+    'aug_or': 'or_op',
+    'aug_xor': 'xor_op',
+}
+
+TYPES = {
+    'int_type': int,
+    'float_type': float,
+    'string_type': str,
+    'bool_type': bool,
+}
+
+CATCH_PREFIX = "try-catch warning : "
+
+
+def signature(arg_list):
+    """参数表结点 -> (参数名 list, 参数类型 tuple), 没有参数时 arg_list 是 None"""
+    if arg_list is None:
+        return [], ()
+    return ([str(arg.children[1]) for arg in arg_list.children],
+            tuple(TYPES[arg.children[0].data] for arg in arg_list.children))
+
+
+# 记忆化的函数最多缓存多少组实参的结果, 超过时淘汰最久没用到的
+MEMO_CAPACITY = 10000
+
+# Memo.lookup 没有找到
+MISSING = type('Missing', (), {'__repr__': lambda self: 'MISSING'})()
+
+
+class Memo:
+    """
+    一个纯函数 (一组参数类型) 的结果缓存, 键是实参 tuple, 容量满了按 LRU 淘汰。
+    float 实参按 float.hex() 区分: 0.0 和 -0.0 相等, 但结果可能不同。
+    """
+    __slots__ = ('name', 'types', 'capacity', 'entries', 'floats', 'hits', 'misses', 'evictions')
+
+    def __init__(self, name, types, capacity=None):
+        self.name = name
+        self.types = types
+        self.capacity = MEMO_CAPACITY if capacity is None else capacity
+        self.entries = OrderedDict()
+        self.floats = float in types
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, args):
+        if self.floats:
+            return tuple([arg.hex() if type(arg) is float else arg for arg in args])
+        return tuple(args)
+
+    def lookup(self, key):
+        entries = self.entries
+        value = entries.get(key, MISSING)
+        if value is MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+            entries.move_to_end(key)
+        return value
+
+    def store(self, key, value):
+        entries = self.entries
+        entries[key] = value
+        if len(entries) > self.capacity:
+            entries.popitem(last=False)
+            self.evictions += 1
+        return value
+
+    def __repr__(self):
+        types = ', '.join(t.__name__ for t in self.types)
+        return (f'{self.name}({types}): {self.hits} hits, {self.misses} misses, '
+                f'{self.evictions} evicted, {len(self.entries)} cached')
+
+
+class ClassLayout:
+    """
+    一个类的布局, 定义类时算好一次: field_index 是字段名 -> 槽位, fields 是各槽位的初值,
+    methods 是方法表 (继承来的方法也在里面), base 是父类对象。
+    """
+    __slots__ = ('name', 'base', 'layout', 'field_index', 'fields', 'methods')
+
+    def __init__(self, name, base=None):
+        self.name = name
+        self.base = base
+        self.layout = self
+        if base is None:
+            self.field_index = {}
+            self.fields = []
+            self.methods = {}
+        else:
+            self.field_index = base.layout.field_index.copy()
+            self.fields = base.fields.copy()
+            self.methods = base.methods.copy()
+
+    def add_field(self, name, value):
+        index = self.field_index.get(name)
+        if index is None:
+            self.field_index[name] = len(self.fields)
+            self.fields.append(value)
+        else:
+            self.fields[index] = value
+
+
+class Instance:
+    """类实例: 字段按 layout 的槽位存成 list, methods 直接指向 new 出它的那个类的方法表"""
+    __slots__ = ('name', 'layout', 'fields', 'methods')
+
+    def __init__(self, name, layout, fields, methods):
+        self.name = name
+        self.layout = layout
+        self.fields = fields
+        self.methods = methods
+
+
+class ClassTable(dict):
+    """
+    名字 -> ClassLayout 或 Instance。类和实例共用一个名字空间 (与 CalculateTree 原来的规则相同),
+    两种对象都有 name, layout, fields, methods, 取字段和调方法时不用区分。
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.checked = set()
+
+    def define(self, name, base, fields, methods, values):
+        if base is None:
+            if name in self:
+                raise NameError(f"Class '{name}' already defined")
+            layout = ClassLayout(name)
+        else:
+            if base not in self:
+                raise NameError(f"Class '{base}' not defined")
+            if name in self:
+                raise NameError(f"Class '{name}' already defined")
+            layout = ClassLayout(name, self[base])
+        for field, value in zip(fields, values):
+            layout.add_field(field, value)
+        new_methods = {}
+        for key, function in methods:
+            if key in new_methods:
+                raise ValueError(f"Function '{key[0]}' already defined")
+            new_methods[key] = function
+        layout.methods.update(new_methods)
+        self[name] = layout
+        return layout
+
+    def new_instance(self, class_type, name, class_type2):
+        # A a = new B(): 字段按 A, 方法按 B; class_type 为 None 时是 a = new B()
+        if class_type is None:
+            if name not in self:
+                raise NameError(f"Class instance '{name}' not defined")
+            source = self[name]
+            class_type = source.layout.name
+            if class_type not in self:
+                raise NameError(f"Class '{class_type}' not defined")
+            if class_type2 not in self:
+                raise NameError(f"Class '{class_type2}' not defined")
+        else:
+            if class_type not in self:
+                raise NameError(f"Class '{class_type}' not defined")
+            if class_type2 not in self:
+                raise NameError(f"Class '{class_type2}' not defined")
+            if name in self:
+                raise NameError(f"Class instance '{name}' already defined")
+            source = self[class_type]
+        target = self[class_type2]
+        self.check_assignable(source, target)
+        instance = Instance(name, source.layout, source.fields.copy(), target.methods)
+        self[name] = instance
+        return instance
+
+    def check_assignable(self, source, target):
+        # 布局和方法表都不会再变, 同一对组合只需要检查一次
+        key = (source.layout, id(source.methods), target.layout, id(target.methods))
+        if key in self.checked:
+            return
+        layout, layout2 = source.layout, target.layout
+        if layout is not layout2:
+            if layout2.base is None or layout2.base.name != layout.name:
+                raise NameError(f"Class '{layout.name}' is not a subclass of '{layout2.name}'")
+        for func in target.methods:
+            if func not in source.methods:
+                raise NameError(f"Class '{layout.name}' has no function '{func}'")
+        for var in layout2.field_index:
+            if var not in layout.field_index:
+                raise NameError(f"Class '{layout.name}' has no variable '{var}'")
+        self.checked.add(key)
+
+    def super_of(self, obj):
+        base = obj.layout.base
+        if base is None:
+            raise NameError("No super class defined")
+        return base
+
+    @staticmethod
+    def field(obj, var):
+        index = obj.layout.field_index.get(var)
+        if index is None:
+            raise NameError(f"Class instance '{obj.name}' has no attribute '{var}'")
+        return obj.fields[index]
+
+
+# 数组存储: int/float/bool 数组是连续的 array.array, 元素类型由存储本身检查;
+# string 数组仍是 list。int 数组先用 4 字节, 存不下时依次换成 8 字节和 IntList, 保持 Python int 的语义。
+TYPECODES = {int: 'i', float: 'd'}
+WIDER = {'i': 'q', 'q': None}
+
+
+class BoolArray(array.array):
+    """bool 数组每个元素一个字节, 只能存 True/False, 取出来也是 True/False"""
+
+    def __getitem__(self, index):
+        return array.array.__getitem__(self, index) != 0
+
+    def __setitem__(self, index, value):
+        if type(value) is not bool:
+            raise TypeError('bool array element must be bool')
+        array.array.__setitem__(self, index, value)
+
+
+class IntList(list):
+    """8 字节也存不下时 int 数组退回 list, 仍然只接受 int"""
+
+    def __setitem__(self, index, value):
+        if type(value) is not int and type(value) is not bool:
+            raise TypeError('int array element must be int')
+        list.__setitem__(self, index, int(value))
+
+
+def to_bool(token):
+    return int(token) != 0
+
+
+ELEMENT_CONVERTERS = {'i': int, 'q': int, 'd': float, 'b': to_bool}
+
+
+def new_array(elem_type, size):
+    size = int(size)
+    if size <= 0:
+        raise ValueError("Array size must be positive")
+    if elem_type is str:
+        return [''] * size
+    if elem_type is bool:
+        return BoolArray('b', bytes(size))
+    code = TYPECODES[elem_type]
+    return array.array(code, bytes(array.array(code).itemsize * size))
+
+
+def array_shape(dims):
+    """各维长度 -> (((长度, stride), ...), 元素总数), 按行优先排布"""
+    dims = [int(dim) for dim in dims]
+    if min(dims) <= 0:
+        raise ValueError("Array size must be positive")
+    shape = []
+    stride = 1
+    for dim in reversed(dims):
+        shape.append((dim, stride))
+        stride *= dim
+    return tuple(reversed(shape)), stride
+
+
+def flat_index(shape, name, indexes):
+    """多维下标换算成扁平存储里的位置; 只给一个下标时直接按扁平位置访问, 不经过这里"""
+    if len(indexes) != len(shape):
+        raise IndexError(f"Array '{name}' has {len(shape)} dimensions")
+    offset = 0
+    for index, (dim, stride) in zip(indexes, shape):
+        index = int(index)
+        if index < 0 or index >= dim:
+            raise IndexError(f"Array '{name}' index out of range")
+        offset += index * stride
+    return offset
+
+
+def make_indexer(name, shape):
+    """数组定义时生成换算下标的函数, 维数和 stride 都绑定在闭包里; 二维数组单独展开"""
+    if len(shape) != 2:
+        return lambda *indexes: flat_index(shape, name, indexes)
+    (rows, stride), (cols, _) = shape
+
+    def index2(*indexes):
+        if len(indexes) != 2:
+            return flat_index(shape, name, indexes)
+        i, j = indexes
+        i, j = int(i), int(j)
+        if 0 <= i < rows and 0 <= j < cols:
+            return i * stride + j
+        raise IndexError(f"Array '{name}' index out of range")
+    return index2
+
+
+class Indexers(dict):
+    """数组名 -> make_indexer 生成的函数"""
+
+    def __missing__(self, name):
+        raise NameError(f"Array '{name}' not defined")
+
+
+def widen(storage):
+    code = WIDER.get(storage.typecode, False)
+    if code is False:
+        return None
+    return IntList(storage) if code is None else array.array(code, storage)
+
+
+def store_element(arrays, name, index, value):
+    """直接赋值抛出 TypeError/OverflowError 后调用: 能加宽就加宽后重存, 否则是类型不符"""
+    storage = arrays[name]
+    while type(value) is int and type(storage) is array.array:
+        storage = widen(storage)
+        if storage is None:
+            break
+        arrays[name] = storage
+        try:
+            storage[index] = value
+            return
+        except OverflowError:
+            pass
+    raise TypeError(f"Array '{name}' type mismatch")
+
+
+def element_converter(storage):
+    code = getattr(storage, 'typecode', None)
+    return converter(storage[0]) if code is None else ELEMENT_CONVERTERS[code]
+
+
+def input_element(arrays, reader, name, index):
+    storage = arrays[name]
+    value = element_converter(storage)(reader.next())
+    try:
+        storage[index] = value
+    except (TypeError, OverflowError):
+        store_element(arrays, name, index, value)
+
+
+def input_array(arrays, reader, name):
+    """cin >> a[]: 按数组长度一次读满, 转换函数只选一次"""
+    storage = arrays[name]
+    replace_values(arrays, name, list(map(element_converter(storage), reader.take(len(storage)))))
+
+
+def replace_values(arrays, name, values):
+    """整个数组换成同样长度的 values, 类型规则与逐个元素赋值相同 (包括 int 数组的加宽)"""
+    storage = arrays[name]
+    while True:
+        kind = type(storage)
+        if kind is list:
+            arrays[name] = list(values)
+            return
+        if kind is BoolArray or kind is IntList:
+            allowed = (bool,) if kind is BoolArray else (int, bool)
+            for value in values:
+                if type(value) not in allowed:
+                    raise TypeError(f"Array '{name}' type mismatch")
+            arrays[name] = BoolArray('b', values) if kind is BoolArray else IntList(map(int, values))
+            return
+        try:
+            arrays[name] = array.array(storage.typecode, values)
+            return
+        except OverflowError:
+            storage = widen(storage)
+            if storage is None:
+                raise TypeError(f"Array '{name}' type mismatch")
+        except TypeError:
+            raise TypeError(f"Array '{name}' type mismatch")
+
+
+class Runtime:
+    def __init__(self, stdin=None, out=None, no_memo=frozenset(), memo_capacity=None):
+        self.stdin = stdin
+        self.no_memo = no_memo
+        self.memo_capacity = memo_capacity
+        self.out = MemorySink() if out is None else out
+        self.reader = TokenReader(stdin, self.out.flush)
+        self.globals = {}
+        self.functions = {}
+        self.classes = ClassTable()
+        self.arrays = {}
+        self.indexers = Indexers()
+        self.memos = []
+
+    @property
+    def printResult(self):
+        return self.out.getvalue()
+
+    def read_value(self, target, old):
+        return target.read(self.reader, old)
+
+    def define_function(self, name, types, function):
+        if (name, types) in self.functions:
+            raise ValueError(f"Function '{name}' already defined")
+        self.functions[(name, types)] = function
+
+    def define_memo(self, name, types, function, memoize, capacity=None):
+        """记忆化的函数: memoize(function, memo) 返回带缓存的函数; 定义成功后才登记 memo"""
+        memo = Memo(name, types, capacity)
+        self.define_function(name, types, memoize(function, memo))
+        self.memos.append(memo)
+
+    def function(self, name, args):
+        function = self.functions.get((name, tuple([type(arg) for arg in args])))
+        if function is None:
+            raise NameError(f"Function '{name}' not defined")
+        return function
+
+    # 类模型见 ClassTable; 这里的 this 和类/实例都用名字表示
+
+    def define_class(self, name, base, fields, methods, values):
+        self.classes.define(name, base, fields, methods, values)
+
+    def new_instance(self, class_type, name, class_type2):
+        self.classes.new_instance(class_type, name, class_type2)
+
+    def super_of(self, this):
+        return self.classes.super_of(self.classes[this]).name
+
+    def load_field(self, name, var):
+        obj = self.classes[name]
+        index = obj.layout.field_index.get(var)
+        if index is None:
+            raise NameError(f"Class instance '{name}' has no attribute '{var}'")
+        return obj.fields[index]
+
+    def method(self, class_name, func_name, args):
+        function = self.classes[class_name].methods.get((func_name, tuple([type(arg) for arg in args])))
+        if function is None:
+            raise NameError(f"Class '{class_name}' has no function '{func_name}'")
+        return function
+
+    def array_def(self, name, elem_type, dims):
+        shape, size = array_shape(dims)
+        self.arrays[name] = new_array(elem_type, size)
+        self.indexers[name] = make_indexer(name, shape)
+
+    def array(self, name, index):
+        if name not in self.arrays:
+            raise NameError(f"Array '{name}' not defined")
+        array = self.arrays[name]
+        if index >= len(array):
+            raise IndexError(f"Array '{name}' index out of range")
+        return array
+
+    def input_element(self, name, index):
+        index = int(index)
+        self.array(name, index)
+        input_element(self.arrays, self.reader, name, index)
+
+    def input_array(self, name):
+        self.array(name, 0)
+        input_array(self.arrays, self.reader, name)
+
+    def store_element(self, name, index, value):
+        storage = self.array(name, index)
+        try:
+            storage[index] = value
+        except (TypeError, OverflowError):
+            store_element(self.arrays, name, index, value)
@@ -0,0 +1,680 @@
+# -*- coding: utf-8 -*-
+"""
+热循环的追踪编译 (tracing JIT), 用于 CalculateTree。
+
+quicken 时每个 while/do-while/for 循环 (包括 cp_vectorize 没能整体算完的 for) 换成 traced_loop 结点, 配一个 Loop。
+解释器每执行完一次迭代计一次数, 到 HOT_LOOP 次以后, 之后解释执行的迭代都把每个 if 走的分支记在 taken 里;
+记完一次迭代就按记录生成一个专用的 Python 函数 (trace), 此后在循环头上先执行它:
+
+    进入时检查循环里用到的变量的类型和数组的存储 (guard), 不符时不进入 (MISS);
+    变量放在 Python 的局部变量里, 运算按推断出的类型 (与 cp_types 的规则相同) 直接写成 Python 表达式,
+    结果类型不确定的 (int 的非字面量次幂、string 数组的元素) 取到值以后再检查;
+    走过的分支照常生成, 没走过的分支、不支持的语句 (函数调用、嵌套的循环、try、cin 等) 和检查不通过的位置
+    退出 (side exit): 变量写回帧, 解释器从退出的那条语句开始把这次迭代执行完, 同时记下新走的分支,
+    之后重新生成 trace; 条件为假或 break 时整个循环结束。
+
+表达式都没有副作用, 退出时重新执行整条语句; 运算、下标检查和报错与解释器相同, 出错时变量也先写回,
+所以用不用 trace, 输出、报错和结束时的变量都一样。trace 经常退出 (平均每次进出跑不到 MIN_RUN 次迭代)
+或者重新生成超过 MAX_COMPILES 次时丢掉, 这个循环以后一直解释执行。HOT_LOOP 为 0 时不做追踪编译。
+"""
+
+import array
+import math
+
+from lark import Tree
+
+from cp_optimize import UNCOMPUTED
+from cp_resolve import LOCAL
+from cp_runtime import AUG_OPS, TYPES, BoolArray, IntList, store_element
+from cp_types import DYNAMIC, SYMBOLS, binary_type, first_line, unary_type
+
+
+# 解释执行这么多次迭代以后开始记录
+HOT_LOOP = 40
+# 退出和 MISS 累计这么多次以后, 平均每次跑不到 MIN_RUN 次迭代的 trace 丢掉
+EXIT_LIMIT = 64
+MIN_RUN = 8
+# 一个循环最多生成几次 trace
+MAX_COMPILES = 8
+
+# trace 函数的返回值: 循环结束, 没有进入, 在循环头或迭代末尾 (for 的更新语句、do-while 的条件) 退出,
+# 不小于 FIRST_EXIT 时是在 Loop.points[返回值 - FIRST_EXIT] 这条语句上退出
+LOOP_DONE = 0
+LOOP_BREAK = 1
+MISS = 2
+HEAD_EXIT = 3
+TAIL_EXIT = 4
+FIRST_EXIT = 5
+
+LOOPS = ('while_stmt', 'do_while_stmt', 'for_stmt', 'vector_for_stmt')
+
+# cp_engine.quicken 换过名字的结点 (还有以 quick_ 开头的特化结点), 原来的名字在 generic 上
+QUICKENED = ('adaptive', 'quick', 'incr', 'traced_loop')
+
+VALUE_TYPES = (int, float, str, bool)
+TYPE_NAMES = {int: 'int', float: 'float', str: 'str', bool: 'bool', None: 'None'}
+
+
+class Unsupported(Exception):
+    """trace 里生成不了的结点, 所在的语句改成退出"""
+
+
+class SideExit(Exception):
+    def __init__(self, code):
+        self.code = code
+
+
+def side_exit(code):
+    raise SideExit(code)
+
+
+def index_error(name):
+    raise IndexError(f"Array '{name}' index out of range")
+
+
+def element_type(storage):
+    """数组元素取出来的类型; string 数组是 list, 什么都可能有, 返回 None"""
+    if type(storage) is BoolArray:
+        return bool
+    if type(storage) is IntList:
+        return int
+    if type(storage) is array.array:
+        return float if storage.typecode == 'd' else int
+    return None
+
+
+def quickened(data):
+    return data in QUICKENED or data.startswith('quick_')
+
+
+def kind(node):
+    return node.generic if quickened(node.data) else node.data
+
+
+def prepare_loop(node):
+    """quicken 调用: 追踪编译打开时返回这个循环结点的 Loop"""
+    if HOT_LOOP <= 0:
+        return None
+    return Loop(node, node.data)
+
+
+class Loop:
+    """
+    一个循环结点的追踪状态: 循环的各部分、计数、记录的分支 taken ((id(if 结点), 分支序号) 的集合,
+    没有分支成立时序号是分支个数)、当前的 trace 函数和它的退出位置 points, 以及统计。
+    """
+
+    def __init__(self, node, data):
+        self.node = node
+        self.kind = data
+        children = node.children
+        self.init = self.update = None
+        if data == 'while_stmt':
+            self.condition, self.block = children
+        elif data == 'do_while_stmt':
+            self.block, self.condition = children
+        else:
+            self.init, self.condition, self.update, self.block = children
+        self.test_first = data != 'do_while_stmt'
+        self.line = first_line(node)
+        self.hits = 0
+        self.hot = False
+        self.dead = False
+        self.missed = False
+        self.taken = set()
+        self.function = None
+        self.ntaken = 0
+        self.entry = None
+        self.points = []
+        self.compiles = 0
+        self.iterations = 0
+        self.exits = 0
+        self.misses = 0
+
+    def iterated(self, interp):
+        """解释器执行完一次迭代, 回到循环头"""
+        if self.dead:
+            return
+        if not self.hot:
+            self.hits += 1
+            if self.hits >= HOT_LOOP:
+                self.hot = True
+            return
+        if self.function is None or self.ntaken != len(self.taken) or self.missed and not self.matches(interp):
+            self.compile(interp)
+        self.missed = False
+
+    def compile(self, interp):
+        if self.compiles >= MAX_COMPILES:
+            self.abandon()
+            return
+        self.compiles += 1
+        try:
+            TraceCompiler(self, interp).compile()
+        except Unsupported:
+            self.abandon()
+
+    def abandon(self):
+        # 以后再执行到这个循环直接用原来的实现
+        self.dead = True
+        self.hot = False
+        self.function = None
+        self.node.data = self.node.generic
+
+    def matches(self, interp):
+        # 与 trace 进入时的检查相同: MISS 以后类型真的变了才重新生成
+        slots, values = interp.frame.slots, interp.global_vars
+        for (depth, slot), t in self.entry[0]:
+            if type(slots[slot] if depth == LOCAL else values[slot]) is not t:
+                return False
+        for name, t in self.entry[1]:
+            storage = interp.arrays.get(name)
+            if storage is None or element_type(storage) is not t:
+                return False
+        for (_, slot), t in self.entry[2]:
+            if slots[slot] is not UNCOMPUTED and type(slots[slot]) is not t:
+                return False
+        return True
+
+    def run(self, interp):
+        code = self.function(interp.frame.slots, interp.global_vars, interp.arrays, interp.indexers, interp.out.write)
+        if code >= MISS:
+            if code == MISS:
+                self.misses += 1
+                self.missed = True
+            else:
+                self.exits += 1
+            failures = self.exits + self.misses
+            if failures >= EXIT_LIMIT and self.iterations < MIN_RUN * failures:
+                self.abandon()
+        return code
+
+    def __repr__(self):
+        loop = self.kind.replace('_stmt', '').replace('vector_', '').replace('_', '-')
+        state = ', abandoned' if self.dead else ''
+        return (f'{loop} at line {self.line}: {self.compiles} traces compiled, {self.iterations} iterations traced, '
+                f'{self.exits} exits, {self.misses} misses{state}')
+
+
+class TraceCompiler:
+    """
+    按 Loop 记录的分支和进入时各变量的类型生成 trace 函数的源码。env 是 地址 -> 当前类型,
+    没有的地址是进入时的类型 (entry); 两个分支合并后类型不同的是 DYNAMIC, 再用到时那条语句退出。
+    """
+
+    def __init__(self, loop, interp):
+        self.loop = loop
+        self.slots = interp.frame.slots
+        self.values = interp.global_vars
+        self.storages = interp.arrays
+        self.taken = {}
+        for key, index in loop.taken:
+            self.taken.setdefault(key, set()).add(index)
+        self.entry = {}
+        self.invariants = {}
+        self.declared = set()
+        self.written = set()
+        self.arrays = {}
+        self.indexed = set()
+        self.points = []
+        self.lines = []
+        self.depth = 0
+        self.temps = 0
+        self.guards = 0
+        self.code = HEAD_EXIT
+        self.back = []
+        self.continues = False
+
+    def emit(self, line):
+        self.lines.append((self.depth, line))
+
+    def temp(self):
+        self.temps += 1
+        return f'_t{self.temps}'
+
+    # 变量和数组
+
+    @staticmethod
+    def name(address):
+        depth, slot = address
+        return f'l{slot}' if depth == LOCAL else f'g{slot}'
+
+    def var_type(self, env, address):
+        if address in env:
+            t = env[address]
+        elif address in self.declared:
+            raise Unsupported
+        else:
+            t = self.entry_type(address)
+        if t is DYNAMIC:
+            raise Unsupported
+        return t
+
+    def entry_type(self, address):
+        if address not in self.entry:
+            depth, slot = address
+            t = type(self.slots[slot] if depth == LOCAL else self.values[slot])
+            if t not in VALUE_TYPES:
+                raise Unsupported
+            self.entry[address] = t
+        return self.entry[address]
+
+    def array(self, name, multi):
+        if name not in self.arrays:
+            storage = self.storages.get(name)
+            if storage is None:
+                raise Unsupported
+            self.arrays[name] = (len(self.arrays), element_type(storage))
+        if multi:
+            self.indexed.add(name)
+        return self.arrays[name]
+
+    def index(self, name, number, children, env):
+        if len(children) == 1:
+            src, t = self.expr(children[0], env)
+            return src if t is int else f'int({src})'
+        return f'_ix{number}({", ".join(self.expr(child, env)[0] for child in children)})'
+
+    def guard(self, src, t):
+        self.guards += 1
+        name = self.temp()
+        return f'({name} if ({name} := {src}).__class__ is {TYPE_NAMES[t]} else _exit({self.code}))'
+
+    # 表达式: 返回 (源码, 类型)
+
+    def expr(self, node, env):
+        if not isinstance(node, Tree):
+            raise Unsupported
+        data = kind(node)
+        if data in SYMBOLS:
+            return self.binary(node, data, env)
+        handler = getattr(self, 'expr_' + data, None)
+        if handler is None:
+            raise Unsupported
+        return handler(node, env)
+
+    def literal(self, value):
+        t = type(value)
+        if t not in VALUE_TYPES:
+            raise Unsupported
+        if t is float and not math.isfinite(value):
+            return f'float({str(value)!r})', t
+        return repr(value), t
+
+    def expr_const(self, node, env):
+        return self.literal(node.children[0])
+
+    def expr_number(self, node, env):
+        text = str(node.children[0])
+        return self.literal(int(text) if '.' not in text else float(text))
+
+    def expr_string(self, node, env):
+        return repr(str(node.children[0])[1:-1]), str
+
+    def expr_true_bool(self, node, env):
+        return 'True', bool
+
+    def expr_false_bool(self, node, env):
+        return 'False', bool
+
+    def expr_var(self, node, env):
+        return self.name(node.address), self.var_type(env, node.address)
+
+    def expr_invariant(self, node, env):
+        # 循环不变量: 外层循环每次进入 hoist_stmt 都会清空, 所以进入 trace 时可能还是 UNCOMPUTED,
+        # 这时和解释器一样第一次用到时求值并记下; 表达式生成不了时只能用进入时已经算好的值
+        address = (LOCAL, node.slot)
+        name = self.name(address)
+        try:
+            src, t = self.expr(node.children[0], env)
+        except Unsupported:
+            return name, self.entry_type(address)
+        if address not in self.invariants:
+            value = self.slots[node.slot]
+            self.invariants[address] = t if value is UNCOMPUTED else type(value)
+        if self.invariants[address] is not t:
+            raise Unsupported
+        self.written.add(address)
+        return f'({name} if {name} is not _UNCOMPUTED else ({name} := {src}))', t
+
+    def expr_grouped_expr(self, node, env):
+        return self.expr(node.children[0], env)
+
+    expr_condition_func = expr_grouped_expr
+
+    def expr_condition_and_func(self, node, env):
+        # 只出现在 if/while/for 的条件里, 只看真假
+        return '(' + ' and '.join(self.expr(child, env)[0] for child in node.children) + ')', bool
+
+    def expr_condition_or_func(self, node, env):
+        return '(' + ' or '.join(self.expr(child, env)[0] for child in node.children) + ')', bool
+
+    def binary(self, node, data, env):
+        left, right = node.children
+        a, ta = self.expr(left, env)
+        b, tb = self.expr(right, env)
+        t = binary_type(data, ta, tb, right)
+        if t is None:
+            raise Unsupported
+        src = f'({a} {SYMBOLS[data]} {b})'
+        if t is DYNAMIC:
+            # 只有次幂: 按常见的情况猜, 取到值以后检查
+            t = float if float in (ta, tb) else int
+            src = self.guard(src, t)
+        return src, t
+
+    def expr_neg_op(self, node, env):
+        a, ta = self.expr(node.children[0], env)
+        if unary_type('neg_op', ta) is None:
+            raise Unsupported
+        return f'(~{a})', int
+
+    def expr_not_op(self, node, env):
+        return f'(not {self.expr(node.children[0], env)[0]})', bool
+
+    def expr_array_access(self, node, env):
+        name = str(node.children[0])
+        number, t = self.array(name, len(node.children) > 2)
+        index = self.index(name, number, node.children[1:], env)
+        i = self.temp()
+        src = f'(_arr{number}[{i}] if ({i} := {index}) < _len{number} else _index_error({name!r}))'
+        if t is None:
+            t = str
+            src = self.guard(src, t)
+        return src, t
+
+    # 语句: 返回执行完以后的 env, 一定退出或跳走时返回 None
+
+    def statement(self, node, env, chain, code=None):
+        if code is None:
+            code = FIRST_EXIT + len(self.points)
+            self.points.append(chain)
+        saved_code, saved_lines, saved_depth = self.code, len(self.lines), self.depth
+        self.code = code
+        try:
+            data = kind(node)
+            handler = getattr(self, 'stmt_aug' if data in AUG_OPS else 'stmt_' + data, None)
+            if handler is None:
+                raise Unsupported
+            return handler(node, env, chain)
+        except Unsupported:
+            del self.lines[saved_lines:]
+            self.depth = saved_depth
+            self.emit(f'return {code}')
+            return None
+        finally:
+            self.code = saved_code
+
+    def block(self, node, env, chain):
+        start = len(self.lines)
+        for index, stmt in enumerate(node.children):
+            if stmt is None:
+                continue
+            env = self.statement(stmt, env, [(node, index)] + chain)
+            if env is None:
+                break
+        if len(self.lines) == start:
+            self.emit('pass')
+        return env
+
+    def stmt_comment_stmt(self, node, env, chain):
+        return env
+
+    def stmt_block_stmt(self, node, env, chain):
+        return self.block(node, env, chain)
+
+    def stmt_assign_stmt(self, node, env, chain):
+        var_type = TYPES[node.children[0].data]
+        env = dict(env)
+        for var_factor in node.children[1:]:
+            decl = var_factor.children[0]
+            if decl.address is None or decl.address[0] != LOCAL:
+                raise Unsupported
+            if decl.data == 'unassign_stmt':
+                src, t = repr('' if var_type is str else 0), type('' if var_type is str else 0)
+            else:
+                src, t = self.expr(decl.children[1], env)
+                if (t is str) != (var_type is str):
+                    raise Unsupported
+            self.emit(f'{self.name(decl.address)} = {src}')
+            self.declared.add(decl.address)
+            self.written.add(decl.address)
+            env[decl.address] = t
+        return env
+
+    def stmt_reassign_stmt(self, node, env, chain):
+        # typed: cp_types 证明了检查一定通过, 解释器直接赋值 (float 变量可以存着 int, 赋值以后变成 float)
+        src, t = self.expr(node.children[1], env)
+        old = self.var_type(env, node.address)
+        if t is not old:
+            if not getattr(node, 'typed', False):
+                raise Unsupported
+            env = dict(env)
+            env[node.address] = t
+        self.emit(f'{self.name(node.address)} = {src}')
+        self.written.add(node.address)
+        return env
+
+    def stmt_self_add(self, node, env, chain):
+        if self.var_type(env, node.address) is not int:
+            raise Unsupported
+        self.emit(f'{self.name(node.address)} {"+" if kind(node) == "self_add" else "-"}= 1')
+        self.written.add(node.address)
+        return env
+
+    stmt_self_sub = stmt_self_add
+
+    def stmt_aug(self, node, env, chain):
+        name = self.name(node.address)
+        data = AUG_OPS[kind(node)]
+        ta = self.var_type(env, node.address)
+        b, tb = self.expr(node.children[1], env)
+        t = binary_type(data, ta, tb, node.children[1])
+        if t is None:
+            raise Unsupported
+        src = f'({name} {SYMBOLS[data]} {b})'
+        if t is DYNAMIC:
+            t = float if float in (ta, tb) else int
+            src = self.guard(src, t)
+        self.emit(f'{name} = {src}')
+        self.written.add(node.address)
+        env = dict(env)
+        env[node.address] = t
+        return env
+
+    def stmt_array_assign(self, node, env, chain):
+        name = str(node.children[0])
+        number, _ = self.array(name, len(node.children) > 3)
+        index, value = self.temp(), self.temp()
+        self.emit(f'{index} = {self.index(name, number, node.children[1:-1], env)}')
+        self.emit(f'{value} = {self.expr(node.children[-1], env)[0]}')
+        self.emit(f'if {index} >= _len{number}: _index_error({name!r})')
+        self.emit('try:')
+        self.emit(f'    _arr{number}[{index}] = {value}')
+        self.emit('except (TypeError, OverflowError):')
+        self.emit(f'    _store_element(_A, {name!r}, {index}, {value})')
+        self.emit(f'    _arr{number} = _A[{name!r}]')
+        return env
+
+    def stmt_print_stmt(self, node, env, chain):
+        # 边求值边输出, 中途不能退出, 所以整条语句里不能有检查
+        guards = self.guards
+        children = node.children
+        sep, end = children[-2], children[-1]
+        for i in range(len(children) - 2):
+            factor = children[i]
+            if factor is None:
+                continue
+            self.write(factor.children[0], env)
+            if sep is None:
+                if i < len(children) - 3:
+                    self.emit("_out(' ')")
+            else:
+                self.write(sep.children[0], env)
+        if end is None:
+            self.emit("_out('\\n')")
+        else:
+            self.write(end.children[0], env)
+        if self.guards != guards:
+            raise Unsupported
+        return env
+
+    def write(self, node, env):
+        src, t = self.expr(node, env)
+        self.emit(f'_out({src})' if t is str else f'_out(str({src}))')
+
+    def stmt_if_else_stmt(self, node, env, chain):
+        taken = self.taken.get(id(node), set())
+        if not taken:
+            raise Unsupported
+        last = max(taken)
+        exit = f'return {self.code}'
+        envs = []
+        keyword = 'if'
+        for index, clause in enumerate(node.children):
+            if clause is None or index > last:
+                continue
+            if clause.data == 'else_stmt':
+                self.emit('else:')
+                body = clause.children[0]
+            else:
+                self.emit(f'{keyword} {self.expr(clause.children[0], env)[0]}:')
+                keyword = 'elif'
+                body = clause.children[1]
+            if not isinstance(body, Tree) or body.data != 'block_stmt':
+                raise Unsupported
+            self.depth += 1
+            if index not in taken:
+                self.emit(exit)
+            else:
+                envs.append(self.block(body, dict(env), chain))
+            self.depth -= 1
+            if clause.data == 'else_stmt':
+                break
+        else:
+            if len(node.children) not in taken:
+                self.emit('else:')
+                self.emit('    ' + exit)
+            else:
+                envs.append(env)
+        return self.merge([e for e in envs if e is not None])
+
+    def merge(self, envs):
+        if not envs:
+            return None
+        merged = dict(envs[0])
+        for other in envs[1:]:
+            for address in set(merged) | set(other):
+                if address in self.declared and (address not in merged or address not in other):
+                    merged[address] = DYNAMIC
+                    continue
+                a = merged[address] if address in merged else self.entry.get(address, DYNAMIC)
+                b = other[address] if address in other else self.entry.get(address, DYNAMIC)
+                merged[address] = a if a is b else DYNAMIC
+        return merged
+
+    def stmt_break_stmt(self, node, env, chain):
+        self.emit(f'return {LOOP_BREAK}')
+        return None
+
+    def stmt_continue_stmt(self, node, env, chain):
+        # while 直接回到循环头; for 和 do-while 还要执行更新语句或条件, 循环体包在只执行一次的 for 里, 用 break 跳出
+        self.back.append(env)
+        self.continues = True
+        self.emit('continue' if self.loop.kind == 'while_stmt' else 'break')
+        return None
+
+    # 整个循环
+
+    def compile(self):
+        loop = self.loop
+        head, tail = [], []
+        self.depth = 0
+        if loop.test_first and loop.condition is not None:
+            self.code = HEAD_EXIT
+            head.append(f'if not {self.expr(loop.condition, {})[0]}: return {LOOP_DONE}')
+        body = []
+        if loop.block is not None:
+            self.lines = []
+            env = self.block(loop.block, {}, [])
+            body = self.lines
+            if env is not None:
+                self.back.append(env)
+            if body and body[0] == (0, f'return {FIRST_EXIT}'):
+                # 循环体的第一条语句就退出, trace 只会多一次进出
+                raise Unsupported
+        self.lines = []
+        if loop.update is not None:
+            env = self.merge(self.back)
+            self.back = [] if env is None else [self.statement(loop.update, env, [], TAIL_EXIT)]
+            self.back = [env for env in self.back if env is not None]
+        if not loop.test_first:
+            self.code = TAIL_EXIT
+            self.emit(f'if not {self.expr(loop.condition, self.merge(self.back) or {})[0]}: return {LOOP_DONE}')
+        tail = self.lines
+
+        # 回到循环头时类型可能变了的变量, 每次迭代开始时检查
+        changed = []
+        back = self.merge(self.back)
+        if back is not None:
+            for address, t in sorted(back.items()):
+                if address in self.entry and t is not self.entry[address]:
+                    changed.append(address)
+
+        out = ['def _trace(_L, _G, _A, _I, _out):']
+        loads = sorted(set(self.entry) | self.written)
+        for address in loads:
+            depth, slot = address
+            out.append(f'    {self.name(address)} = {"_L" if depth == LOCAL else "_G"}[{slot}]')
+        checks = [f'{self.name(address)}.__class__ is not {TYPE_NAMES[t]}' for address, t in sorted(self.entry.items())]
+        checks += [f'{self.name(address)} is not _UNCOMPUTED and {self.name(address)}.__class__ is not {TYPE_NAMES[t]}'
+                   for address, t in sorted(self.invariants.items())]
+        if checks:
+            out.append(f'    if {" or ".join(checks)}: return {MISS}')
+        for name, (number, t) in sorted(self.arrays.items(), key=lambda item: item[1][0]):
+            out.append(f'    _arr{number} = _A.get({name!r})')
+            out.append(f'    if _arr{number} is None or _element_type(_arr{number}) is not {TYPE_NAMES[t]}: return {MISS}')
+            out.append(f'    _len{number} = len(_arr{number})')
+            if name in self.indexed:
+                out.append(f'    _ix{number} = _I.get({name!r})')
+                out.append(f'    if _ix{number} is None: return {MISS}')
+        out.append('    _count = 0')
+        out.append('    try:')
+        out.append('        while True:')
+        for address in changed:
+            t = self.entry[address]
+            out.append(f'            if {self.name(address)}.__class__ is not {TYPE_NAMES[t]}: return {HEAD_EXIT}')
+        out.extend('            ' + line for line in head)
+        out.append('            _count += 1')
+        indent = 3
+        if self.continues and loop.kind != 'while_stmt':
+            out.append('            for _ in _ONCE:')
+            indent = 4
+        out.extend('    ' * (indent + depth) + line for depth, line in body)
+        out.extend('    ' * (3 + depth) + line for depth, line in tail)
+        out.append('    except _SideExit as _e:')
+        out.append('        return _e.code')
+        out.append('    finally:')
+        for address in sorted(self.written):
+            depth, slot = address
+            out.append(f'        {"_L" if depth == LOCAL else "_G"}[{slot}] = {self.name(address)}')
+        out.append('        _loop.iterations += _count')
+        source = '\n'.join(out) + '\n'
+
+        namespace = {
+            '_loop': loop,
+            '_exit': side_exit,
+            '_SideExit': SideExit,
+            '_index_error': index_error,
+            '_element_type': element_type,
+            '_store_element': store_element,
+            '_ONCE': (None,),
+            '_UNCOMPUTED': UNCOMPUTED,
+        }
+        exec(compile(source, f'<trace line {loop.line}>', 'exec'), namespace)
+        loop.function = namespace['_trace']
+        loop.source = source
+        loop.points = self.points
+        loop.ntaken = len(loop.taken)
+        loop.entry = (sorted(self.entry.items()), [(name, t) for name, (_, t) in sorted(self.arrays.items())],
+                      sorted(self.invariants.items()))
@@ -0,0 +1,827 @@
+# -*- coding: utf-8 -*-
+"""
+把 cp 程序翻译成等价的 Python 源码, 用 compile() 编译后由 CPython 直接执行。
+
+    python cp_transpile.py program.cp          # 打印生成的 Python 模块
+    run(source, engine='python')
+
+翻译规则:
+- 顶层声明的变量放在 G (全局 dict) 里, 块内和函数内的变量是 Python 局部变量 name_slot,
+  作用域与槽位规则与 cp_vm 相同;
+- 每个 cp 函数/方法是一个模块级 def, 第一个参数是当前 this, 执行到 func 语句时才登记到函数表,
+  调用仍按 (函数名, 参数类型) 重载分派;
+- 类、数组、cin 走 cp_runtime.Runtime, 与其它引擎共用同一套规则。
+
+生成的源码按哈希缓存到 CP_CACHE_DIR/py/ 下: <hash>.py 是源码 (traceback 能显示行号),
+<hash>.pyc 是 marshal 后的 code object, 源码不变时直接加载, 跳过 compile()。
+"""
+
+import hashlib
+import importlib.util
+import marshal
+import math
+import os
+import sys
+
+from lark import Tree, Token
+
+from cp_builtins import bind_builtins, call_builtin
+from cp_input import InputTarget
+from cp_optimize import UNCOMPUTED, optimize
+from cp_parser import calc_parser, default_cache_dir
+from cp_resolve import resolve
+from cp_runtime import MISSING, Runtime, AUG_OPS, TYPES, CATCH_PREFIX, signature, store_element
+from cp_types import check_types
+from cp_vectorize import vectorize
+
+
+TRANSLATOR_VERSION = 1
+
+PY_OPERATORS = {
+    'add': '+',
+    'sub': '-',
+    'mul': '*',
+    'div': '/',
+    'div_int': '//',
+    'mod': '%',
+    'pow': '**',
+    'and_op': '&',
+    'or_op': '|',
+    'xor_op': '^',
+    'left_shift_op': '<<',
+    'right_shift_op': '>>',
+    'less_than': '<',
+    'less_than_equal': '<=',
+    'greater_than': '>',
+    'greater_than_equal': '>=',
+    'equal': '==',
+    'not_equal': '!=',
+}
+
+TYPE_NAMES = {cls: cls.__name__ for cls in TYPES.values()}
+
+
+def types_source(types):
+    if len(types) == 1:
+        return f'({TYPE_NAMES[types[0]]},)'
+    return '(' + ', '.join(TYPE_NAMES[t] for t in types) + ')'
+
+
+class Globals(dict):
+    def __missing__(self, key):
+        raise ValueError(f"Undefined variable '{key}'")
+
+
+def memoized(function, memo):
+    """生成的函数 function(this, *args) 外面包一层: 先按实参查 memo, 没有时照常调用再记下返回值"""
+    key_of, lookup, store = memo.key, memo.lookup, memo.store
+
+    def memo_call(this, *args):
+        key = key_of(args)
+        value = lookup(key)
+        if value is MISSING:
+            value = store(key, function(this, *args))
+        return value
+    return memo_call
+
+
+class Loop:
+    __slots__ = ('kind', 'update', 'condition')
+
+    def __init__(self, kind, update=None, condition=None):
+        self.kind = kind
+        self.update = update
+        self.condition = condition
+
+
+class Translator:
+    def __init__(self):
+        self.lines = []
+        self.indent = 1
+        self.defs = []
+        self.scopes = []
+        self.nlocals = 0
+        self.loops = []
+        self.is_main = True
+        self.stray = False
+        self.counter = 0
+        self.targets = 0
+        self.plans = []
+
+    def translate(self, tree, no_memo=frozenset(), memo_capacity=None):
+        bind_builtins(tree)
+        # 未定义的名字和 tree 引擎一样在执行前报错 (去掉的死代码里的也算)
+        resolve(tree)
+        check_types(tree)
+        optimize(tree, no_memo, memo_capacity)
+        # 生成的 _vector(N, ...) 用的是这次编号的 plan, 引擎执行时要用同一个列表
+        self.plans = vectorize(tree)
+        if isinstance(tree, Tree) and tree.data == 'start':
+            stmts = tree.children
+        else:
+            stmts = [tree]
+        main = ['def __cp_main__(this):']
+        for stmt in stmts:
+            self.lines = []
+            self.stray = False
+            self.stmt(stmt)
+            if not self.lines:
+                continue
+            if self.stray:
+                # 顶层的 break/continue/return 只结束当前这条顶层语句, 包一层函数用 return 跳出
+                self.counter += 1
+                name = f'_stmt{self.counter}'
+                main.append(f'    def {name}():')
+                main.extend('    ' + line for line in self.render(self.lines))
+                main.append(f'    {name}()')
+            else:
+                main.extend(self.render(self.lines))
+        if len(main) == 1:
+            main.append('    pass')
+        header = [f'# generated by cp_transpile v{TRANSLATOR_VERSION}', '']
+        # 每个 cin 变量目标一个 InputTarget, 转换函数解析一次后复用
+        targets = [f'_in{n} = _InputTarget()' for n in range(1, self.targets + 1)]
+        if targets:
+            targets.append('')
+        return '\n'.join(header + targets + self.defs + main) + '\n'
+
+    @staticmethod
+    def render(lines):
+        return ['    ' * indent + text for indent, text in lines]
+
+    def emit(self, text):
+        self.lines.append((self.indent, text))
+
+    def emit_lines(self, lines):
+        base = self.indent
+        for indent, text in lines:
+            self.lines.append((base + indent, text))
+
+    def capture(self, fn, *args):
+        # 把一段语句单独翻译出来, 缩进从 0 开始
+        saved = self.lines, self.indent
+        self.lines, self.indent = [], 0
+        fn(*args)
+        lines = self.lines
+        self.lines, self.indent = saved
+        return lines
+
+    # names
+
+    def lookup(self, name):
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope[name]
+        return None
+
+    def declare(self, name):
+        local = f'{name}_{self.nlocals}'
+        self.nlocals += 1
+        self.scopes[-1][name] = local
+        return local
+
+    def load(self, name):
+        local = self.lookup(name)
+        if local is None:
+            return f'G[{name!r}]'
+        return local
+
+    # statements
+
+    def stmt(self, tree):
+        if tree is None or isinstance(tree, Token):
+            return
+        handler = getattr(self, 'stmt_' + tree.data, None)
+        if handler is not None:
+            handler(tree)
+        elif tree.data in AUG_OPS:
+            self.stmt_aug(tree)
+        else:
+            self.emit(self.expr(tree))
+
+    def block(self, tree, new_scope=True):
+        self.indent += 1
+        if new_scope:
+            self.scopes.append({})
+        start = len(self.lines)
+        for child in tree.children:
+            self.stmt(child)
+        if len(self.lines) == start:
+            self.emit('pass')
+        if new_scope:
+            self.scopes.pop()
+        self.indent -= 1
+
+    def stmt_comment_stmt(self, tree):
+        pass
+
+    def stmt_block_stmt(self, tree):
+        self.emit('if True:')
+        self.block(tree)
+
+    def stmt_assign_stmt(self, tree):
+        is_string = tree.children[0].data == 'string_type'
+        for var_factor in tree.children[1:]:
+            node = var_factor.children[0]
+            name = str(node.children[0])
+            if node.data == 'unassign_stmt':
+                value = repr('' if is_string else 0)
+            elif getattr(node, 'typed', False):
+                value = self.expr(node.children[1])
+            else:
+                value = f'_checked({name!r}, {is_string}, {self.expr(node.children[1])})'
+            if not self.scopes:
+                self.emit(f'_declare({name!r}, {value})')
+            elif name in self.scopes[-1]:
+                self.emit(value)
+                self.emit(f'raise ValueError({f"Variable {name!r} already exists"!r})')
+            else:
+                self.emit(f'{self.declare(name)} = {value}')
+
+    def stmt_reassign_stmt(self, tree):
+        name = str(tree.children[0])
+        target = self.load(name)
+        if getattr(tree, 'typed', False):
+            # cp_types 证明了类型相同, 不用再检查
+            self.emit(f'{target} = {self.expr(tree.children[1])}')
+            return
+        self.emit(f'_v = {self.expr(tree.children[1])}')
+        self.emit(f'if _v.__class__ is not {target}.__class__: _bad_assign({name!r}, _v, {target})')
+        self.emit(f'{target} = _v')
+
+    def incr(self, name, delta, typed):
+        sign = '++' if delta > 0 else '--'
+        op = '+' if delta > 0 else '-'
+        local = self.lookup(name)
+        if typed:
+            self.emit(f'{self.load(name)} {op}= 1')
+        elif local is None:
+            self.emit(f'_v = G[{name!r}]')
+            self.emit(f'if _v.__class__ is not int: _bad_incr({name!r}, {sign!r})')
+            self.emit(f'G[{name!r}] = _v {op} 1')
+        else:
+            self.emit(f'if {local}.__class__ is not int: _bad_incr({name!r}, {sign!r})')
+            self.emit(f'{local} {op}= 1')
+
+    def stmt_self_add(self, tree):
+        self.incr(str(tree.children[0]), 1, getattr(tree, 'typed', False))
+
+    def stmt_self_sub(self, tree):
+        self.incr(str(tree.children[0]), -1, getattr(tree, 'typed', False))
+
+    def stmt_aug(self, tree):
+        name = str(tree.children[0])
+        target = self.load(name)
+        op = PY_OPERATORS[AUG_OPS[tree.data]]
+        self.emit(f'{target} = {target} {op} ({self.expr(tree.children[1])})')
+
+    def stmt_print_stmt(self, tree):
+        factors = [factor for factor in tree.children[:-2] if factor is not None]
+        sep, end = tree.children[-2], tree.children[-1]
+        for i, factor in enumerate(factors):
+            self.emit(f'_out(str({self.expr(factor.children[0])}))')
+            if sep is None:
+                if i < len(factors) - 1:
+                    self.emit("_out(' ')")
+            else:
+                self.emit(f'_out(str({self.expr(sep.children[0])}))')
+        if end is None:
+            self.emit("_out('\\n')")
+        else:
+            self.emit(f'_out(str({self.expr(end.children[0])}))')
+
+    def stmt_input_stmt(self, tree):
+        for factor in tree.children:
+            name = str(factor.children[0])
+            if factor.data == 'input_array_stmt':
+                self.emit(f'_input_element({name!r}, {self.array_index(name, factor.children[1:])})')
+                continue
+            if factor.data == 'input_array_fill':
+                self.emit(f'_input_array({name!r})')
+                continue
+            self.targets += 1
+            local = self.lookup(name)
+            if local is None:
+                self.emit(f'_input_global(_in{self.targets}, {name!r})')
+            else:
+                self.emit(f'{local} = _read_value(_in{self.targets}, {local})')
+
+    def stmt_array_def(self, tree):
+        elem_type = TYPE_NAMES[TYPES[tree.children[0].data]]
+        dims = ''.join(self.expr(child) + ', ' for child in tree.children[2:])
+        self.emit(f'_array_def({str(tree.children[1])!r}, {elem_type}, ({dims}))')
+
+    def array_index(self, name, children):
+        # 一个下标就是扁平位置, 多个下标由数组的 indexer 按 stride 换算
+        if len(children) == 1:
+            return self.expr(children[0])
+        return f'_indexers[{name!r}]({", ".join(self.expr(child) for child in children)})'
+
+    def stmt_array_assign(self, tree):
+        name = str(tree.children[0])
+        index, value = self.array_index(name, tree.children[1:-1]), self.expr(tree.children[-1])
+        self.emit(f'_astore({name!r}, {index}, {value})')
+
+    def leave(self):
+        if self.is_main:
+            self.stray = True
+            self.emit('return')
+        else:
+            self.emit('return None')
+
+    def stmt_break_stmt(self, tree):
+        if not self.loops:
+            self.leave()
+            return
+        self.emit('break')
+
+    def stmt_continue_stmt(self, tree):
+        if not self.loops:
+            self.leave()
+            return
+        loop = self.loops[-1]
+        if loop.kind == 'for':
+            self.emit_lines(loop.update)
+        elif loop.kind == 'do':
+            self.emit(f'if not ({loop.condition}): break')
+        self.emit('continue')
+
+    def stmt_return_stmt(self, tree):
+        value = tree.children[0]
+        if self.is_main:
+            if value is not None:
+                self.emit(self.expr(value))
+            self.stray = True
+            self.emit('return')
+        elif value is None:
+            self.emit('return None')
+        else:
+            self.emit(f'return {self.expr(value)}')
+
+    def condition(self, tree):
+        exprs = [self.expr(child) for child in tree.children]
+        if tree.data == 'condition_and_func':
+            return ' and '.join(exprs)
+        if tree.data == 'condition_or_func':
+            return ' or '.join(exprs)
+        return exprs[0]
+
+    def stmt_if_else_stmt(self, tree):
+        keyword = 'if'
+        for clause in tree.children:
+            if clause is None:
+                continue
+            if clause.data == 'else_stmt':
+                self.emit('else:')
+                self.block(clause.children[0])
+            else:
+                self.emit(f'{keyword} {self.condition(clause.children[0])}:')
+                self.block(clause.children[1])
+                keyword = 'elif'
+
+    def stmt_if_stmt(self, tree):
+        self.stmt_if_else_stmt(Tree('if_else_stmt', [tree]))
+
+    def loop_body(self, tree, loop):
+        self.loops.append(loop)
+        self.block(tree)
+        self.loops.pop()
+
+    def stmt_while_stmt(self, tree):
+        self.emit(f'while {self.condition(tree.children[0])}:')
+        self.loop_body(tree.children[1], Loop('while'))
+
+    def stmt_do_while_stmt(self, tree):
+        condition = self.condition(tree.children[1])
+        self.emit('while True:')
+        self.loop_body(tree.children[0], Loop('do', condition=condition))
+        self.indent += 1
+        self.emit(f'if not ({condition}): break')
+        self.indent -= 1
+
+    def stmt_for_stmt(self, tree):
+        init, condition, update, block = tree.children
+        self.scopes.append({})
+        self.stmt(init)
+        update_lines = self.capture(self.stmt, update)
+        self.emit(f'while {self.condition(condition) if condition is not None else "True"}:')
+        if block is not None:
+            self.loop_body(block, Loop('for', update=update_lines))
+        self.indent += 1
+        self.emit_lines(update_lines)
+        if block is None and not update_lines:
+            self.emit('pass')
+        self.indent -= 1
+        self.scopes.pop()
+
+    def stmt_vector_for_stmt(self, tree):
+        # _vector 整体执行成功时跳过逐次执行的循环; 全局变量用 G.get, 未定义时由循环自己报错
+        values = ''.join((self.lookup(name) or f'G.get({name!r})') + ', ' for name in tree.plan.names)
+        self.emit(f'if not _vector({tree.plan.index}, ({values})):')
+        self.indent += 1
+        self.stmt_for_stmt(tree)
+        self.indent -= 1
+
+    def stmt_hoist_stmt(self, tree):
+        # 循环不变量放在局部变量 _invN 里, 进入循环时清空
+        for node in tree.invariants:
+            self.counter += 1
+            node.slot = f'_inv{self.counter}'
+            self.emit(f'{node.slot} = _UNCOMPUTED')
+        self.stmt(tree.children[0])
+
+    def stmt_try_catch_stmt(self, tree):
+        body, name, handler = tree.children
+        self.emit('try:')
+        self.block(body)
+        self.emit('except Exception as _e:')
+        self.scopes.append({})
+        self.indent += 1
+        self.emit(f'{self.declare(str(name))} = _catch(_e)')
+        self.indent -= 1
+        self.block(handler, new_scope=False)
+        self.scopes.pop()
+
+    # functions and classes
+
+    def function(self, name, arg_list, block):
+        params = []
+        types = []
+        if arg_list is not None:
+            for arg in arg_list.children:
+                types.append(TYPES[arg.children[0].data])
+                params.append(str(arg.children[1]))
+        saved = (self.lines, self.indent, self.scopes, self.nlocals, self.loops, self.is_main, self.stray)
+        self.lines, self.indent = [], 0
+        self.scopes, self.nlocals, self.loops, self.is_main = [{}], 0, [], False
+        self.counter += 1
+        py_name = f'_f{self.counter}_{name}'
+        args = ['this'] + [self.declare(param) for param in params]
+        self.emit(f'def {py_name}({", ".join(args)}):')
+        self.block(block, new_scope=False)
+        self.defs.extend(self.render(self.lines))
+        self.defs.append('')
+        self.lines, self.indent, self.scopes, self.nlocals, self.loops, self.is_main, self.stray = saved
+        return types_source(types), py_name
+
+    def stmt_func_def_stmt(self, tree):
+        name = str(tree.children[0])
+        types, py_name = self.function(name, tree.children[1], tree.children[2])
+        self.emit(f'_define_function({name!r}, {types}, {py_name})')
+
+    def stmt_memo_def_stmt(self, tree):
+        node = tree.children[0]
+        name = str(node.children[0])
+        types, py_name = self.function(name, node.children[1], node.children[2])
+        self.emit(f'_define_memo({name!r}, {types}, {py_name}, {tree.capacity!r})')
+
+    def define_class(self, name, base, var_list, func_list):
+        fields = []
+        values = []
+        if var_list is not None:
+            children = var_list.children
+            for i in range(0, len(children), 2):
+                arg, value = children[i], children[i + 1]
+                if value is None:
+                    values.append(repr('' if arg.children[0].data == 'string_type' else 0))
+                else:
+                    values.append(self.expr(value))
+                fields.append(str(arg.children[1]))
+        methods = []
+        if func_list is not None:
+            children = func_list.children
+            for i in range(0, len(children), 3):
+                method = str(children[i])
+                types, py_name = self.function(f'{name}_{method}', children[i + 1], children[i + 2])
+                methods.append(f'(({method!r}, {types}), {py_name})')
+        self.emit(f'_define_class({name!r}, {base!r}, {tuple(fields)!r}, '
+                  f'({"".join(m + ", " for m in methods)}), [{", ".join(values)}])')
+
+    def stmt_class_def(self, tree):
+        self.define_class(str(tree.children[0]), None, tree.children[1], tree.children[2])
+
+    def stmt_class_extends(self, tree):
+        self.define_class(str(tree.children[0]), str(tree.children[1]), tree.children[2], tree.children[3])
+
+    def stmt_class_instance(self, tree):
+        class_type, name, class_type2 = (str(child) for child in tree.children)
+        self.emit(f'_new_instance({class_type!r}, {name!r}, {class_type2!r})')
+
+    def stmt_class_instance_trans(self, tree):
+        name, class_type2 = (str(child) for child in tree.children)
+        self.emit(f'_new_instance(None, {name!r}, {class_type2!r})')
+
+    # expressions
+
+    def expr(self, tree):
+        data = tree.data
+        if data in PY_OPERATORS:
+            a, b = self.expr(tree.children[0]), self.expr(tree.children[1])
+            return f'({a} {PY_OPERATORS[data]} {b})'
+        return getattr(self, 'expr_' + data)(tree)
+
+    def expr_const(self, tree):
+        value = tree.children[0]
+        if type(value) is float and not math.isfinite(value):
+            return f'float({repr(value)!r})'
+        # 负数加括号, 免得 -2 ** 2 这样的优先级问题
+        text = repr(value)
+        return f'({text})' if text.startswith('-') else text
+
+    def expr_number(self, tree):
+        num_str = str(tree.children[0])
+        try:
+            value = int(num_str) if '.' not in num_str else float(num_str)
+        except ValueError as e:
+            return f'_raise(ValueError, {str(e)!r})'
+        return repr(value)
+
+    def expr_string(self, tree):
+        return repr(str(tree.children[0][1:-1]))
+
+    def expr_true_bool(self, tree):
+        return 'True'
+
+    def expr_false_bool(self, tree):
+        return 'False'
+
+    def expr_var(self, tree):
+        return self.load(str(tree.children[0]))
+
+    def expr_grouped_expr(self, tree):
+        return self.expr(tree.children[0])
+
+    def expr_neg_op(self, tree):
+        return f'(~{self.expr(tree.children[0])})'
+
+    def expr_not_op(self, tree):
+        return f'(not {self.expr(tree.children[0])})'
+
+    def expr_invariant(self, tree):
+        name = tree.slot
+        return f'({name} if {name} is not _UNCOMPUTED else ({name} := {self.expr(tree.children[0])}))'
+
+    def expr_array_access(self, tree):
+        name = str(tree.children[0])
+        return f'_aload({name!r}, {self.array_index(name, tree.children[1:])})'
+
+    def args(self, arg_values):
+        if arg_values is None:
+            return ''
+        return ''.join(', ' + self.expr(child) for child in arg_values.children)
+
+    def expr_func_call_stmt(self, tree):
+        name = str(tree.children[0])
+        arg_types = getattr(tree, 'arg_types', None)
+        if arg_types is not None:
+            # 实参类型由 cp_types 确定, 函数表的键直接写进生成的代码
+            return f'_call_typed(({name!r}, {types_source(arg_types)}), this{self.args(tree.children[1])})'
+        return f'_call({name!r}, this{self.args(tree.children[1])})'
+
+    def expr_inline_call(self, tree):
+        # 实参用 := 放进局部变量 _pN, 全部求完再比较类型 (类型已经确定时不比较); 函数体只看得到参数和全局变量
+        name = str(tree.children[0])
+        params, types = signature(tree.children[2])
+        args = [self.expr(child) for child in tree.children[1].children] if tree.children[1] is not None else []
+        names = []
+        for _ in params:
+            self.counter += 1
+            names.append(f'_p{self.counter}')
+        saved, self.scopes = self.scopes, [dict(zip(params, names))]
+        body = self.expr(tree.children[3])
+        self.scopes = saved
+        if not params:
+            return body
+        if getattr(tree, 'arg_types', None) == types:
+            assigns = ', '.join(f'({local} := {arg})' for local, arg in zip(names, args))
+            return f'({assigns}, {body})[-1]'
+        error = f"_raise(NameError, {f'Function {name!r} not defined'!r})"
+        if len(params) == 1:
+            check = f'type({names[0]} := {args[0]}) is {TYPE_NAMES[types[0]]}'
+        else:
+            actual = ', '.join(f'type({local} := {arg})' for local, arg in zip(names, args))
+            check = f'({actual}) == ({", ".join(TYPE_NAMES[t] for t in types)})'
+        return f'({body} if {check} else {error})'
+
+    def expr_builtin_call(self, tree):
+        args = ''.join(', ' + (repr(str(arg.children[0])) if arg.data == 'array_name' else self.expr(arg))
+                       for arg in tree.children[1].children)
+        return f'_builtin({str(tree.children[0])!r}{args})'
+
+    def expr_class_var(self, tree):
+        return f'_field({str(tree.children[0])!r}, {str(tree.children[1])!r})'
+
+    def expr_this_var(self, tree):
+        return f'_this_field(this, {str(tree.children[0])!r})'
+
+    def expr_super_var(self, tree):
+        return f'_super_field(this, {str(tree.children[0])!r})'
+
+    def expr_class_func(self, tree):
+        name, method = str(tree.children[0]), str(tree.children[1])
+        return f'_call_method({name!r}, {method!r}{self.args(tree.children[2])})'
+
+    def expr_this_func(self, tree):
+        return f'_call_this(this, {str(tree.children[0])!r}{self.args(tree.children[1])})'
+
+    def expr_super_func(self, tree):
+        return f'_call_super(this, {str(tree.children[0])!r}{self.args(tree.children[1])})'
+
+
+def translate(tree):
+    return Translator().translate(tree)
+
+
+def code_cache_dir(cache_dir=None):
+    if cache_dir is None:
+        cache_dir = default_cache_dir()
+    if not cache_dir:
+        return None
+    return os.path.join(cache_dir, 'py')
+
+
+def load_code(source, cache_dir=None):
+    """返回 (code object, 源码文件路径); 有缓存时不再调用 compile()"""
+    directory = code_cache_dir(cache_dir)
+    if directory is None:
+        return compile(source, '<cp>', 'exec'), None
+    key = hashlib.sha256(source.encode('utf-8') + importlib.util.MAGIC_NUMBER).hexdigest()[:24]
+    py_path = os.path.join(directory, key + '.py')
+    code_path = os.path.join(directory, key + '.pyc')
+    try:
+        with open(code_path, 'rb') as f:
+            return marshal.load(f), py_path
+    except (OSError, ValueError, EOFError, TypeError):
+        pass
+    code = compile(source, py_path, 'exec')
+    try:
+        os.makedirs(directory, exist_ok=True)
+        for path, data in ((py_path, source.encode('utf-8')), (code_path, marshal.dumps(code))):
+            tmp = f'{path}.{os.getpid()}.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+    except OSError:
+        pass
+    return code, py_path
+
+
+class PythonEngine(Runtime):
+    def __init__(self, stdin=None, out=None, cache_dir=None, no_memo=frozenset(), memo_capacity=None):
+        super().__init__(stdin, out, no_memo, memo_capacity)
+        self.globals = Globals()
+        self.cache_dir = cache_dir
+        self.source = None
+        self.source_file = None
+        self.plans = []
+
+    def execute(self, tree):
+        translator = Translator()
+        self.source = translator.translate(tree, self.no_memo, self.memo_capacity)
+        self.plans = translator.plans
+        code, self.source_file = load_code(self.source, self.cache_dir)
+        namespace = self.namespace()
+        exec(code, namespace)
+        namespace['__cp_main__'](None)
+
+    def namespace(self):
+        return {
+            '__name__': '__cp__',
+            'G': self.globals,
+            '_out': self.out.write,
+            '_checked': self.checked,
+            '_declare': self.declare,
+            '_bad_assign': self.bad_assign,
+            '_bad_incr': self.bad_incr,
+            '_read_value': self.read_value,
+            '_InputTarget': InputTarget,
+            '_input_global': self.input_global,
+            '_input_element': self.input_element,
+            '_input_array': self.input_array,
+            '_array_def': self.array_def,
+            '_indexers': self.indexers,
+            '_builtin': self.builtin,
+            '_vector': self.vector,
+            '_UNCOMPUTED': UNCOMPUTED,
+            '_aload': self.aload,
+            '_astore': self.astore,
+            '_catch': self.catch,
+            '_raise': self.raise_error,
+            '_define_function': self.define_function,
+            '_define_memo': self.define_memo_function,
+            '_define_class': self.define_class,
+            '_new_instance': self.new_instance,
+            '_call': self.call,
+            '_call_typed': self.call_typed,
+            '_call_method': self.call_method,
+            '_call_this': self.call_this,
+            '_call_super': self.call_super,
+            '_field': self.field,
+            '_this_field': self.this_field,
+            '_super_field': self.super_field,
+        }
+
+    # helpers called from the generated code
+
+    def define_memo_function(self, name, types, function, capacity):
+        self.define_memo(name, types, function, memoized, capacity)
+
+    @staticmethod
+    def checked(name, is_string, value):
+        if (type(value) == str) != is_string:
+            raise TypeError(f"Cannot assign {str(type(value))} value to variable '{name}'.")
+        return value
+
+    def declare(self, name, value):
+        if name in self.globals:
+            raise ValueError(f"Variable '{name}' already exists")
+        self.globals[name] = value
+
+    @staticmethod
+    def bad_assign(name, value, old):
+        raise TypeError(f"Cannot assign {type(value).__name__} value to variable '{name}' of type {type(old).__name__}")
+
+    @staticmethod
+    def bad_incr(name, sign):
+        raise TypeError(f"Cannot use {sign} operator on non-integer variable '{name}'")
+
+    @staticmethod
+    def raise_error(cls, message):
+        raise cls(message)
+
+    @staticmethod
+    def catch(error):
+        return CATCH_PREFIX + str(error)
+
+    def builtin(self, name, *args):
+        return call_builtin(self.arrays, name, args)
+
+    def vector(self, index, values):
+        return self.plans[index].run(self.arrays, values)
+
+    def input_global(self, target, name):
+        if name not in self.globals:
+            raise ValueError(f"Variable '{name}' not found")
+        self.globals[name] = self.read_value(target, self.globals[name])
+
+    def aload(self, name, index):
+        index = int(index)
+        return self.array(name, index)[index]
+
+    def astore(self, name, index, value):
+        index = int(index)
+        try:
+            self.array(name, index)[index] = value
+        except (TypeError, OverflowError):
+            store_element(self.arrays, name, index, value)
+
+    def call(self, name, this, *args):
+        return self.function(name, args)(this, *args)
+
+    def call_typed(self, key, this, *args):
+        function = self.functions.get(key)
+        if function is None:
+            function = self.function(key[0], args)
+        return function(this, *args)
+
+    def call_method(self, name, method, *args):
+        if name not in self.classes:
+            raise NameError(f"Class '{name}' not defined")
+        return self.method(name, method, args)(name, *args)
+
+    @staticmethod
+    def current_this(this):
+        if this is None:
+            raise NameError("No class instance defined")
+        return this
+
+    def call_this(self, this, method, *args):
+        this = self.current_this(this)
+        return self.method(this, method, args)(this, *args)
+
+    def call_super(self, this, method, *args):
+        base = self.super_of(self.current_this(this))
+        return self.method(base, method, args)(base, *args)
+
+    def field(self, name, var):
+        if name not in self.classes:
+            raise NameError(f"Class instance '{name}' not defined")
+        return self.load_field(name, var)
+
+    def this_field(self, this, var):
+        return self.load_field(self.current_this(this), var)
+
+    def super_field(self, this, var):
+        return self.load_field(self.super_of(self.current_this(this)), var)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 1:
+        raise SystemExit('usage: python cp_transpile.py program.cp')
+    with open(argv[0], encoding='utf-8') as f:
+        sys.stdout.write(translate(calc_parser.parse(f.read())))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,645 @@
+# -*- coding: utf-8 -*-
+"""
+静态类型检查, 所有引擎在优化之前执行: check_types(tree) 推断整个程序里变量、函数和方法的返回值、
+类字段、数组元素的类型, 执行到时一定会出类型错误的写法在执行前直接报错, 一定能通过的运行时类型检查
+标注在结点上, 引擎执行时跳过。
+
+类型就是值的 Python 类型 (int/float/str/bool, 以及函数没有返回值时的 NoneType), 推断不出来时是 DYNAMIC。
+变量的类型是它的值的类型, 规则与执行时相同:
+    声明只检查初值是不是 string (float x = 1 里 x 是 int), 没有初值时是 0 或 '';
+    重新赋值要求与原来的值类型相同, ++/-- 只用于 int, 这两种都不改变类型;
+    复合赋值 (+= 等) 不检查, 结果的类型由运算决定; cin 按原来的类型转换 (bool 读成 int);
+    函数参数的类型就是声明的类型 (调用按实参类型分派), catch 变量是 string。
+所以变量的类型是它所有写入的类型合并起来, 只有一种时才是确定的类型。函数的返回类型 (同名同参数类型的
+定义合并)、类字段 (所有类里的同名字段合并) 和数组元素 (同名数组的所有定义合并, string 数组是 list,
+还要合并写进去的值) 也一样; 它们互相依赖, 反复推断直到不再变化, 最后一遍再标注和报错。
+
+一定出错: 类型都确定并且运行时的检查一定不通过 (声明、重新赋值、++/--、数组元素), 运算一定抛 TypeError,
+或者实参类型都确定但同名函数没有一个重载接受。报错用执行时会抛的异常类型, 消息前面加上行号。
+执行不到的代码也检查 (与 cp_resolve 对未定义名字的处理相同), 但 try 块里的语句照常留到执行时报错,
+可以被 catch 捕获。
+
+结点上的标注:
+    assign_stmt2, reassign_stmt, self_add, self_sub 的 typed: 为 True 时执行时的类型检查一定通过
+    算术、比较、位运算结点的 operands: 两边运算数一定是同一个类型时是这个类型, 否则为 None;
+        tree 引擎据此直接选特化结点, 不用观察类型, 也不用 guard (见 cp_engine.quicken)
+    func_call_stmt, inline_call 的 arg_types: 实参类型都确定时是它们的 tuple, 否则为 None
+"""
+
+from lark import Token, Tree
+
+from cp_builtins import WRITERS
+from cp_runtime import AUG_OPS, OPERATORS, TYPES, signature
+
+
+# 为 False 时一定出错的程序也照常执行, 执行到时才报错 (bench/verify_types.py 用来比较)
+REJECT = True
+
+# 为 False 时不做标注, 引擎照常在执行时检查类型
+ELIDE_CHECKS = True
+
+# 还没有推断出任何值 (比如只有递归调用自己的分支); 与任何类型合并都得到那个类型
+NOTHING = type('Nothing', (), {'__repr__': lambda self: 'NOTHING'})()
+
+# 执行前不确定的类型
+DYNAMIC = type('Dynamic', (), {'__repr__': lambda self: 'DYNAMIC'})()
+
+NONE_TYPE = type(None)
+
+VALUE_TYPES = (int, float, str, bool)
+
+SYMBOLS = {
+    'add': '+', 'sub': '-', 'mul': '*', 'div': '/', 'div_int': '//', 'mod': '%', 'pow': '**',
+    'and_op': '&', 'or_op': '|', 'xor_op': '^', 'left_shift_op': '<<', 'right_shift_op': '>>',
+    'less_than': '<', 'less_than_equal': '<=', 'greater_than': '>', 'greater_than_equal': '>=',
+    'equal': '==', 'not_equal': '!=',
+}
+
+ARITHMETIC = ('add', 'sub', 'mul', 'div', 'div_int', 'mod', 'pow')
+ORDERING = ('less_than', 'less_than_equal', 'greater_than', 'greater_than_equal')
+BITWISE = ('and_op', 'or_op', 'xor_op')
+INTEGRAL = (int, bool)
+
+# 数组存储接受的元素类型 (int 数组存 bool 时变成 1/0) 和取出来的类型; string 数组是 list, 什么都能存
+ACCEPTS = {int: (int, bool), float: (int, float, bool), bool: (bool,)}
+
+# 有类型检查、可以标注 typed 的结点
+CHECKED = ('assign_stmt2', 'reassign_stmt', 'self_add', 'self_sub')
+
+
+def known(t):
+    return t is not NOTHING and t is not DYNAMIC
+
+
+def join(a, b):
+    if a is NOTHING or a is b:
+        return b
+    if b is NOTHING:
+        return a
+    return DYNAMIC
+
+
+def non_negative(node):
+    return isinstance(node, Tree) and (
+        node.data == 'const' and type(node.children[0]) is int and node.children[0] >= 0
+        or node.data == 'number' and str(node.children[0]).isdigit())
+
+
+def binary_type(data, a, b, right):
+    """
+    两个确定类型的运算数做 data 运算的结果类型, 与 Python 的规则相同; 一定抛 TypeError 时返回 None。
+    right 是右边的结点: int ** int 只有指数是非负的字面量时才一定是 int。
+    """
+    if data == 'equal' or data == 'not_equal':
+        return bool
+    if a not in VALUE_TYPES or b not in VALUE_TYPES:
+        return DYNAMIC
+    numbers = a is not str and b is not str
+    if data in ORDERING:
+        return bool if numbers or a is b else None
+    if data in BITWISE:
+        if a in INTEGRAL and b in INTEGRAL:
+            return bool if a is bool and b is bool else int
+        return None
+    if data not in ARITHMETIC:
+        return int if a in INTEGRAL and b in INTEGRAL else None
+    if numbers:
+        if data == 'div':
+            return float
+        if data == 'pow':
+            # 负数的小数次幂是复数, int 的负数次幂是 float
+            if b is float:
+                return DYNAMIC
+            if a is float:
+                return float
+            return int if non_negative(right) else DYNAMIC
+        return float if a is float or b is float else int
+    if data == 'add':
+        return str if a is b else None
+    if data == 'mul':
+        return str if (a is str) != (b is str) and float not in (a, b) else None
+    if data == 'mod':
+        # 字符串格式化, 格式不对时抛的也是 TypeError, 但不一定
+        return str if a is str else None
+    return None
+
+
+def unary_type(data, a):
+    if data == 'not_op':
+        return bool
+    if a not in VALUE_TYPES:
+        return DYNAMIC
+    return int if a in INTEGRAL else None
+
+
+def read_type(t):
+    # cin 的转换: string 和 float 保持, 其余都按 int 读
+    if t is str or t is float or not known(t):
+        return t
+    return int
+
+
+def first_line(node):
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Token):
+            return node.line
+        if isinstance(node, Tree):
+            stack.extend(reversed(node.children))
+    return None
+
+
+def completes(node):
+    """语句执行完以后会不会接着执行下一条: return/break/continue 和所有分支都不会的 if/else 不会"""
+    if not isinstance(node, Tree):
+        return True
+    data = node.data
+    if data in ('return_stmt', 'break_stmt', 'continue_stmt'):
+        return False
+    if data == 'block_stmt':
+        return all(completes(child) for child in node.children)
+    if data == 'if_else_stmt':
+        clauses = [clause for clause in node.children if clause is not None]
+        if clauses[-1].data != 'else_stmt':
+            return True
+        return any(completes(clause.children[-1]) for clause in clauses)
+    if data == 'try_catch_stmt':
+        return completes(node.children[0]) or completes(node.children[2])
+    if data == 'hoist_stmt':
+        return completes(node.children[0])
+    return True
+
+
+class Var:
+    __slots__ = ('type',)
+
+    def __init__(self, t=NOTHING):
+        self.type = t
+
+
+class TypeStats:
+    def __init__(self):
+        self.checks = 0
+        self.removed = 0
+        self.operators = 0
+        self.calls = 0
+
+    def __repr__(self):
+        return (f'{self.removed} of {self.checks} runtime type checks removed, '
+                f'{self.operators} operators and {self.calls} calls with static types')
+
+
+class TypeChecker:
+    """
+    推断由 run() 遍历整棵树完成, 作用域规则与 cp_resolve 相同 (函数只看得到自己的局部变量和全局变量)。
+    每个声明、参数、catch 变量对应一个 Var (按结点记在 vars 里, 每一遍都是同一个),
+    returns/methods/fields/arrays 是函数和方法的返回类型、字段和 string 数组元素的类型。
+    写入时合并, 有变化就再来一遍; final 的那一遍做标注和报错。
+    """
+
+    def __init__(self, tree):
+        self.stats = TypeStats()
+        self.vars = {}
+        self.globals = {}
+        self.functions = {}
+        self.methods = {}
+        self.returns = {}
+        self.method_returns = {}
+        self.fields = {}
+        self.array_types = {}
+        self.arrays = {}
+        self.changed = False
+        self.final = False
+        self.scopes = []
+        self.declared = set()
+        self.function = None
+        self.loops = 0
+        self.try_depth = 0
+        stmts = tree.children if tree.data == 'start' else [tree]
+        for stmt in stmts:
+            if isinstance(stmt, Tree) and stmt.data == 'assign_stmt':
+                for var_factor in stmt.children[1:]:
+                    self.globals.setdefault(str(var_factor.children[0].children[0]), Var())
+        for node in tree.iter_subtrees():
+            data = node.data
+            if data == 'func_def_stmt' or data == 'inline_call':
+                name = str(node.children[0])
+                arg_list = node.children[1] if data == 'func_def_stmt' else node.children[2]
+                self.functions.setdefault(name, set()).add(signature(arg_list)[1])
+            elif data == 'class_func_list':
+                for i in range(0, len(node.children), 3):
+                    name = str(node.children[i])
+                    self.methods.setdefault(name, set()).add(signature(node.children[i + 1])[1])
+            elif data == 'array_def':
+                self.array_types.setdefault(str(node.children[1]), set()).add(TYPES[node.children[0].data])
+            if data in CHECKED:
+                node.typed = False
+            elif data in OPERATORS:
+                node.operands = None
+            elif data == 'func_call_stmt' or data == 'inline_call':
+                node.arg_types = None
+
+    def check(self, tree):
+        while True:
+            self.changed = False
+            self.run(tree)
+            if not self.changed:
+                break
+        self.final = True
+        self.run(tree)
+        return self.stats
+
+    def run(self, tree):
+        self.scopes = []
+        self.declared = set()
+        self.function = None
+        self.loops = 0
+        self.try_depth = 0
+        self.visit(tree)
+
+    # 合并与报错
+
+    def write(self, var, t):
+        new = join(var.type, t)
+        if new is not var.type:
+            var.type = new
+            self.changed = True
+
+    def widen(self, table, key, t):
+        old = table.get(key, NOTHING)
+        new = join(old, t)
+        if new is not old:
+            table[key] = new
+            self.changed = True
+
+    def error(self, node, cls, message):
+        if self.final and REJECT and self.try_depth == 0:
+            line = first_line(node)
+            raise cls(message if line is None else f'line {line}: {message}')
+
+    def mark(self, node, typed):
+        if self.final:
+            self.stats.checks += 1
+            if typed and ELIDE_CHECKS:
+                node.typed = True
+                self.stats.removed += 1
+
+    # 遍历: 语句返回 None, 表达式返回类型
+
+    def visit(self, node):
+        if not isinstance(node, Tree):
+            return DYNAMIC
+        handler = getattr(self, node.data, None)
+        if handler is not None:
+            return handler(node)
+        if node.data in AUG_OPS:
+            return self.aug(node)
+        if node.data in OPERATORS:
+            return self.binary(node)
+        self.visit_children(node)
+        return DYNAMIC
+
+    def visit_children(self, node):
+        for child in node.children:
+            if isinstance(child, Tree):
+                self.visit(child)
+
+    # 变量
+
+    def lookup(self, name):
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope[name]
+        return self.globals.get(name)
+
+    def declare(self, name, node):
+        # 同一作用域里重复声明时执行到会报错, 返回 None
+        if not self.scopes:
+            if name in self.declared:
+                return None
+            self.declared.add(name)
+            return self.globals[name]
+        if name in self.scopes[-1]:
+            return None
+        var = self.vars.setdefault(id(node), Var())
+        self.scopes[-1][name] = var
+        return var
+
+    def fixed(self, node, key, t):
+        var = self.vars.get((id(node), key))
+        if var is None:
+            var = self.vars[(id(node), key)] = Var(t)
+        return var
+
+    def assign_stmt(self, tree):
+        declared = TYPES[tree.children[0].data]
+        for var_factor in tree.children[1:]:
+            node = var_factor.children[0]
+            name = str(node.children[0])
+            if node.data == 'assign_stmt2':
+                value = self.visit(node.children[1])
+                if known(value):
+                    if (value is str) != (declared is str):
+                        self.error(node, TypeError, f"Cannot assign {str(value)} value to variable '{name}'.")
+                        self.declare(name, node)
+                        continue
+                    self.mark(node, True)
+                else:
+                    self.mark(node, False)
+            else:
+                value = str if declared is str else int
+            var = self.declare(name, node)
+            if var is not None:
+                self.write(var, value)
+
+    def reassign_stmt(self, tree):
+        name = str(tree.children[0])
+        value = self.visit(tree.children[1])
+        var = self.lookup(name)
+        old = var.type if var is not None else DYNAMIC
+        if known(old) and known(value) and old is not value:
+            self.error(tree, TypeError,
+                       f"Cannot assign {value.__name__} value to variable '{name}' of type {old.__name__}")
+        self.mark(tree, known(old) and old is value)
+
+    def incr(self, tree, sign):
+        name = str(tree.children[0])
+        var = self.lookup(name)
+        old = var.type if var is not None else DYNAMIC
+        if known(old) and old is not int:
+            self.error(tree, TypeError, f"Cannot use {sign} operator on non-integer variable '{name}'")
+        self.mark(tree, old is int)
+
+    def self_add(self, tree):
+        self.incr(tree, '++')
+
+    def self_sub(self, tree):
+        self.incr(tree, '--')
+
+    def aug(self, tree):
+        value = self.visit(tree.children[1])
+        var = self.lookup(str(tree.children[0]))
+        if var is not None:
+            self.write(var, self.operate(tree, AUG_OPS[tree.data], var.type, value, tree.children[1]))
+
+    def input_factor_stmt(self, tree):
+        var = self.lookup(str(tree.children[0]))
+        if var is not None:
+            self.write(var, read_type(var.type))
+
+    # 作用域
+
+    def block_stmt(self, tree):
+        self.scopes.append({})
+        self.visit_children(tree)
+        self.scopes.pop()
+
+    def loop(self, tree):
+        self.loops += 1
+        self.visit_children(tree)
+        self.loops -= 1
+
+    while_stmt = do_while_stmt = loop
+
+    def for_stmt(self, tree):
+        self.scopes.append({})
+        self.loop(tree)
+        self.scopes.pop()
+
+    vector_for_stmt = for_stmt
+
+    def try_catch_stmt(self, tree):
+        self.try_depth += 1
+        self.visit(tree.children[0])
+        self.try_depth -= 1
+        self.scopes.append({str(tree.children[1]): self.fixed(tree, 0, str)})
+        self.visit_children(tree.children[2])
+        self.scopes.pop()
+
+    # 函数和类
+
+    def function_body(self, table, key, arg_list, block):
+        # 函数体在调用时才执行, 调用它的地方不一定在 try 里
+        saved = self.scopes, self.function, self.loops, self.try_depth
+        params = {}
+        if arg_list is not None:
+            for arg in arg_list.children:
+                params[str(arg.children[1])] = self.fixed(arg, 0, TYPES[arg.children[0].data])
+        self.scopes, self.function, self.loops, self.try_depth = [params], (table, key), 0, 0
+        self.visit_children(block)
+        if completes(block):
+            self.widen(table, key, NONE_TYPE)
+        self.scopes, self.function, self.loops, self.try_depth = saved
+
+    def func_def_stmt(self, tree):
+        name = str(tree.children[0])
+        self.function_body(self.returns, (name, signature(tree.children[1])[1]), tree.children[1], tree.children[2])
+
+    def return_stmt(self, tree):
+        value = NONE_TYPE if tree.children[0] is None else self.visit(tree.children[0])
+        if self.function is not None:
+            self.widen(*self.function, value)
+
+    def leave(self, tree):
+        # 函数体里不在循环中的 break/continue 结束函数, 返回值是 None
+        if self.function is not None and self.loops == 0:
+            self.widen(*self.function, NONE_TYPE)
+
+    break_stmt = continue_stmt = leave
+
+    def define_class(self, var_list, func_list):
+        if var_list is not None:
+            children = var_list.children
+            for i in range(0, len(children), 2):
+                arg, value = children[i], children[i + 1]
+                if value is None:
+                    t = str if arg.children[0].data == 'string_type' else int
+                else:
+                    t = self.visit(value)
+                self.widen(self.fields, str(arg.children[1]), t)
+        if func_list is not None:
+            children = func_list.children
+            for i in range(0, len(children), 3):
+                key = (str(children[i]), signature(children[i + 1])[1])
+                self.function_body(self.method_returns, key, children[i + 1], children[i + 2])
+
+    def class_def(self, tree):
+        self.define_class(tree.children[1], tree.children[2])
+
+    def class_extends(self, tree):
+        self.define_class(tree.children[2], tree.children[3])
+
+    def field(self, tree):
+        return self.fields.get(str(tree.children[-1]), DYNAMIC)
+
+    def class_var(self, tree):
+        return self.fields.get(str(tree.children[1]), DYNAMIC)
+
+    this_var = super_var = field
+
+    def args(self, arg_values):
+        if arg_values is None:
+            return ()
+        return tuple(self.visit(child) for child in arg_values.children)
+
+    def call(self, tree, name, args, functions, returns):
+        """按实参类型找重载, 返回可能选中的那些定义的返回类型合并起来"""
+        if NOTHING in args:
+            return NOTHING
+        candidates = [types for types in functions.get(name, ()) if len(types) == len(args) and
+                      all(t is arg or not known(arg) for t, arg in zip(types, args))]
+        if not candidates:
+            if name in functions and tree.data == 'func_call_stmt':
+                types = ', '.join(arg.__name__ if known(arg) else '?' for arg in args)
+                self.error(tree, NameError, f"Function '{name}' not defined for ({types})")
+            return DYNAMIC if name not in functions else NOTHING
+        result = NOTHING
+        for types in candidates:
+            result = join(result, returns.get((name, types), NOTHING))
+        return result
+
+    def func_call_stmt(self, tree):
+        args = self.args(tree.children[1])
+        if self.final and ELIDE_CHECKS and all(known(arg) for arg in args):
+            tree.arg_types = args
+            self.stats.calls += 1
+        return self.call(tree, str(tree.children[0]), args, self.functions, self.returns)
+
+    def inline_call(self, tree):
+        # 内联的函数体只看得到参数和全局变量
+        args = self.args(tree.children[1])
+        params, types = signature(tree.children[2])
+        if self.final and ELIDE_CHECKS and all(known(arg) for arg in args):
+            tree.arg_types = args
+            self.stats.calls += 1
+        saved = self.scopes
+        self.scopes = [{param: self.fixed(tree, i, t) for i, (param, t) in enumerate(zip(params, types))}]
+        result = self.visit(tree.children[3])
+        self.scopes = saved
+        return result
+
+    def method_call(self, tree):
+        return self.call(tree, str(tree.children[-2]), self.args(tree.children[-1]), self.methods, self.method_returns)
+
+    class_func = this_func = super_func = method_call
+
+    # 数组
+
+    def element_type(self, name):
+        result = NOTHING
+        for t in self.array_types.get(name, ()):
+            result = join(result, self.arrays.get(name, str) if t is str else t)
+        return DYNAMIC if result is NOTHING else result
+
+    def array_def(self, tree):
+        self.visit_children(tree)
+        name = str(tree.children[1])
+        if TYPES[tree.children[0].data] is str:
+            self.widen(self.arrays, name, str)
+
+    def array_access(self, tree):
+        self.visit_children(tree)
+        return self.element_type(str(tree.children[0]))
+
+    def array_assign(self, tree):
+        for child in tree.children[1:-1]:
+            self.visit(child)
+        value = self.visit(tree.children[-1])
+        name = str(tree.children[0])
+        types = self.array_types.get(name, ())
+        if str in types:
+            self.widen(self.arrays, name, value)
+        elif types and known(value) and not any(value in ACCEPTS[t] for t in types):
+            self.error(tree, TypeError, f"Array '{name}' type mismatch")
+
+    def builtin_call(self, tree):
+        # 改写数组的内置函数可以往 string 数组里存任何值
+        args = tree.children[1].children
+        for arg in args:
+            if arg.data != 'array_name':
+                self.visit(arg)
+        name = str(args[0].children[0])
+        if tree.children[0] in WRITERS and name in self.arrays:
+            self.widen(self.arrays, name, DYNAMIC)
+        return DYNAMIC
+
+    # 表达式
+
+    def number(self, tree):
+        return float if '.' in str(tree.children[0]) else int
+
+    def string(self, tree):
+        return str
+
+    def true_bool(self, tree):
+        return bool
+
+    false_bool = true_bool
+
+    def const(self, tree):
+        return type(tree.children[0])
+
+    def var(self, tree):
+        var = self.lookup(str(tree.children[0]))
+        return DYNAMIC if var is None else var.type
+
+    def grouped_expr(self, tree):
+        return self.visit(tree.children[0])
+
+    def invariant(self, tree):
+        return self.visit(tree.children[0])
+
+    def hoist_stmt(self, tree):
+        self.visit(tree.children[0])
+
+    def memo_def_stmt(self, tree):
+        self.visit(tree.children[0])
+
+    def condition_func(self, tree):
+        return self.visit(tree.children[0])
+
+    def condition_all(self, tree):
+        self.visit_children(tree)
+        return bool
+
+    condition_and_func = condition_or_func = condition_all
+
+    def binary(self, tree):
+        a = self.visit(tree.children[0])
+        b = self.visit(tree.children[1])
+        if self.final and ELIDE_CHECKS and known(a) and a is b:
+            tree.operands = a
+            self.stats.operators += 1
+        return self.operate(tree, tree.data, a, b, tree.children[1])
+
+    def operate(self, tree, data, a, b, right):
+        if a is NOTHING or b is NOTHING:
+            return NOTHING
+        if a is DYNAMIC or b is DYNAMIC:
+            return bool if data == 'equal' or data == 'not_equal' else DYNAMIC
+        result = binary_type(data, a, b, right)
+        if result is None:
+            self.error(tree, TypeError,
+                       f"unsupported operand type(s) for {SYMBOLS[data]}: '{a.__name__}' and '{b.__name__}'")
+            return NOTHING
+        return result
+
+    def unary(self, tree):
+        a = self.visit(tree.children[0])
+        if not known(a):
+            return bool if tree.data == 'not_op' and a is DYNAMIC else a
+        result = unary_type(tree.data, a)
+        if result is None:
+            self.error(tree, TypeError, f"bad operand type for unary ~: '{a.__name__}'")
+            return NOTHING
+        return result
+
+    neg_op = not_op = unary
+
+
+def check_types(tree):
+    """推断并检查整个程序的类型, 标注结点, 返回统计; 一定出错时抛出执行时会抛的那种异常"""
+    if not isinstance(tree, Tree):
+        return TypeStats()
+    return TypeChecker(tree).check(tree)
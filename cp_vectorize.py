@@ -0,0 +1,430 @@
+# -*- coding: utf-8 -*-
+"""
+for 循环的自动向量化。
+
+vectorize() 在执行前找出下面这种形状的 for 循环, 把结点改成 vector_for_stmt, 在结点上挂一个 VectorLoop:
+
+    for (int i = start; i < limit; i++) {       也可以是 i <= limit, i += k (k 是正整数字面量)
+        a[i] = b[i] * c + d[i + 1]
+        e[i] = a[i] - 1
+    }
+
+- 循环体只有一维下标的数组赋值语句;
+- 下标是 i 的仿射式 (i 乘不变量再加减不变量), 不含数组访问;
+- 右边只有数字、变量、i、这样的数组访问和 + - * / // %, 没有函数调用、print、cin;
+- start、limit 和右边的变量都不是 i, 循环体也不会改写它们, 所以是不变量。
+
+执行到 vector_for_stmt 时, 引擎取出 plan.names 里各变量的当前值交给 plan.run(arrays, values)。
+run 先检查能否整体执行: 有 NumPy、数组都是数值存储、值都是 int/float、下标不越界 (也不为负)、
+被写的数组只按同一个下标访问 (没有跨迭代的依赖)、int 运算不会超出 int64、除数不为 0、
+结果类型存得进目标数组; 都满足时按语句逐条在切片上算完, 最后一起写回数组并返回 True,
+结果与逐次迭代执行相同 (int 数组照样会加宽)。任何一条不满足就什么都不改, 返回 False,
+引擎照常执行原来的循环, 出错的位置和信息也与原来相同。
+
+没有 NumPy 时 (或把 cp_vectorize.numpy 置为 None) 所有循环都按原来的方式执行,
+bench/verify_vectorize.py 用这一点对比两种执行方式的结果。
+"""
+
+import math
+
+from lark import Tree
+
+from cp_builtins import INT_LIMIT, bound
+from cp_runtime import replace_values
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# 迭代次数少于这个数时逐次执行更快
+MIN_COUNT = 16
+# int / int 转成 float64 再除时结果不变的上界
+FLOAT_EXACT = 2 ** 53
+INT32 = (-2 ** 31, 2 ** 31 - 1)
+
+ARITHMETIC = ('add', 'sub', 'mul', 'div', 'div_int', 'mod')
+INT_ONLY = ('div_int', 'mod')
+
+
+class NotVectorizable(Exception):
+    pass
+
+
+def literal(tree):
+    # number 结点按引擎的规则解码; const 是 cp_optimize 解码或折叠好的值, 只接受数字
+    if tree.data == 'const':
+        value = tree.children[0]
+        if type(value) is not int and type(value) is not float:
+            raise NotVectorizable
+        return value
+    text = str(tree.children[0])
+    try:
+        return int(text) if '.' not in text else float(text)
+    except ValueError:
+        raise NotVectorizable from None
+
+
+class Analyzer:
+    """把循环的各部分翻译成元组形式的表达式, 不符合条件时抛 NotVectorizable"""
+
+    def __init__(self, var):
+        self.var = var
+        self.names = {}
+
+    def expr(self, tree, in_index=False):
+        """返回 (表达式, 对 i 的次数): 0 是不变量, 1 是 i 的仿射式, None 是其他"""
+        if not isinstance(tree, Tree):
+            raise NotVectorizable
+        data = tree.data
+        if data == 'number' or data == 'const':
+            return ('const', literal(tree)), 0
+        if data == 'var':
+            name = str(tree.children[0])
+            if name == self.var:
+                return ('index',), 1
+            self.names.setdefault(name, tree)
+            return ('name', name), 0
+        if data == 'grouped_expr' or data == 'invariant':
+            return self.expr(tree.children[0], in_index)
+        if data == 'array_access':
+            if in_index or len(tree.children) != 2:
+                raise NotVectorizable
+            return ('element', str(tree.children[0]), self.index(tree.children[1])), None
+        if data in ARITHMETIC:
+            a, da = self.expr(tree.children[0], in_index)
+            b, db = self.expr(tree.children[1], in_index)
+            if da == 0 and db == 0:
+                degree = 0
+            elif data in ('add', 'sub') and da is not None and db is not None:
+                degree = 1
+            elif data == 'mul' and (da == 0 or db == 0) and da is not None and db is not None:
+                degree = 1
+            else:
+                degree = None
+            return (data, a, b), degree
+        raise NotVectorizable
+
+    def invariant(self, tree):
+        expr, degree = self.expr(tree)
+        if degree != 0:
+            raise NotVectorizable
+        return expr
+
+    def index(self, tree):
+        expr, degree = self.expr(tree, in_index=True)
+        if degree is None:
+            raise NotVectorizable
+        return expr
+
+
+def loop_var(init):
+    # int i = start, 只声明一个变量
+    if not isinstance(init, Tree) or init.data != 'assign_stmt' or len(init.children) != 2:
+        raise NotVectorizable
+    if init.children[0].data != 'int_type':
+        raise NotVectorizable
+    node = init.children[1].children[0]
+    if node.data != 'assign_stmt2':
+        raise NotVectorizable
+    return str(node.children[0]), node.children[1]
+
+
+def loop_limit(condition, var):
+    if condition is None or condition.data != 'condition_func':
+        raise NotVectorizable
+    compare = condition.children[0]
+    if not isinstance(compare, Tree) or compare.data not in ('less_than', 'less_than_equal'):
+        raise NotVectorizable
+    left = compare.children[0]
+    if not (isinstance(left, Tree) and left.data == 'var' and str(left.children[0]) == var):
+        raise NotVectorizable
+    return compare.children[1], compare.data == 'less_than_equal'
+
+
+def loop_step(update, var):
+    if not isinstance(update, Tree) or str(update.children[0]) != var:
+        raise NotVectorizable
+    if update.data == 'self_add':
+        return 1
+    if update.data == 'aug_add':
+        step = update.children[1]
+        if isinstance(step, Tree) and step.data in ('number', 'const'):
+            value = literal(step)
+            if type(value) is int and value > 0:
+                return value
+    raise NotVectorizable
+
+
+def analyze(tree):
+    """for_stmt -> VectorLoop, 不符合条件时抛 NotVectorizable"""
+    init, condition, update, block = tree.children
+    var, start = loop_var(init)
+    limit, inclusive = loop_limit(condition, var)
+    step = loop_step(update, var)
+    analyzer = Analyzer(var)
+    start = analyzer.invariant(start)
+    limit = analyzer.invariant(limit)
+    stmts = []
+    for stmt in block.children if block is not None else []:
+        if stmt is None:
+            continue
+        if not isinstance(stmt, Tree) or stmt.data != 'array_assign' or len(stmt.children) != 3:
+            raise NotVectorizable
+        name, index, value = stmt.children
+        stmts.append((str(name), analyzer.index(index), analyzer.expr(value)[0]))
+    if not stmts:
+        raise NotVectorizable
+    return VectorLoop(start, limit, inclusive, step, stmts, analyzer.names)
+
+
+def vectorize(tree):
+    """把能向量化的 for 循环改成 vector_for_stmt 结点, 返回所有 VectorLoop; 可以重复调用"""
+    if not isinstance(tree, Tree):
+        return []
+    plans = []
+    for node in tree.iter_subtrees_topdown():
+        if node.data == 'for_stmt':
+            try:
+                node.plan = analyze(node)
+            except NotVectorizable:
+                continue
+            node.data = 'vector_for_stmt'
+        if node.data == 'vector_for_stmt':
+            node.plan.index = len(plans)
+            plans.append(node.plan)
+    return plans
+
+
+class Fallback(Exception):
+    pass
+
+
+def scalar_value(expr, env):
+    """按 Python 的运算规则算不变量表达式 (start, limit, 下标的偏移)"""
+    kind = expr[0]
+    if kind == 'const':
+        return expr[1]
+    if kind == 'name':
+        return env[expr[1]]
+    if kind == 'index':
+        return env[None]
+    a, b = scalar_value(expr[1], env), scalar_value(expr[2], env)
+    try:
+        if kind == 'add':
+            return a + b
+        if kind == 'sub':
+            return a - b
+        if kind == 'mul':
+            return a * b
+        if kind == 'div':
+            return a / b
+        if kind == 'div_int':
+            return a // b
+        return a % b
+    except ArithmeticError:
+        raise Fallback from None
+
+
+class VectorLoop:
+    def __init__(self, start, limit, inclusive, step, stmts, names):
+        self.start = start
+        self.limit = limit
+        self.inclusive = inclusive
+        self.step = step
+        self.stmts = stmts
+        # 引擎按 names 的顺序取值; nodes 是对应的 var 结点 (cp_resolve 标注过地址)
+        self.names = list(names)
+        self.nodes = list(names.values())
+        self.index = 0
+        self.vectorized = 0
+        self.fallbacks = 0
+
+    def __repr__(self):
+        return f'<vector loop {self.index}>'
+
+    def run(self, arrays, values):
+        try:
+            done = numpy is not None and self.execute(arrays, values)
+        except Fallback:
+            done = False
+        if done:
+            self.vectorized += 1
+        else:
+            self.fallbacks += 1
+        return done
+
+    def iterations(self, env):
+        """i 依次取的值, 是一个 range"""
+        start = scalar_value(self.start, env)
+        limit = scalar_value(self.limit, env)
+        if type(start) is not int or type(limit) not in (int, float):
+            raise Fallback
+        if type(limit) is float:
+            if not math.isfinite(limit):
+                raise Fallback
+            last = math.floor(limit) if self.inclusive else math.ceil(limit) - 1
+        else:
+            last = limit if self.inclusive else limit - 1
+        return range(start, last + 1, self.step)
+
+    def execute(self, arrays, values):
+        for value in values:
+            if type(value) is not int and type(value) is not float:
+                return False
+        env = dict(zip(self.names, values))
+        indexes = self.iterations(env)
+        if not indexes:
+            return True
+        if len(indexes) < MIN_COUNT or max(abs(indexes[0]), abs(indexes[-1])) >= INT_LIMIT:
+            return False
+        evaluator = Evaluator(arrays, env, indexes)
+        evaluator.check(self.stmts)
+        for name, index, expr in self.stmts:
+            evaluator.store(name, index, evaluator.value(expr))
+        evaluator.commit()
+        return True
+
+
+class Evaluator:
+    """
+    在 NumPy 数组上算一次循环。值是 (数据, 界): 数据是 int64/float64 数组或 Python 标量,
+    界是 int 值绝对值的上界 (float 值为 None), 用来保证 int64 运算不溢出。
+    被写的数组先复制一份 (work), 全部算完、类型检查通过后才写回。
+    """
+
+    def __init__(self, arrays, env, indexes):
+        self.arrays = arrays
+        self.env = env
+        self.indexes = indexes
+        self.work = {}
+        self.affines = {}
+
+    def affine(self, index):
+        """下标表达式 -> (coef, offset), 即 coef * i + offset"""
+        key = id(index)
+        if key not in self.affines:
+            env = self.env
+            env[None] = 0
+            offset = scalar_value(index, env)
+            env[None] = 1
+            coef = scalar_value(index, env) - offset if type(offset) is int else None
+            if type(offset) is not int or type(coef) is not int:
+                raise Fallback
+            self.affines[key] = (coef, offset)
+        return self.affines[key]
+
+    def access(self, name, index):
+        # 只处理数值存储, 下标全部在 [0, len) 内
+        storage = self.arrays.get(name)
+        if getattr(storage, 'typecode', None) not in ('i', 'q', 'd'):
+            raise Fallback
+        coef, offset = self.affine(index)
+        first = coef * self.indexes[0] + offset
+        last = coef * self.indexes[-1] + offset
+        if min(first, last) < 0 or max(first, last) >= len(storage):
+            raise Fallback
+        return coef, offset
+
+    def check(self, stmts):
+        """被写的数组只能按同一个下标读写, 否则有跨迭代的依赖"""
+        accesses = {}
+        for name, index, expr in stmts:
+            accesses.setdefault(name, set()).add(self.access(name, index))
+            self.reads(expr, accesses)
+        for name, _, _ in stmts:
+            if len(accesses[name]) != 1 or next(iter(accesses[name]))[0] == 0:
+                raise Fallback
+            if name not in self.work:
+                storage = self.arrays[name]
+                data = numpy.frombuffer(storage, dtype=storage.typecode)
+                self.work[name] = data.astype(numpy.float64 if storage.typecode == 'd' else numpy.int64)
+
+    def reads(self, expr, accesses):
+        kind = expr[0]
+        if kind == 'element':
+            accesses.setdefault(expr[1], set()).add(self.access(expr[1], expr[2]))
+        elif kind in ARITHMETIC:
+            self.reads(expr[1], accesses)
+            self.reads(expr[2], accesses)
+
+    def part(self, data, index):
+        # 各次迭代访问到的元素, 按迭代顺序排列的视图
+        coef, offset = self.affine(index)
+        first = coef * self.indexes[0] + offset
+        last = coef * self.indexes[-1] + offset
+        step = coef * self.indexes.step
+        if step > 0:
+            return data[first:last + 1:step]
+        return data[last:first + 1:-step][::-1]
+
+    def value(self, expr):
+        kind = expr[0]
+        if kind == 'const' or kind == 'name':
+            value = expr[1] if kind == 'const' else self.env[expr[1]]
+            return value, abs(value) if type(value) is int else None
+        if kind == 'index':
+            data = numpy.arange(self.indexes.start, self.indexes.stop, self.indexes.step, dtype=numpy.int64)
+            return data, max(abs(self.indexes[0]), abs(self.indexes[-1]))
+        if kind == 'element':
+            name = expr[1]
+            if name in self.work:
+                data = self.part(self.work[name], expr[2])
+            else:
+                storage = self.arrays[name]
+                data = self.part(numpy.frombuffer(storage, dtype=storage.typecode), expr[2])
+                if storage.typecode == 'i':
+                    data = data.astype(numpy.int64)
+            return data, (bound(data) if data.dtype.kind == 'i' else None)
+        return self.binary(kind, self.value(expr[1]), self.value(expr[2]))
+
+    def binary(self, kind, left, right):
+        a, ba = left
+        b, bb = right
+        ints = ba is not None and bb is not None
+        if kind in INT_ONLY and not ints:
+            raise Fallback
+        if kind in ('div', 'div_int', 'mod') and numpy.any(b == 0):
+            raise Fallback
+        if ints:
+            if kind == 'mul':
+                safe = ba * bb < INT_LIMIT
+            elif kind == 'div':
+                safe = ba <= FLOAT_EXACT and bb <= FLOAT_EXACT
+            else:
+                safe = ba + bb < INT_LIMIT
+            if not safe:
+                raise Fallback
+        if kind == 'add':
+            result = a + b
+        elif kind == 'sub':
+            result = a - b
+        elif kind == 'mul':
+            result = a * b
+        elif kind == 'div':
+            result = numpy.true_divide(a, b, dtype=numpy.float64)
+        elif kind == 'div_int':
+            result = numpy.floor_divide(a, b)
+        else:
+            result = numpy.mod(a, b)
+        if isinstance(result, numpy.ndarray):
+            return result, (bound(result) if result.dtype.kind == 'i' else None)
+        result = result.item() if isinstance(result, numpy.generic) else result
+        return result, (abs(result) if type(result) is int else None)
+
+    def store(self, name, index, value):
+        data, limit = value
+        work = self.work[name]
+        if work.dtype.kind == 'i' and limit is None:
+            # float 存不进 int 数组
+            raise Fallback
+        self.part(work, index)[...] = data
+
+    def commit(self):
+        for name, work in self.work.items():
+            storage = self.arrays[name]
+            if storage.typecode == 'i' and len(work) and (work.min() < INT32[0] or work.max() > INT32[1]):
+                replace_values(self.arrays, name, work.tolist())
+            else:
+                numpy.frombuffer(storage, dtype=storage.typecode)[:] = work
@@ -0,0 +1,1102 @@
+# -*- coding: utf-8 -*-
+"""
+cp 字节码编译器与栈式虚拟机
+
+Compiler 把 lark 语法树一次性编译成 Code (指令列表), VM 用一个循环执行指令。
+变量在编译期就解析成局部槽位 (LOAD_FAST) 或全局名字 (LOAD_GLOBAL);
+函数调用不占用 Python 栈帧, VM 自己维护 Frame 链, try/catch 的处理器也记录在帧上。
+所以递归深度不受 Python 递归上限的限制, 只受调用栈的内存预算限制 (默认 STACK_BUDGET, 按帧的大小估算占用的内存);
+函数里不在 try 中的 return f(...) 编译成 TAIL_CALL, 直接复用当前帧, 尾递归不占用更多的帧。
+
+作用域按词法划分: 函数只能看到自己的参数/局部变量和全局变量,
+每个 {} 块都是一个新的作用域 (函数体与参数共用一个)。
+输出与 CalculateTree 相同, 包括 print 的 sep/end 规则和类的实例模型。
+"""
+
+import operator
+
+from lark import Tree, Token
+
+from cp_builtins import bind_builtins, call_builtin
+from cp_input import InputTarget
+from cp_optimize import UNCOMPUTED, optimize
+from cp_parser import calc_parser
+from cp_resolve import resolve
+from cp_runtime import MISSING, Runtime, OPERATORS, AUG_OPS, TYPES, CATCH_PREFIX, signature, store_element
+from cp_types import check_types
+from cp_vectorize import vectorize
+
+
+# opcodes
+LOAD_CONST = 0
+LOAD_FAST = 1
+STORE_FAST = 2
+LOAD_GLOBAL = 3
+STORE_GLOBAL = 4
+DECLARE_GLOBAL = 5
+ASSIGN_FAST = 6
+ASSIGN_GLOBAL = 7
+CHECK_DECL = 8
+INCR_FAST = 9
+INCR_GLOBAL = 10
+POP_TOP = 11
+ADD = 12
+SUB = 13
+MUL = 14
+LESS = 15
+LESS_EQUAL = 16
+GREATER = 17
+GREATER_EQUAL = 18
+EQUAL = 19
+NOT_EQUAL = 20
+BINARY = 21
+UNARY = 22
+JUMP = 23
+POP_JUMP_IF_FALSE = 24
+POP_JUMP_IF_TRUE = 25
+PRINT_VALUE = 26
+PRINT_TEXT = 27
+INPUT_CONVERT = 28
+INPUT_GLOBAL = 29
+CALL = 30
+RETURN_VALUE = 31
+DEF_FUNC = 32
+DEF_CLASS = 33
+NEW_INSTANCE = 34
+LOAD_FIELD = 35
+LOAD_THIS = 36
+LOAD_SUPER = 37
+CALL_METHOD = 38
+CALL_THIS = 39
+CALL_SUPER = 40
+ARRAY_DEF = 41
+ARRAY_LOAD = 42
+ARRAY_STORE = 43
+SETUP_TRY = 44
+POP_TRY = 45
+RAISE_ERROR = 46
+HALT = 47
+INPUT_ELEMENT = 48
+INPUT_ARRAY = 49
+ARRAY_INDEX = 50
+CALL_BUILTIN = 51
+VECTOR_LOOP = 52
+LOAD_INVARIANT = 53
+STORE_INVARIANT = 54
+INLINE_ARGS = 55
+DEF_MEMO = 56
+MEMO_LOOKUP = 57
+MEMO_STORE = 58
+TAIL_CALL = 59
+
+# 关掉时 return f(...) 也按普通调用编译 (bench/bench_tail_calls.py 用来比较)
+TAIL_CALLS = True
+
+# 调用栈默认的内存预算 (字节), 超过时报 RecursionError; 每个帧按 FRAME_BYTES 加上每个局部变量 SLOT_BYTES 估算。
+# 每次执行可以用 VM(stack_budget=...) 另给
+STACK_BUDGET = 256 * 1024 * 1024
+FRAME_BYTES = 320
+SLOT_BYTES = 8
+
+OPNAMES = {value: name for name, value in globals().items() if name.isupper() and isinstance(value, int)}
+
+BINARY_OPS = {
+    'add': (ADD, None),
+    'sub': (SUB, None),
+    'mul': (MUL, None),
+    'less_than': (LESS, None),
+    'less_than_equal': (LESS_EQUAL, None),
+    'greater_than': (GREATER, None),
+    'greater_than_equal': (GREATER_EQUAL, None),
+    'equal': (EQUAL, None),
+    'not_equal': (NOT_EQUAL, None),
+}
+for _name, _func in OPERATORS.items():
+    BINARY_OPS.setdefault(_name, (BINARY, _func))
+
+class Code:
+    def __init__(self, name):
+        self.name = name
+        self.instrs = []
+        self.nlocals = 0
+        self.memo = None
+        self.size = 0
+
+    def finish(self):
+        # 局部变量个数定下来以后, 估算一个帧占的内存
+        self.size = FRAME_BYTES + SLOT_BYTES * self.nlocals
+
+    def dis(self):
+        lines = []
+        for pc, (op, arg) in enumerate(self.instrs):
+            lines.append(f'{pc:>4} {OPNAMES[op]:<18} {"" if arg is None else repr(arg)}')
+        return '\n'.join(lines)
+
+
+class Function:
+    __slots__ = ('name', 'nargs', 'code')
+
+    def __init__(self, name, nargs, code):
+        self.name = name
+        self.nargs = nargs
+        self.code = code
+
+    def __repr__(self):
+        return f'<function {self.name}/{self.nargs}>'
+
+
+def attach_memo(function, memo):
+    # 缓存挂在函数的 Code 上, MEMO_LOOKUP/MEMO_STORE 从当前帧的 code 取
+    function.code.memo = memo
+    return function
+
+
+class Loop:
+    __slots__ = ('breaks', 'continues', 'try_depth')
+
+    def __init__(self, try_depth):
+        self.breaks = []
+        self.continues = []
+        self.try_depth = try_depth
+
+
+class Compiler:
+    def __init__(self):
+        self.code = None
+        self.scopes = []
+        self.loops = []
+        self.try_depth = 0
+        self.is_main = True
+        self.stmt_end = []
+        self.memo_slot = None
+
+    def compile_program(self, tree, no_memo=frozenset(), memo_capacity=None):
+        bind_builtins(tree)
+        # 未定义的名字和 tree 引擎一样在执行前报错 (去掉的死代码里的也算)
+        resolve(tree)
+        check_types(tree)
+        optimize(tree, no_memo, memo_capacity)
+        vectorize(tree)
+        self.code = Code('<main>')
+        if isinstance(tree, Tree) and tree.data == 'start':
+            stmts = tree.children
+        else:
+            stmts = [tree]
+        for stmt in stmts:
+            self.stmt_end = []
+            self.compile_stmt(stmt)
+            self.patch_here(self.stmt_end)
+        self.emit(HALT)
+        self.code.finish()
+        return self.code
+
+    # emission helpers
+
+    def emit(self, op, arg=None):
+        self.code.instrs.append((op, arg))
+        return len(self.code.instrs) - 1
+
+    def here(self):
+        return len(self.code.instrs)
+
+    def patch(self, fixups, target):
+        instrs = self.code.instrs
+        for index in fixups:
+            instrs[index] = (instrs[index][0], target)
+
+    def patch_here(self, fixups):
+        self.patch(fixups, self.here())
+
+    def emit_error(self, cls, message):
+        self.emit(RAISE_ERROR, (cls, message))
+
+    # names
+
+    def lookup(self, name):
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope[name]
+        return None
+
+    def declare(self, name):
+        slot = self.code.nlocals
+        self.code.nlocals += 1
+        self.scopes[-1][name] = slot
+        return slot
+
+    def emit_load(self, name):
+        slot = self.lookup(name)
+        if slot is None:
+            self.emit(LOAD_GLOBAL, name)
+        else:
+            self.emit(LOAD_FAST, slot)
+
+    def emit_store(self, name):
+        slot = self.lookup(name)
+        if slot is None:
+            self.emit(STORE_GLOBAL, name)
+        else:
+            self.emit(STORE_FAST, slot)
+
+    def emit_declare(self, name):
+        # 值已经在栈顶
+        if not self.scopes:
+            self.emit(DECLARE_GLOBAL, name)
+        elif name in self.scopes[-1]:
+            self.emit(POP_TOP)
+            self.emit_error(ValueError, f"Variable '{name}' already exists")
+        else:
+            self.emit(STORE_FAST, self.declare(name))
+
+    # statements
+
+    def compile_stmt(self, tree):
+        if tree is None or isinstance(tree, Token):
+            return
+        handler = getattr(self, 'stmt_' + tree.data, None)
+        if handler is not None:
+            handler(tree)
+        elif tree.data in AUG_OPS:
+            self.stmt_aug(tree)
+        else:
+            self.compile_expr(tree)
+            self.emit(POP_TOP)
+
+    def compile_block(self, tree, new_scope=True):
+        if new_scope:
+            self.scopes.append({})
+        for stmt in tree.children:
+            self.compile_stmt(stmt)
+        if new_scope:
+            self.scopes.pop()
+
+    def stmt_comment_stmt(self, tree):
+        pass
+
+    def stmt_block_stmt(self, tree):
+        self.compile_block(tree)
+
+    def stmt_assign_stmt(self, tree):
+        is_string = tree.children[0].data == 'string_type'
+        for var_factor in tree.children[1:]:
+            node = var_factor.children[0]
+            name = str(node.children[0])
+            if node.data == 'unassign_stmt':
+                self.emit(LOAD_CONST, '' if is_string else 0)
+            else:
+                self.compile_expr(node.children[1])
+                if not getattr(node, 'typed', False):
+                    self.emit(CHECK_DECL, (name, is_string))
+            self.emit_declare(name)
+
+    def stmt_reassign_stmt(self, tree):
+        # cp_types 证明了类型相同时不用检查, 直接存
+        name = str(tree.children[0])
+        self.compile_expr(tree.children[1])
+        if getattr(tree, 'typed', False):
+            self.emit_store(name)
+            return
+        slot = self.lookup(name)
+        if slot is None:
+            self.emit(ASSIGN_GLOBAL, name)
+        else:
+            self.emit(ASSIGN_FAST, (slot, name))
+
+    def stmt_self_add(self, tree):
+        self.emit_incr(str(tree.children[0]), 1)
+
+    def stmt_self_sub(self, tree):
+        self.emit_incr(str(tree.children[0]), -1)
+
+    def emit_incr(self, name, delta):
+        slot = self.lookup(name)
+        if slot is None:
+            self.emit(INCR_GLOBAL, (name, delta))
+        else:
+            self.emit(INCR_FAST, (slot, name, delta))
+
+    def stmt_aug(self, tree):
+        name = str(tree.children[0])
+        self.emit_load(name)
+        self.compile_expr(tree.children[1])
+        self.emit_binary(AUG_OPS[tree.data])
+        self.emit_store(name)
+
+    def stmt_print_stmt(self, tree):
+        factors = tree.children[:-2]
+        sep, end = tree.children[-2], tree.children[-1]
+        for i, factor in enumerate(factors):
+            if factor is None:
+                continue
+            self.compile_expr(factor.children[0])
+            self.emit(PRINT_VALUE)
+            if sep is None:
+                if i < len(factors) - 1:
+                    self.emit(PRINT_TEXT, ' ')
+            else:
+                self.compile_expr(sep.children[0])
+                self.emit(PRINT_VALUE)
+        if end is None:
+            self.emit(PRINT_TEXT, '\n')
+        else:
+            self.compile_expr(end.children[0])
+            self.emit(PRINT_VALUE)
+
+    def stmt_input_stmt(self, tree):
+        for factor in tree.children:
+            name = str(factor.children[0])
+            if factor.data == 'input_array_stmt':
+                self.compile_index(name, factor.children[1:])
+                self.emit(INPUT_ELEMENT, name)
+                continue
+            if factor.data == 'input_array_fill':
+                self.emit(INPUT_ARRAY, name)
+                continue
+            slot = self.lookup(name)
+            if slot is None:
+                self.emit(INPUT_GLOBAL, (name, InputTarget()))
+            else:
+                self.emit(LOAD_FAST, slot)
+                self.emit(INPUT_CONVERT, InputTarget())
+                self.emit(STORE_FAST, slot)
+
+    def stmt_array_def(self, tree):
+        dims = tree.children[2:]
+        for dim in dims:
+            self.compile_expr(dim)
+        self.emit(ARRAY_DEF, (str(tree.children[1]), TYPES[tree.children[0].data], len(dims)))
+
+    def compile_index(self, name, indexes):
+        # 多维下标由 ARRAY_INDEX 换算成扁平位置, 之后与一维数组相同
+        for index in indexes:
+            self.compile_expr(index)
+        if len(indexes) > 1:
+            self.emit(ARRAY_INDEX, (name, len(indexes)))
+
+    def stmt_array_assign(self, tree):
+        name = str(tree.children[0])
+        self.compile_index(name, tree.children[1:-1])
+        self.compile_expr(tree.children[-1])
+        self.emit(ARRAY_STORE, name)
+
+    def emit_unwind_try(self, depth):
+        for _ in range(self.try_depth - depth):
+            self.emit(POP_TRY)
+
+    def emit_leave_stmt(self):
+        # 顶层的 break/continue/return 只结束当前这条顶层语句 (与 CalculateTree 一致)
+        if self.is_main:
+            self.emit_unwind_try(0)
+            self.stmt_end.append(self.emit(JUMP))
+        else:
+            self.emit(LOAD_CONST, None)
+            self.emit_return()
+
+    def emit_return(self):
+        # 记忆化的函数返回前先记下结果, 键在 memo_slot 里
+        if self.memo_slot is not None:
+            self.emit(MEMO_STORE, self.memo_slot)
+        self.emit(RETURN_VALUE)
+
+    def stmt_break_stmt(self, tree):
+        if not self.loops:
+            self.emit_leave_stmt()
+            return
+        loop = self.loops[-1]
+        self.emit_unwind_try(loop.try_depth)
+        loop.breaks.append(self.emit(JUMP))
+
+    def stmt_continue_stmt(self, tree):
+        if not self.loops:
+            self.emit_leave_stmt()
+            return
+        loop = self.loops[-1]
+        self.emit_unwind_try(loop.try_depth)
+        loop.continues.append(self.emit(JUMP))
+
+    def stmt_return_stmt(self, tree):
+        value = tree.children[0]
+        if self.is_main:
+            if value is not None:
+                self.compile_expr(value)
+                self.emit(POP_TOP)
+            self.emit_unwind_try(0)
+            self.stmt_end.append(self.emit(JUMP))
+            return
+        if value is None:
+            self.emit(LOAD_CONST, None)
+            self.emit_return()
+            return
+        while value.data == 'grouped_expr':
+            value = value.children[0]
+        # 在 try 里时被调函数的异常要由这里的处理器捕获, 记忆化的函数返回前要记下结果, 都不能复用帧
+        if TAIL_CALLS and value.data == 'func_call_stmt' and self.try_depth == 0 and self.memo_slot is None:
+            argc = self.compile_args(value.children[1])
+            self.emit(TAIL_CALL, (str(value.children[0]), self.call_key(value), argc))
+            return
+        self.compile_expr(value)
+        self.emit_return()
+
+    def compile_condition(self, tree):
+        # 返回条件为假时需要回填的跳转
+        exprs = tree.children
+        if tree.data == 'condition_or_func':
+            trues = []
+            for expr in exprs[:-1]:
+                self.compile_expr(expr)
+                trues.append(self.emit(POP_JUMP_IF_TRUE))
+            self.compile_expr(exprs[-1])
+            falses = [self.emit(POP_JUMP_IF_FALSE)]
+            self.patch_here(trues)
+            return falses
+        falses = []
+        for expr in exprs:
+            self.compile_expr(expr)
+            falses.append(self.emit(POP_JUMP_IF_FALSE))
+        return falses
+
+    def stmt_if_else_stmt(self, tree):
+        ends = []
+        for clause in tree.children:
+            if clause is None:
+                continue
+            if clause.data == 'else_stmt':
+                self.compile_block(clause.children[0])
+                continue
+            falses = self.compile_condition(clause.children[0])
+            self.compile_block(clause.children[1])
+            ends.append(self.emit(JUMP))
+            self.patch_here(falses)
+        self.patch_here(ends)
+
+    def stmt_if_stmt(self, tree):
+        self.stmt_if_else_stmt(Tree('if_else_stmt', [tree]))
+
+    def compile_loop_body(self, block, loop):
+        self.loops.append(loop)
+        self.compile_block(block)
+        self.loops.pop()
+
+    def stmt_while_stmt(self, tree):
+        loop = Loop(self.try_depth)
+        top = self.here()
+        falses = self.compile_condition(tree.children[0])
+        self.compile_loop_body(tree.children[1], loop)
+        self.emit(JUMP, top)
+        self.patch(loop.continues, top)
+        self.patch_here(falses + loop.breaks)
+
+    def stmt_do_while_stmt(self, tree):
+        loop = Loop(self.try_depth)
+        top = self.here()
+        self.compile_loop_body(tree.children[0], loop)
+        self.patch_here(loop.continues)
+        falses = self.compile_condition(tree.children[1])
+        self.emit(JUMP, top)
+        self.patch_here(falses + loop.breaks)
+
+    def stmt_for_stmt(self, tree):
+        init, condition, update, block = tree.children
+        self.scopes.append({})
+        self.compile_stmt(init)
+        loop = Loop(self.try_depth)
+        top = self.here()
+        falses = []
+        if condition is not None:
+            falses = self.compile_condition(condition)
+        if block is not None:
+            self.compile_loop_body(block, loop)
+        self.patch_here(loop.continues)
+        self.compile_stmt(update)
+        self.emit(JUMP, top)
+        self.patch_here(falses + loop.breaks)
+        self.scopes.pop()
+
+    def stmt_vector_for_stmt(self, tree):
+        # VECTOR_LOOP 整体执行成功时跳过后面逐次执行的循环
+        plan = tree.plan
+        slots = [self.lookup(name) for name in plan.names]
+        index = self.emit(VECTOR_LOOP)
+        self.stmt_for_stmt(tree)
+        self.code.instrs[index] = (VECTOR_LOOP, (plan, slots, self.here()))
+
+    def stmt_hoist_stmt(self, tree):
+        # 循环不变量放在隐藏的局部槽位里, 进入循环时清空
+        for node in tree.invariants:
+            node.slot = self.code.nlocals
+            self.code.nlocals += 1
+            self.emit(LOAD_CONST, UNCOMPUTED)
+            self.emit(STORE_FAST, node.slot)
+        self.compile_stmt(tree.children[0])
+
+    def stmt_try_catch_stmt(self, tree):
+        body, name, handler = tree.children
+        setup = self.emit(SETUP_TRY)
+        self.try_depth += 1
+        self.compile_block(body)
+        self.try_depth -= 1
+        self.emit(POP_TRY)
+        end = self.emit(JUMP)
+        self.patch_here([setup])
+        # 栈顶是异常信息
+        self.scopes.append({})
+        self.emit(STORE_FAST, self.declare(str(name)))
+        self.compile_block(handler, new_scope=False)
+        self.scopes.pop()
+        self.patch_here([end])
+
+    # functions and classes
+
+    def compile_function(self, name, arg_list, block, memo=False):
+        params = []
+        types = []
+        if arg_list is not None:
+            for arg in arg_list.children:
+                types.append(TYPES[arg.children[0].data])
+                params.append(str(arg.children[1]))
+        saved = (self.code, self.scopes, self.loops, self.try_depth, self.is_main, self.stmt_end, self.memo_slot)
+        self.code = Code(name)
+        self.scopes = [{}]
+        self.loops = []
+        self.try_depth = 0
+        self.is_main = False
+        self.memo_slot = None
+        for param in params:
+            self.declare(param)
+        if memo:
+            # 命中时 MEMO_LOOKUP 把结果压栈, 由下一条 RETURN_VALUE 返回; 没有命中时跳过它
+            self.memo_slot = self.code.nlocals
+            self.code.nlocals += 1
+            self.emit(MEMO_LOOKUP, (len(params), self.memo_slot))
+            self.emit(RETURN_VALUE)
+        self.compile_block(block, new_scope=False)
+        self.emit(LOAD_CONST, None)
+        self.emit_return()
+        self.code.finish()
+        function = Function(name, len(params), self.code)
+        (self.code, self.scopes, self.loops, self.try_depth, self.is_main, self.stmt_end,
+         self.memo_slot) = saved
+        return tuple(types), function
+
+    def stmt_func_def_stmt(self, tree):
+        name = str(tree.children[0])
+        types, function = self.compile_function(name, tree.children[1], tree.children[2])
+        self.emit(DEF_FUNC, (name, types, function))
+
+    def stmt_memo_def_stmt(self, tree):
+        node = tree.children[0]
+        name = str(node.children[0])
+        types, function = self.compile_function(name, node.children[1], node.children[2], memo=True)
+        self.emit(DEF_MEMO, (name, types, function, tree.capacity))
+
+    def compile_class_body(self, var_list, func_list):
+        fields = []
+        if var_list is not None:
+            children = var_list.children
+            for i in range(0, len(children), 2):
+                arg, value = children[i], children[i + 1]
+                if value is None:
+                    self.emit(LOAD_CONST, '' if arg.children[0].data == 'string_type' else 0)
+                else:
+                    self.compile_expr(value)
+                fields.append(str(arg.children[1]))
+        methods = []
+        if func_list is not None:
+            children = func_list.children
+            for i in range(0, len(children), 3):
+                name = str(children[i])
+                types, function = self.compile_function(name, children[i + 1], children[i + 2])
+                methods.append(((name, types), function))
+        return tuple(fields), tuple(methods)
+
+    def stmt_class_def(self, tree):
+        name = str(tree.children[0])
+        fields, methods = self.compile_class_body(tree.children[1], tree.children[2])
+        self.emit(DEF_CLASS, (name, None, fields, methods))
+
+    def stmt_class_extends(self, tree):
+        name, base = str(tree.children[0]), str(tree.children[1])
+        fields, methods = self.compile_class_body(tree.children[2], tree.children[3])
+        self.emit(DEF_CLASS, (name, base, fields, methods))
+
+    def stmt_class_instance(self, tree):
+        class_type, name, class_type2 = (str(child) for child in tree.children)
+        self.emit(NEW_INSTANCE, (class_type, name, class_type2))
+
+    def stmt_class_instance_trans(self, tree):
+        name, class_type2 = (str(child) for child in tree.children)
+        self.emit(NEW_INSTANCE, (None, name, class_type2))
+
+    # expressions
+
+    def compile_expr(self, tree):
+        data = tree.data
+        if data in BINARY_OPS:
+            self.compile_expr(tree.children[0])
+            self.compile_expr(tree.children[1])
+            self.emit_binary(data)
+            return
+        getattr(self, 'expr_' + data)(tree)
+
+    def emit_binary(self, data):
+        op, func = BINARY_OPS[data]
+        self.emit(op, func)
+
+    def expr_const(self, tree):
+        self.emit(LOAD_CONST, tree.children[0])
+
+    def expr_number(self, tree):
+        num_str = str(tree.children[0])
+        try:
+            value = int(num_str) if '.' not in num_str else float(num_str)
+        except ValueError as e:
+            self.emit_error(ValueError, str(e))
+            return
+        self.emit(LOAD_CONST, value)
+
+    def expr_string(self, tree):
+        self.emit(LOAD_CONST, str(tree.children[0][1:-1]))
+
+    def expr_true_bool(self, tree):
+        self.emit(LOAD_CONST, True)
+
+    def expr_false_bool(self, tree):
+        self.emit(LOAD_CONST, False)
+
+    def expr_var(self, tree):
+        self.emit_load(str(tree.children[0]))
+
+    def expr_grouped_expr(self, tree):
+        self.compile_expr(tree.children[0])
+
+    def expr_neg_op(self, tree):
+        self.compile_expr(tree.children[0])
+        self.emit(UNARY, operator.invert)
+
+    def expr_not_op(self, tree):
+        self.compile_expr(tree.children[0])
+        self.emit(UNARY, operator.not_)
+
+    def expr_invariant(self, tree):
+        # 已经算过时 LOAD_INVARIANT 直接压栈并跳过求值
+        index = self.emit(LOAD_INVARIANT)
+        self.compile_expr(tree.children[0])
+        self.emit(STORE_INVARIANT, tree.slot)
+        self.code.instrs[index] = (LOAD_INVARIANT, (tree.slot, self.here()))
+
+    def expr_array_access(self, tree):
+        name = str(tree.children[0])
+        self.compile_index(name, tree.children[1:])
+        self.emit(ARRAY_LOAD, name)
+
+    def compile_args(self, arg_values):
+        if arg_values is None:
+            return 0
+        for expr in arg_values.children:
+            self.compile_expr(expr)
+        return len(arg_values.children)
+
+    @staticmethod
+    def call_key(tree):
+        # 实参类型由 cp_types 确定时, 函数表的键在编译时就拼好
+        if getattr(tree, 'arg_types', None) is None:
+            return None
+        return (str(tree.children[0]), tree.arg_types)
+
+    def expr_func_call_stmt(self, tree):
+        argc = self.compile_args(tree.children[1])
+        self.emit(CALL, (str(tree.children[0]), self.call_key(tree), argc))
+
+    def expr_inline_call(self, tree):
+        # 实参在栈上, INLINE_ARGS 检查类型后放进隐藏的局部槽位 (类型已经确定时不检查); 函数体只看得到参数和全局变量
+        params, types = signature(tree.children[2])
+        self.compile_args(tree.children[1])
+        slots = tuple(range(self.code.nlocals, self.code.nlocals + len(params)))
+        self.code.nlocals += len(params)
+        checked = None if getattr(tree, 'arg_types', None) == types else types
+        self.emit(INLINE_ARGS, (str(tree.children[0]), checked, slots))
+        saved, self.scopes = self.scopes, [dict(zip(params, slots))]
+        self.compile_expr(tree.children[3])
+        self.scopes = saved
+
+    def expr_builtin_call(self, tree):
+        args = tree.children[1].children
+        for arg in args:
+            if arg.data == 'array_name':
+                self.emit(LOAD_CONST, str(arg.children[0]))
+            else:
+                self.compile_expr(arg)
+        self.emit(CALL_BUILTIN, (str(tree.children[0]), len(args)))
+
+    def expr_class_var(self, tree):
+        self.emit(LOAD_FIELD, (str(tree.children[0]), str(tree.children[1])))
+
+    def expr_this_var(self, tree):
+        self.emit(LOAD_THIS, str(tree.children[0]))
+
+    def expr_super_var(self, tree):
+        self.emit(LOAD_SUPER, str(tree.children[0]))
+
+    def expr_class_func(self, tree):
+        argc = self.compile_args(tree.children[2])
+        self.emit(CALL_METHOD, (str(tree.children[0]), str(tree.children[1]), argc))
+
+    def expr_this_func(self, tree):
+        argc = self.compile_args(tree.children[1])
+        self.emit(CALL_THIS, (str(tree.children[0]), argc))
+
+    def expr_super_func(self, tree):
+        argc = self.compile_args(tree.children[1])
+        self.emit(CALL_SUPER, (str(tree.children[0]), argc))
+
+
+class Frame:
+    """used 是从主程序到这一帧为止估算的调用栈内存"""
+    __slots__ = ('code', 'pc', 'locals', 'stack', 'this', 'handlers', 'back', 'used')
+
+    def __init__(self, code, locals, this, back, used):
+        self.code = code
+        self.pc = 0
+        self.locals = locals
+        self.stack = []
+        self.this = this
+        self.handlers = []
+        self.back = back
+        self.used = used
+
+
+def stack_overflow(budget):
+    return RecursionError(f"maximum recursion depth exceeded (call stack over {budget // 1048576} MB)")
+
+
+class VM(Runtime):
+    def __init__(self, stdin=None, out=None, no_memo=frozenset(), memo_capacity=None, stack_budget=None):
+        super().__init__(stdin, out, no_memo, memo_capacity)
+        self.frame = None
+        self.stack_budget = STACK_BUDGET if stack_budget is None else stack_budget
+
+    def execute(self, tree):
+        self.run_code(Compiler().compile_program(tree, self.no_memo, self.memo_capacity))
+
+    def run_code(self, code):
+        self.frame = Frame(code, [None] * code.nlocals, None, None, code.size)
+        while True:
+            try:
+                self.loop()
+                return
+            except Exception as e:
+                self.unwind(e)
+
+    def unwind(self, error):
+        frame = self.frame
+        while frame is not None:
+            if frame.handlers:
+                target, depth = frame.handlers.pop()
+                del frame.stack[depth:]
+                frame.stack.append(CATCH_PREFIX + str(error))
+                frame.pc = target
+                self.frame = frame
+                return
+            frame = frame.back
+        raise error
+
+    def current_this(self):
+        this = self.frame.this
+        if this is None:
+            raise NameError("No class instance defined")
+        return this
+
+    def loop(self):
+        frame = self.frame
+        instrs = frame.code.instrs
+        pc = frame.pc
+        stack = frame.stack
+        locals_ = frame.locals
+        push = stack.append
+        pop = stack.pop
+        globals_ = self.globals
+        functions = self.functions
+        out = self.out.write
+        budget = self.stack_budget
+        while True:
+            op, arg = instrs[pc]
+            pc += 1
+            if op == LOAD_FAST:
+                push(locals_[arg])
+            elif op == LOAD_CONST:
+                push(arg)
+            elif op == STORE_FAST:
+                locals_[arg] = pop()
+            elif op == LOAD_GLOBAL:
+                try:
+                    push(globals_[arg])
+                except KeyError:
+                    raise ValueError(f"Undefined variable '{arg}'") from None
+            elif op == ADD:
+                b = pop()
+                stack[-1] = stack[-1] + b
+            elif op == SUB:
+                b = pop()
+                stack[-1] = stack[-1] - b
+            elif op == MUL:
+                b = pop()
+                stack[-1] = stack[-1] * b
+            elif op == LESS:
+                b = pop()
+                stack[-1] = stack[-1] < b
+            elif op == POP_JUMP_IF_FALSE:
+                if not pop():
+                    pc = arg
+            elif op == JUMP:
+                pc = arg
+            elif op == INCR_FAST:
+                slot, name, delta = arg
+                value = locals_[slot]
+                if type(value) != int:
+                    sign = '++' if delta > 0 else '--'
+                    raise TypeError(f"Cannot use {sign} operator on non-integer variable '{name}'")
+                locals_[slot] = value + delta
+            elif op == INCR_GLOBAL:
+                name, delta = arg
+                if name not in globals_:
+                    raise ValueError(f"Undefined variable '{name}'")
+                value = globals_[name]
+                if type(value) != int:
+                    sign = '++' if delta > 0 else '--'
+                    raise TypeError(f"Cannot use {sign} operator on non-integer variable '{name}'")
+                globals_[name] = value + delta
+            elif op == STORE_GLOBAL:
+                if arg not in globals_:
+                    raise ValueError(f"Undefined variable '{arg}'")
+                globals_[arg] = pop()
+            elif op == GREATER:
+                b = pop()
+                stack[-1] = stack[-1] > b
+            elif op == LESS_EQUAL:
+                b = pop()
+                stack[-1] = stack[-1] <= b
+            elif op == GREATER_EQUAL:
+                b = pop()
+                stack[-1] = stack[-1] >= b
+            elif op == EQUAL:
+                b = pop()
+                stack[-1] = stack[-1] == b
+            elif op == NOT_EQUAL:
+                b = pop()
+                stack[-1] = stack[-1] != b
+            elif op == BINARY:
+                b = pop()
+                stack[-1] = arg(stack[-1], b)
+            elif op == UNARY:
+                stack[-1] = arg(stack[-1])
+            elif op == LOAD_INVARIANT:
+                value = locals_[arg[0]]
+                if value is not UNCOMPUTED:
+                    push(value)
+                    pc = arg[1]
+            elif op == STORE_INVARIANT:
+                locals_[arg] = stack[-1]
+            elif op == POP_JUMP_IF_TRUE:
+                if pop():
+                    pc = arg
+            elif op == ARRAY_LOAD:
+                index = int(pop())
+                push(self.array(arg, index)[index])
+            elif op == ARRAY_STORE:
+                value = pop()
+                index = int(pop())
+                try:
+                    self.array(arg, index)[index] = value
+                except (TypeError, OverflowError):
+                    store_element(self.arrays, arg, index, value)
+            elif op == POP_TOP:
+                pop()
+            elif op == PRINT_VALUE:
+                out(str(pop()))
+            elif op == PRINT_TEXT:
+                out(arg)
+            elif op == ASSIGN_FAST:
+                slot, name = arg
+                value = pop()
+                if type(locals_[slot]) != type(value):
+                    raise TypeError(f"Cannot assign {type(value).__name__} value to variable '{name}' of type {type(locals_[slot]).__name__}")
+                locals_[slot] = value
+            elif op == ASSIGN_GLOBAL:
+                value = pop()
+                if arg not in globals_:
+                    raise ValueError(f"Undefined variable '{arg}'")
+                if type(globals_[arg]) != type(value):
+                    raise TypeError(f"Cannot assign {type(value).__name__} value to variable '{arg}' of type {type(globals_[arg]).__name__}")
+                globals_[arg] = value
+            elif op == CHECK_DECL:
+                name, is_string = arg
+                value = stack[-1]
+                if (type(value) == str) != is_string:
+                    raise TypeError(f"Cannot assign {str(type(value))} value to variable '{name}'.")
+            elif op == DECLARE_GLOBAL:
+                if arg in globals_:
+                    raise ValueError(f"Variable '{arg}' already exists")
+                globals_[arg] = pop()
+            elif op == CALL or op == CALL_METHOD or op == CALL_THIS or op == CALL_SUPER:
+                argc = arg[-1]
+                if argc:
+                    args = stack[-argc:]
+                    del stack[-argc:]
+                else:
+                    args = []
+                this = frame.this
+                if op == CALL:
+                    function = functions.get(arg[1]) if arg[1] is not None else None
+                    if function is None:
+                        function = self.function(arg[0], args)
+                elif op == CALL_METHOD:
+                    this = arg[0]
+                    if this not in self.classes:
+                        raise NameError(f"Class '{this}' not defined")
+                    function = self.method(this, arg[1], args)
+                elif op == CALL_THIS:
+                    this = self.current_this()
+                    function = self.method(this, arg[0], args)
+                else:
+                    this = self.super_of(self.current_this())
+                    function = self.method(this, arg[0], args)
+                frame.pc = pc
+                code = function.code
+                if code.nlocals > argc:
+                    args.extend([None] * (code.nlocals - argc))
+                used = frame.used + code.size
+                if used > budget:
+                    raise stack_overflow(budget)
+                frame = Frame(code, args, this, frame, used)
+                self.frame = frame
+                instrs = code.instrs
+                pc = 0
+                stack = frame.stack
+                locals_ = args
+                push = stack.append
+                pop = stack.pop
+            elif op == RETURN_VALUE:
+                value = pop()
+                frame = frame.back
+                self.frame = frame
+                instrs = frame.code.instrs
+                pc = frame.pc
+                stack = frame.stack
+                locals_ = frame.locals
+                push = stack.append
+                pop = stack.pop
+                push(value)
+            elif op == INLINE_ARGS:
+                name, types, slots = arg
+                start = len(stack) - len(slots)
+                args = stack[start:]
+                del stack[start:]
+                if types is not None and tuple(map(type, args)) != types:
+                    raise NameError(f"Function '{name}' not defined")
+                for slot, value in zip(slots, args):
+                    locals_[slot] = value
+            elif op == TAIL_CALL:
+                # 当前帧换成被调函数的帧: this 和调用者不变, 栈上只有实参
+                name, key, argc = arg
+                if argc:
+                    args = stack[-argc:]
+                    del stack[-argc:]
+                else:
+                    args = []
+                function = functions.get(key) if key is not None else None
+                if function is None:
+                    function = self.function(name, args)
+                code = function.code
+                if code.nlocals > argc:
+                    args.extend([None] * (code.nlocals - argc))
+                used = frame.used - frame.code.size + code.size
+                if used > budget:
+                    raise stack_overflow(budget)
+                frame.code = code
+                frame.locals = args
+                frame.used = used
+                instrs = code.instrs
+                pc = 0
+                locals_ = args
+            elif op == INPUT_CONVERT:
+                push(self.read_value(arg, pop()))
+            elif op == INPUT_GLOBAL:
+                name, target = arg
+                if name not in globals_:
+                    raise ValueError(f"Variable '{name}' not found")
+                globals_[name] = self.read_value(target, globals_[name])
+            elif op == INPUT_ELEMENT:
+                self.input_element(arg, pop())
+            elif op == INPUT_ARRAY:
+                self.input_array(arg)
+            elif op == DEF_FUNC:
+                self.define_function(*arg)
+            elif op == DEF_MEMO:
+                name, types, function, capacity = arg
+                self.define_memo(name, types, function, attach_memo, capacity)
+            elif op == MEMO_LOOKUP:
+                nargs, slot = arg
+                memo = frame.code.memo
+                key = memo.key(locals_[:nargs])
+                value = memo.lookup(key)
+                if value is MISSING:
+                    locals_[slot] = key
+                    pc += 1
+                else:
+                    push(value)
+            elif op == MEMO_STORE:
+                frame.code.memo.store(locals_[arg], stack[-1])
+            elif op == DEF_CLASS:
+                name, base, fields, methods = arg
+                values = []
+                if fields:
+                    values = stack[-len(fields):]
+                    del stack[-len(fields):]
+                self.define_class(name, base, fields, methods, values)
+            elif op == NEW_INSTANCE:
+                self.new_instance(*arg)
+            elif op == LOAD_FIELD:
+                name, var = arg
+                if name not in self.classes:
+                    raise NameError(f"Class instance '{name}' not defined")
+                push(self.load_field(name, var))
+            elif op == LOAD_THIS:
+                push(self.load_field(self.current_this(), arg))
+            elif op == LOAD_SUPER:
+                push(self.load_field(self.super_of(self.current_this()), arg))
+            elif op == ARRAY_DEF:
+                name, elem_type, ndims = arg
+                dims = stack[-ndims:]
+                del stack[-ndims:]
+                self.array_def(name, elem_type, dims)
+            elif op == CALL_BUILTIN:
+                name, argc = arg
+                args = stack[-argc:]
+                del stack[-argc:]
+                push(call_builtin(self.arrays, name, args))
+            elif op == ARRAY_INDEX:
+                name, n = arg
+                indexes = stack[-n:]
+                del stack[-n:]
+                push(self.indexers[name](*indexes))
+            elif op == VECTOR_LOOP:
+                plan, slots, end = arg
+                values = [globals_.get(name) if slot is None else locals_[slot]
+                          for name, slot in zip(plan.names, slots)]
+                if plan.run(self.arrays, values):
+                    pc = end
+            elif op == SETUP_TRY:
+                frame.handlers.append((arg, len(stack)))
+            elif op == POP_TRY:
+                frame.handlers.pop()
+            elif op == RAISE_ERROR:
+                raise arg[0](arg[1])
+            elif op == HALT:
+                frame.pc = pc
+                return
+            else:
+                raise RuntimeError(f"bad opcode {op}")
+
+
+def compile_source(source):
+    return Compiler().compile_program(calc_parser.parse(source))